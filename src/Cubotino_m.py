@@ -33,6 +33,9 @@
 # __version__ variable
 version = '1.1   15 April 2024'
 
+import threading
+side_lock = threading.Lock()   # lock for prev_side, set by the vision pipeline thread and by the main thread
+
 
 ################  setting argparser for robot remote usage, and other settings  #################
 import argparse
@@ -92,6 +95,10 @@ parser.add_argument("--no_motors", action='store_true',
 parser.add_argument("--no_btn", action='store_true',
                     help="Starts the first solving cycles without using the button")
 
+# --record argument is added to the parser
+parser.add_argument("--record", action='store_true',
+                    help="Records the PiCamera frames at cube status detection, for offline replay")
+
 args = parser.parse_args()   # argument parsed assignement
 # ###############################################################################################
 
@@ -111,7 +118,8 @@ def import_parameters(debug=False):
     global kl, x_l, x_r, y_u, y_b, w_f, w_s, square_ratio, rhombus_ratio
     global delta_area_limit, sv_max_moves, sv_max_time, collage_w, marg_coef, cam_led_bright, cam_led_auto
     global detect_timeout, show_time, warn_time, quit_time, cover_self_close, vnc_delay, fcs_delay
-    global built_by, built_by_x, built_by_fs
+    global built_by, built_by_x, built_by_fs, cam_video_port, roi_frames, cam_luma, detect_scale, auto_frames, face_fitter
+    global accumulate_frames, gate_motion, gate_blur, fcs_first
 
     
     
@@ -147,6 +155,16 @@ def import_parameters(debug=False):
         built_by_fs = sett['built_by_fs']              # font size for the maker's name on display
         fcs_delay = sett['fcs_delay']                  # delay in secs to switch to Fix Coordinates System for facelets position
         cover_self_close = sett['cover_self_close']    # cover_self_close parameter 
+        cam_video_port = sett['cam_video_port']        # continuous PiCamera capture via video port at cube status detection
+        roi_frames = sett['roi_frames']                # frames without face lock before widening the ROI (0 disables the ROI)
+        cam_luma = sett['cam_luma']                    # YUV capture, with Y plane for the edges and BGR only at face lock
+        detect_scale = sett['detect_scale']            # frame scale for the facelets detection (colors are read at 0.8 scale)
+        auto_frames = sett['auto_frames']              # frames without face lock before using both edge branches (0 always both)
+        face_fitter = sett['face_fitter']              # face lock from 9 square contours ('contours') or from a fitted 3x3 lattice ('lattice')
+        accumulate_frames = sett['accumulate_frames']  # frames a facelet candidate is kept without being detected again (0 disables)
+        gate_motion = sett['gate_motion']              # max thumbnails difference for a frame to be analysed (0 disables)
+        gate_blur = sett['gate_blur']                  # min sharpness ratio, to the sharpest frame of the side, to be analysed (0 disables)
+        fcs_first = sett['fcs_first']                  # min score for the Fix Coordinates System at the first frame of each side (0 disables)
         
         if debug:                                      # case debug variable is set true
             fname = settings.get_settings_fname()      # settings filename is retrieved
@@ -173,7 +191,8 @@ def import_libraries():
         These librries are imported after those needed for the display management.
         Kociemba solver is tentatively imported considering three installation/copy methods."""
     
-    global camera_set_gains, dist, PiRGBArray, PiCamera, servo, rm, GPIO, median, dt, sv, cubie
+    global camera_set_gains, dist, PiRGBArray, PiCamera, servo, rm, GPIO, median, dt, sv, replay, capture, warmup, json
+    global lattice, accumulator, coords, colors, cubies
     global np, math, time, cv2, os, pathlib
     
     # import custom libraries
@@ -181,12 +200,21 @@ def import_libraries():
     import Cubotino_m_set_picamera_gain as camera_set_gains  # script that allows to fix some parameters at picamera
     import Cubotino_m_servos as servo                     # custom library controlling Cubotino servos and led module
     import Cubotino_m_moves as rm                         # custom library, traslates the cuber solution string in robot movements string
+    import Cubotino_m_replay as replay                    # custom library, records the PiCamera frames for offline replay
+    import Cubotino_m_capture as capture                  # custom library, continuous PiCamera capture via video port
+    import Cubotino_m_warmup as warmup                    # custom library, convergence check for the PiCamera warmup
+    import Cubotino_m_lattice as lattice                  # custom library, 3x3 lattice fitter for the facelets centers
+    import Cubotino_m_accumulator as accumulator          # custom library, facelets candidates accumulated over the frames of a side
+    import Cubotino_m_coordinates as coords               # custom library, binary store of the facelets coordinates (FCS)
+    import Cubotino_m_colors as colors                    # custom library, vectorized Lab conversion and CIEDE2000 distance
+    import Cubotino_m_cubies as cubies                    # custom library, cube status check at cubie level and hypotheses
 
     # import non-custom libraries
     from picamera.array import PiRGBArray                 # Raspberry pi specific package for the camera, using numpy array
     from picamera import PiCamera                         # Raspberry pi specific package for the camera
     from statistics import median                         # median is used as sanity check while evaluating facelets contours
     import os.path, pathlib                               # import libraries for file and folder management
+    import json                                           # json is used for the camera calibration records
     import RPi.GPIO as GPIO                               # import RPi GPIO library
     import datetime as dt                                 # mainly used as timestamp, like on data logging
     import numpy as np                                    # data array management
@@ -197,20 +225,22 @@ def import_libraries():
     
     print('CV2 version: ', cv2.__version__)               # print to terminal the cv2 version
     
-    # Up to here Cubotino logo is shown on display
-    disp.show_on_display('LOADING', 'SOLVER', fs1=37, y2=75, fs2=42)  # feedback is printed to the display
-    disp.set_backlight(1)                                 # display backlight is turned on, in case it wasn't
-
-    
-    # importing Kociemba solver (this import takes quite some time to be uploaded)
-    try:
-        import twophase.solver as sv                  # import Kociemba solver installed in venv
-        import twophase.cubie as cubie                # import cubie Kociemba solver library part
-        twophase_solver_found = True                  # boolean to track no exception on import the installed solver
+    # Kociemba solver via the solver daemon (tables loaded once per boot), or imported in process
+    import Cubotino_m_solver as sv                    # custom library, Kociemba solver via daemon or in process
+    if sv.daemon_running():                           # case the solver daemon is running (tables already loaded)
+        twophase_solver_found = True                  # boolean to track the solver availability
         if debug:                                     # case debug variable is set true on __main__
+            print('found Kociemba solver daemon')     # feedback is printed to the terminal
+    
+    else:                                             # case the solver daemon is not running
+        # Up to here Cubotino logo is shown on display
+        disp.show_on_display('LOADING', 'SOLVER', fs1=37, y2=75, fs2=42)  # feedback is printed to the display
+        disp.set_backlight(1)                         # display backlight is turned on, in case it wasn't
+        
+        # importing Kociemba solver in process (this import takes quite some time to be uploaded)
+        twophase_solver_found = sv.load()             # boolean to track no exception on import the installed solver
+        if debug and twophase_solver_found:           # case debug variable is set true on __main__, and solver imported
             print('found Kociemba solver installed')  # feedback is printed to the terminal
-    except:
-        twophase_solver_found = False                 # boolean to track no exception on import the installed solver
     
     if not twophase_solver_found:    # case no one solver has been imported
         print('\nnot found Kociemba solver')              # feedback is printed to the terminal
@@ -340,12 +370,17 @@ def robot_camera_warmup(camera, start_time):
     the gains stable (awb gains are rather slow to update).
     Much different is when the cube is on the cube support for few secs when the button is pressed.
     To properly cover all the possible situations, this fuction releases the camera warm-up phase only after
-    all the gains are stable, meaning an absolute variation < 2% from the average of last 2 seconds."""
+    all the gains are predicted to be stable: the settling of each gain is extrapolated from the latest datapoints
+    (Cubotino_m_warmup.py), and the warmup ends when the last datapoint is within kl tolerance from the predicted value.
+    The camera is seeded with the parameters converged on the previous cycle (if any), to shorten the settling time."""
     
+    global warmup_seed
 
     if not robot_stop:
         disp.show_on_display('CAMERA', 'SETUP', fs1=40, fs2=42)  # feedback is printed to the display
         print('\nPiCamera: waiting for AWB and Exposure gains to get stable')  # feedback is printed to the terminal
+        if warmup_seed != None:       # case of PiCamera parameters converged on the previous cycle
+            camera_seed(camera, warmup_seed)  # PiCamera is seeded with the previous cycle parameters
         if debug:                              # case debug variable is set true on __main__
             print('camera set in auto mode')   # feedback is printed to the terminal
         camera.exposure_mode = 'auto' # set to auto exposure at the start, to adjust according to light conditions
@@ -355,16 +390,9 @@ def robot_camera_warmup(camera, start_time):
         camera.shutter_speed = 0      # set to shutter speed to auto at the start, to adjust according to light conditions
         time.sleep(0.05)              # not found documentation if a delay is needed after this PiCamera setting
         
-        a_gain_list=[]                # list to store the Picamera analog gain, during warmup period
-        d_gain_list=[]                # list to store the Picamera digital gain, during warmup period
-        awb_blue_list=[]              # list to store the Picamera AWB gain, for blue, during warmup period
-        awb_red_list=[]               # list to store the Picamera AWB gain, for red, during warmup period
-        exp_list=[]                   # list to store the Picamera exposure time, during warmup period
-        t_list=[]                     # list to store the warmup progressive time of checkings
-        
         # kl = 0.95     #(AF 0.95)    # lower koefficient to define acceptance bandwidth (95%)
-        ku = 2-kl                     # Upper koefficient to define acceptance bandwidth (105%)
-        pts = 8                       # amount of consecutive datapoints to analyse if parameters within acceptable range
+        names = ('analog_gain', 'digital_gain', 'awb_blue', 'awb_red', 'exposure')  # PiCamera parameters to get stable
+        conv = warmup.Convergence(names, kl=kl, size=16, min_pts=6)  # ring buffers and settling prediction for the parameters
         
         t_start=time.time()           # time reference is assigned as reference for the next task
         
@@ -379,43 +407,13 @@ def robot_camera_warmup(camera, start_time):
             awb_gains=camera.awb_gains                                  # awb blue and red gains are inquired to the PiCamera
             exposure=camera.exposure_speed                              # exposure is inquired to the PiCamera
             
-            a_gain_list.append(round(float(a_gain),2))                  # analog gain is appended to a list
-            d_gain_list.append(round(float(d_gain),2))                  # digital gain is appended to a list
-            awb_blue_list.append(round(float(awb_gains[0]),2))          # awb blue part gain is appended to a list
-            awb_red_list.append(round(float(awb_gains[1]),2))           # awb blue part gain is appended to a list
-            exp_list.append(exposure)                                   # exposure time (micro secs) is appended to a list
-            t_list.append(round(time.time()- t_start,2))                # time (from AWB and Exposure start adjustement) is appended to a list
+            # datapoint is added to the ring buffers: time (from AWB and Exposure start adjustement) and PiCamera parameters
+            conv.add(time.time()-t_start, (float(a_gain), float(d_gain), float(awb_gains[0]), float(awb_gains[1]), exposure))
+            PiCamera_param=(a_gain, d_gain, awb_gains, exposure)        # latest parameters returned by the PiCamera are assigned to a tuple
             
-            a_check=False                                               # a flag is negatively set for analog gain (being stable...)
-            d_check=False                                               # a flag is negatively set for digital gain (being stable...)
-            awb_blue_check=False                                        # a flag is negatively set for awb blue gain (being stable...)
-            awb_red_check=False                                         # a flag is negatively set for awb red gain (being stable...)
-            exp_check=False                                             # a flag is negatively set for the exposure time (being stable...)
-            
-            if len(a_gain_list) > pts:                                  # requested a minimum amount of datapoints
-                check = a_gain_list[-1]/(sum(a_gain_list[-pts:])/pts)   # last analog gain value is compared to the average of last pts points
-                if check > kl and check < ku:                           # if comparison within acceptance boundaries
-                    a_check=True                                        # flag is positively set for this gain
-
-                check = d_gain_list[-1]/(sum(d_gain_list[-pts:])/pts)   # last digital gain value is compared to the average of last pts points
-                if check > kl and check < ku:                           # if comparison within acceptance boundaries
-                    d_check=True                                        # flag is positively set for this gain               
-            
-                check = awb_blue_list[-1]/(sum(awb_blue_list[-pts:])/pts) # last awb_blue gain is compared to the average of last pts points
-                if check > kl and check < ku:                           # if comparison within acceptance boundaries
-                    awb_blue_check=True                                 # flag is positively set for this gain    
-                    
-                check = awb_red_list[-1]/(sum(awb_red_list[-pts:])/pts) # last awb_red gain is compared to the average of last pts points
-                if check > kl and check < ku:                           # if comparison within acceptance boundarie
-                    awb_red_check=True                                  # flag is positively set for this gain
-                
-                check = exp_list[-1]/(sum(exp_list[-pts:])/pts)         # last exposure time is compared to the average of last pts points
-                if check > kl and check < ku:                           # if comparison within acceptance boundarie
-                    exp_check=True                                      # flag is positively set for the exposure time                
-         
-                if a_check and d_check and awb_blue_check and awb_red_check and exp_check: # if all gains are stable
-                    PiCamera_param=(a_gain, d_gain, awb_gains, exposure)  # latest parameters returned by the PiCamera are assigned to a tuple
-                    break                                                 # camera warmup while loop cab be break
+            if conv.converged():                                        # case all the parameters are predicted as stable
+                warmup_seed = PiCamera_param                            # converged parameters are kept to seed the next cycle
+                break                                                   # camera warmup while loop cab be break
 
             if screen and not robot_stop:            # case screen variable is set true on __main__
                 if fixWindPos:                       # case the fixWindPos variable is chosen
@@ -424,17 +422,16 @@ def robot_camera_warmup(camera, start_time):
                 cv2.imshow('cube', frame)            # shows the frame 
                 cv2.waitKey(1)                       # refresh time is minimized to 1ms  
         
-        print(f'PiCamera: AWB and Exposure being stable in {round(t_list[-1],1)} secs')
+        print(f'PiCamera: AWB and Exposure being stable in {round(time.time()-t_start,1)} secs')
         if screen:                                        # case screen variable is set true on __main__
             if debug:                                     # case debug variable is set true on __main__
-                print('\nPiCamera warmup function:')      # feedback is printed to the terminal
-                print('analog_gain_list',a_gain_list)     # feedback is printed to the terminal
-                print('digital_gain_list',d_gain_list)    # feedback is printed to the terminal
-                print('awb_blue_list',awb_blue_list)      # feedback is printed to the terminal
-                print('awb_red_list',awb_red_list)        # feedback is printed to the terminal
-                print('camera exp_list', exp_list)        # feedback is printed to the terminal
-                print('time:', t_list)                    # feedback is printed to the terminal
-                print('datapoints:', len(t_list))         # feedback is printed to the terminal
+                t_list, values = conv.last()              # latest datapoints, from the ring buffers
+                print('\nPiCamera warmup function (latest datapoints):')  # feedback is printed to the terminal
+                for i, name in enumerate(names):          # iteration over the PiCamera parameters
+                    print(name, list(np.round(values[:,i], 2)))  # feedback is printed to the terminal
+                print('predicted settled values:', conv.predict())  # feedback is printed to the terminal
+                print('time:', list(np.round(t_list, 2))) # feedback is printed to the terminal
+                print('datapoints:', conv.count)          # feedback is printed to the terminal
         
         disp.clean_display()                              # cleans the display
     
@@ -446,11 +443,42 @@ def robot_camera_warmup(camera, start_time):
 
 
 
+def camera_seed(camera, PiCamera_param):
+    """ Sets the PiCamera gains and exposure to the values converged on the previous cycle, before the warmup.
+    When the auto modes are re-enabled, the PiCamera adjusts the gains starting from these values instead of the
+    default ones (the camera is re-initialized at each cycle), that makes the warmup much shorter when the light
+    conditions did not change much in between the cycles."""
+    
+    a_gain, d_gain, awb_gains, exposure = PiCamera_param  # PiCamera parameters converged on the previous cycle
+    try:
+        camera.awb_mode = 'off'                           # sets white balance off, to accept the awb gains
+        time.sleep(0.05)                                  # small (arbitrary) delay after setting a new parameter to PiCamera
+        camera.awb_gains = awb_gains                      # sets AWB gains of the previous cycle
+        time.sleep(0.05)                                  # small (arbitrary) delay after setting a new parameter to PiCamera
+        camera.shutter_speed = int(exposure)              # sets the exposure time of the previous cycle
+        time.sleep(0.05)                                  # small (arbitrary) delay after setting a new parameter to PiCamera
+        camera_set_gains.set_analog_gain(camera, a_gain)  # sets analog gain of the previous cycle
+        time.sleep(0.05)                                  # small (arbitrary) delay after setting a new parameter to PiCamera
+        camera_set_gains.set_digital_gain(camera, d_gain) # sets digital gain of the previous cycle
+        time.sleep(0.05)                                  # small (arbitrary) delay after setting a new parameter to PiCamera
+        if debug:                                         # case debug variable is set true on __main__
+            print('camera seeded with the previous cycle parameters')  # feedback is printed to the terminal
+    except:                                               # case of exceptions
+        print('Could not seed the PiCamera with the previous cycle parameters')  # feedback is printed to the terminal
+
+
+
+
+
+
+
 def robot_consistent_camera_images(camera, PiCamera_param, start_time):
     """ Picamera is left in Auto mode for Exposure and AWB, untill the first 9 facelets of first side are detected.
     For consistent color detection, on the following sides, these two parameters are retrieved from PiCamera right after
     the first side detection, and se back to PiCamera as 'manual' parametes.
-    This prevents the PiCamera to keep adjusting the AWB and Exposure while reading the following 5 cube faces (sides)."""
+    This prevents the PiCamera to keep adjusting the AWB and Exposure while reading the following 5 cube faces (sides).
+    The averaged exposure is cached (Cubotino_m_camera_cache.txt) with the ambient light fingerprint: on the next cycles,
+    with the same led brightness and similar ambient light, the cached exposure is used and the four cube flips are skipped."""
     
     if robot_stop:        # case the robot has been requested to stop
         return            # function is terminated
@@ -477,6 +505,14 @@ def robot_consistent_camera_images(camera, PiCamera_param, start_time):
     camera.shutter_speed = 0      # set the shutter speed to auto at the start, to adjust according to light conditions
     time.sleep(0.05)                                     # small (arbitrary) delay after setting a new parameter to PiCamera
 
+    fingerprint = camera_fingerprint(PiCamera_param)    # ambient light fingerprint, from the PiCamera warmup parameters
+    cached_shutter = load_camera_cache(fingerprint)     # shutter time cached for the same led level and similar ambient light
+    if cached_shutter > 0:                              # case of cached shutter time
+        camera.shutter_speed = cached_shutter           # sets the cached shutter time to the PiCamera, for consinstent images
+        time.sleep(0.05)                                # small (arbitrary) delay after setting a new parameter to PiCamera
+        print(f'PiCamera: cached exposure time applied ({cached_shutter} micro secs), skipped the exposure reading on four cube sides')
+        disp.clean_display()                            # cleans the display
+        return                                          # function is terminated
     
     # PiCamera exposure is inquired to PiCaera on 4 cube sides reachable via a simple cube flip, to later fix an average exposure time
     exp_list=[]                                         # list to store the Picamera exposure time, for the first 4 faces
@@ -499,6 +535,8 @@ def robot_consistent_camera_images(camera, PiCamera_param, start_time):
     shutter_time = int(sum(exp_list)/len(exp_list))     # set the shutter time to the average exposure time of UBDF faces
     camera.shutter_speed = shutter_time                 # sets the shutter time to the PiCamera, for consinstent images
     time.sleep(0.05)                                    # small (arbitrary) delay after setting a new parameter to PiCamera 
+    if not robot_stop:                                  # case of no request to stop the robot
+        save_camera_cache(fingerprint, PiCamera_param, shutter_time)  # calibration record is saved, for the next cycles
     
     if screen:
         print(f'Exposure time measured on 4 cube sides, in: {round(time.time()-start_time,1)} secs')# feedback is printed to the terminal
@@ -522,29 +560,148 @@ def robot_consistent_camera_images(camera, PiCamera_param, start_time):
 
 
 
-def read_camera():
-    """ Returns the camera reading, and dimensions."""
+def camera_fingerprint(PiCamera_param):
+    """ Returns the ambient light fingerprint, from the PiCamera parameters at the end of the warmup (first cube face):
+    the overall brightness (exposure time multiplied by the gains) and the AWB gains, with the led brightness level."""
+    
+    a_gain, d_gain, awb_gains, exposure = PiCamera_param  # PiCamera parameters at the end of the warmup
+    brightness = float(a_gain) * float(d_gain) * exposure  # exposure time multiplied by the gains
+    return [cam_led_bright, round(brightness, 1), round(float(awb_gains[0]), 3), round(float(awb_gains[1]), 3)]
+
+
+
+
+
+
+
+def load_camera_cache(fingerprint):
+    """ Returns the shutter time of the most recent calibration record having the same led brightness and an
+    ambient fingerprint matching within tolerance (2*(1-kl) relative); Returns zero if there isn't a matching record.
+    Records are saved on Cubotino_m_camera_cache.txt (json), and the file can be deleted to force the exposure measurement."""
+    
+    fname = 'Cubotino_m_camera_cache.txt'                   # fname for the text file with the calibration records
+    folder = pathlib.Path().resolve()                       # active folder (should be home/pi/cubotino/src)
+    fname = os.path.join(folder, fname)                     # folder and file name for the calibration records
+    if not os.path.exists(fname):                           # case the calibration records file does not exist
+        return 0                                            # zero is returned
+    
+    try:                                                    # tentative
+        with open(fname, 'r') as f:                         # calibration records file is opened in reading mode
+            records = json.load(f)                          # calibration records are loaded
+    except:                                                 # case of exceptions (i.e. corrupted file)
+        print(f'Could not read the camera calibration records from {fname}')  # feedback is printed to the terminal
+        return 0                                            # zero is returned
     
-    global previous_time
+    tol = 2*(1-kl)                                          # relative tolerance for the ambient fingerprint
+    for record in reversed(records):                        # iteration over the records, from the most recent
+        cached = record.get('fingerprint', [])              # cached fingerprint
+        if len(cached) != len(fingerprint) or cached[0] != fingerprint[0]:  # case of different fingerprint type or led level
+            continue                                        # next record
+        if all(abs(c - v) <= tol*abs(c) for c, v in zip(cached[1:], fingerprint[1:])):  # case the fingerprint matches
+            if debug:                                       # case debug variable is set true on __main__
+                print('Camera calibration record matching the ambient fingerprint:', record)  # feedback is printed to the terminal
+            return int(record['shutter'])                   # cached shutter time is returned
+    return 0                                                # zero is returned, as no records match the fingerprint
 
-    camera.capture(rawCapture, format='bgr')                      # bgr is the picamera format directly compatible with CV2
-    frame = rawCapture.array                                      # picamera array allows usgae of numpy array
+
+
+
+
+
+
+def save_camera_cache(fingerprint, PiCamera_param, shutter_time):
+    """ Saves the calibration record (fingerprint, gains, AWB and shutter time) to Cubotino_m_camera_cache.txt.
+    Only the latest 10 records are kept; the file is written to a temporary file first and then renamed."""
+    
+    fname = 'Cubotino_m_camera_cache.txt'                   # fname for the text file with the calibration records
+    folder = pathlib.Path().resolve()                       # active folder (should be home/pi/cubotino/src)
+    fname = os.path.join(folder, fname)                     # folder and file name for the calibration records
+    
+    records = []                                            # empty list for the calibration records
+    if os.path.exists(fname):                               # case the calibration records file exists
+        try:                                                # tentative
+            with open(fname, 'r') as f:                     # calibration records file is opened in reading mode
+                records = json.load(f)                      # calibration records are loaded
+        except:                                             # case of exceptions (i.e. corrupted file)
+            records = []                                    # corrupted records are discarded
+    
+    a_gain, d_gain, awb_gains, exposure = PiCamera_param    # PiCamera parameters at the end of the warmup
+    record = {'date': dt.datetime.now().strftime('%Y%m%d_%H%M%S'),  # date and time of the calibration
+              'fingerprint': fingerprint,                   # led brightness and ambient light fingerprint
+              'a_gain': round(float(a_gain), 3),            # analog gain
+              'd_gain': round(float(d_gain), 3),            # digital gain
+              'awb_gains': [round(float(awb_gains[0]), 3), round(float(awb_gains[1]), 3)],  # AWB gains
+              'shutter': int(shutter_time)}                 # shutter time averaged on UBDF faces
+    records = (records + [record])[-10:]                    # the latest 10 records are kept
+    
+    try:                                                    # tentative
+        with open(fname + '.tmp', 'w') as f:                # temporary file is opened in writing mode
+            json.dump(records, f, indent=0)                 # calibration records are saved
+        os.replace(fname + '.tmp', fname)                   # temporary file replaces the calibration records file
+    except:                                                 # case of exceptions
+        print(f'Could not save the camera calibration record to {fname}')  # feedback is printed to the terminal
+
+
+
+
+
+
+
+def read_camera(after=0):
+    """ Returns the camera reading, and dimensions.
+    When the capture engine is running (video port), the latest frame not yet analyzed is returned, having
+    the capture started after the 'after' time (i.e. after the last servo move).
+    On luma capture mode, the returned frame is the (cropped, warped and resized) Y plane, while the raw YUV
+    frame is kept on raw_frame, for the colors reading at face lock (fine_frame function).
+    On coarse detection mode (detect_scale smaller than 0.8) the returned frame is scaled by detect_scale, while
+    the raw frame is kept on raw_frame, for the colors reading at face lock (fine_frame function)."""
+    
+    global previous_time, capture_engine, raw_frame
+
+    raw_frame = None                                              # raw frame (luma capture mode or coarse detection mode only)
+    frame = []                                                    # empty frame, in case the video port frame is not available
+    engine = capture_engine                                       # local reference, as capture_stop can release the global one
+    recorder = frames_recorder                                    # local reference, as the main thread can release the global one
+    if engine != None:                                            # case the continuous capture (video port) is running
+        frame, seq, stamp = engine.read(after)                    # newest frame captured after the 'after' time
+        if frame is None:                                         # case the video port frame is not available
+            print('Video port frame not available, back to still capture')  # feedback is print to the terminal
+            capture_stop()                                        # capture engine is stopped
+            engine = None                                         # still capture is used
+    
+    if engine == None:                                            # case the still capture is used
+        camera.capture(rawCapture, format='bgr')                  # bgr is the picamera format directly compatible with CV2
+        frame = rawCapture.array                                  # picamera array allows usgae of numpy array
     if len(frame)==0:                                             # case the frame is empty
         print('Webcam frame not available')                       # feedback is print to the terminal
     
     else:                                                         # case the frame is not empty
-        if not picamera_test:                                     # case picamera_test is false
-            frame, w, h = frame_cropping(frame, width, height, x_l, x_r, y_u, y_b)  # frame is cropped in order to limit the image area to analyze
-            frame, w, h = warp_image(frame, w, h, w_f, w_s)       # frame is warped to have a top like view toward the top cube face
-            scale = 0.75 if cv_wow else 0.8                       # scaling factor according to cv_wow i 
-            frame, w, h = frame_resize(frame, w, h, scale=scale)  # frame is resized (to smaller size), to gain some speed
+        if not picamera_test and frame.ndim == 2:                 # case of YUV frame (luma capture mode)
+            raw_frame = frame.copy()                              # raw YUV frame is kept for the colors reading at face lock
+            if recorder != None and side > 0:                     # case frames are recorded (--record argument)
+                recorder.add(cv2.cvtColor(frame, cv2.COLOR_YUV2BGR_I420), side, camera, cam_led_bright) # BGR frame is added to the capture
+            frame, w, h = frame_geometry(frame[:height], detect_scale)  # Y plane is cropped, warped and resized via cached remap maps
+        
+        elif not picamera_test:                                   # case picamera_test is false
+            if recorder != None and side > 0:                     # case frames are recorded (--record argument)
+                recorder.add(frame, side, camera, cam_led_bright) # raw frame is added to the capture
+            if cv_wow:                                            # case cv_wow (pre_warp and after_warp images are needed)
+                frame, w, h = frame_cropping(frame, width, height, x_l, x_r, y_u, y_b)  # frame is cropped in order to limit the image area to analyze
+                frame, w, h = warp_image(frame, w, h, w_f, w_s)   # frame is warped to have a top like view toward the top cube face
+                frame, w, h = frame_resize(frame, w, h, scale=0.75)  # frame is resized (to smaller size), to gain some speed
+            elif detect_scale < 0.8:                              # case of coarse detection mode
+                raw_frame = frame.copy()                          # raw frame is kept for the colors reading at face lock
+                frame, w, h = frame_geometry(frame, detect_scale) # frame is cropped, warped and resized (coarse) via cached remap maps
+            else:                                                 # case cv_wow is False
+                frame, w, h = frame_geometry(frame)               # frame is cropped, warped and resized via cached remap maps
         
         elif picamera_test:                                       # case picamera_test is True:
             w = width                                             # widht is assigned to w
             h = height                                            # height is assigned to h
         
         oneframe = True                                           # flag for a single frame analysis at the time
-        rawCapture.truncate(0)                                    # empties the array in between each camera's capture      
+        if engine == None:                                        # case the still capture is used
+            rawCapture.truncate(0)                                # empties the array in between each camera's capture      
 
         return frame, w, h
 
@@ -553,6 +710,129 @@ def read_camera():
 
 
             
+def fine_frame(facelets, raw_frame, w, h):
+    """ Returns the BGR frame for the colors reading, when the facelets are detected on a different frame: the Y plane
+    (luma capture mode) and/or a smaller frame (coarse detection mode, detect_scale < 0.8).
+    The raw frame (YUV or BGR) is cropped, warped and resized at the usual 0.8 scale; the facelets found on the
+    detection frame (w x h) are mapped to the returned frame, so that read_color and face_image work as usual.
+    This is called once per locked face."""
+    
+    if raw_frame.ndim == 2:                                       # case of raw YUV frame (luma capture mode)
+        raw_frame = cv2.cvtColor(raw_frame, cv2.COLOR_YUV2BGR_I420)  # raw YUV (I420) frame is converted to BGR
+    frame, ww, hh = frame_geometry(raw_frame)                     # frame is cropped, warped and resized via cached remap maps
+    
+    if ww != w or hh != h:                                        # case the detection frame has a different scale
+        k = np.array([ww/w, hh/h])                                # scale factors from the detection frame to the colors frame
+        for facelet in facelets:                                  # iteration over the facelets
+            # pixel centers are mapped like cv2.resize does: x_fine = (x + 0.5) * k - 0.5
+            facelet['cx'] = int(round((facelet['cx'] + 0.5) * k[0] - 0.5))  # facelet center x coordinate
+            facelet['cy'] = int(round((facelet['cy'] + 0.5) * k[1] - 0.5))  # facelet center y coordinate
+            facelet['area'] = facelet['area'] * k[0] * k[1]       # facelet area
+            for key in ('contour', 'cont_ordered'):               # facelet contours
+                pts = np.asarray(facelet[key])                    # contour points as array
+                facelet[key] = np.round((pts + 0.5) * k - 0.5).astype(pts.dtype)  # contour points mapped to the colors frame
+    
+    return facelets, frame, ww, hh
+
+
+
+
+
+
+
+def capture_start():
+    """ Starts the continuous PiCamera capture (video port) on a background thread, if enabled by the settings.
+    This is used during the cube status detection, after the PiCamera warmup and the gains setting.
+    Luma capture mode (YUV) requires a frame width multiple of 32 and height multiple of 16 (no padding)."""
+    
+    global capture_engine
+    
+    if cam_video_port and capture_engine == None:                 # case video port is enabled, and the engine isn't running
+        fmt = 'bgr'                                               # BGR capture format
+        if cam_luma and not cv_wow:                               # case the luma capture mode is enabled (not compatible with cv_wow)
+            if width%32 == 0 and height%16 == 0:                  # case the YUV frame has no padding
+                fmt = 'yuv'                                       # YUV capture format
+            else:                                                 # case the YUV frame would have padding
+                print('Luma capture mode requires width multiple of 32 and height multiple of 16')  # feedback is printed to the terminal
+        capture_engine = capture.CaptureEngine(camera, width, height, fmt)  # capture engine with preallocated buffers
+        capture_engine.start()                                    # capture thread is started
+        if debug:                                                 # case debug variable is set true on __main__
+            print('Started the continuous capture via video port')  # feedback is printed to the terminal
+
+
+
+
+
+
+
+def capture_stop():
+    """ Stops the continuous PiCamera capture (video port), if running."""
+    
+    global capture_engine
+    
+    engine = capture_engine                                       # local reference to the capture engine
+    capture_engine = None                                         # capture engine is released, before stopping it
+    if engine != None:                                            # case the capture engine is running
+        engine.stop()                                             # capture thread is stopped
+        if debug:                                                 # case debug variable is set true on __main__
+            print(f'Stopped the continuous capture, after {engine.seq} frames')  # feedback is printed to the terminal
+
+
+
+
+
+
+
+def vision_stage(after):
+    """ Geometry/edge stage of the vision pipeline, running on its own thread.
+    It gets the newest frame (captured after the 'after' time), then it crops/warps/resizes it and it
+    retrieves the contours; OpenCV releases the GIL, so this overlaps with the contours analysis in cubeAF."""
+    
+    frame, w, h = read_camera(after=after)              # newest frame captured after the 'after' time, and dimensions
+    (contours, hierarchy) = read_facelets(frame, w, h)  # reads cube's facelets and returns the contours
+    return frame, w, h, contours, hierarchy, raw_frame  # frame, dimensions, contours and raw frame are returned to the pipeline queue
+
+
+
+
+
+
+
+def pipeline_start(after):
+    """ Starts the vision pipeline stage (frame geometry, edges and contours) on a background thread.
+    The pipeline is used only with the continuous capture running, and without screen (cv2 windows are
+    kept on the main thread)."""
+    
+    global vision_pipeline
+    
+    if capture_engine != None and not screen and vision_pipeline == None:  # case of video port capture, and no screen
+        vision_pipeline = capture.StageThread(vision_stage)   # pipeline stage, with bounded (drop oldest) queue
+        vision_pipeline.flush(after)                          # results will be based on frames taken after the 'after' time
+        vision_pipeline.start()                               # pipeline thread is started
+
+
+
+
+
+
+
+def pipeline_stop():
+    """ Stops the vision pipeline stage, if running."""
+    
+    global vision_pipeline
+    
+    if vision_pipeline != None:                               # case the vision pipeline is running
+        vision_pipeline.stop()                                # pipeline thread is stopped, and the queue is flushed
+        if debug:                                             # case debug variable is set true on __main__
+            print(f'Stopped the vision pipeline, dropped frames: {vision_pipeline.queue.dropped}')  # feedback is printed to the terminal
+        vision_pipeline = None                                # vision pipeline is released
+
+
+
+
+
+
+
 def frame_cropping(frame, width, height, x_l, x_r, y_u, y_b):
     """Frame cropping, to prevent reading the back cube side and to increase overal speed.
     Due to short camera distance from the cube, all the PiCamera sensor area is used,
@@ -646,42 +926,128 @@ def frame_resize(frame_w, ww, hh, scale=0.8):
 
 
 
-def edge_analysis(frame, w, h):
+def geometry_maps(width, height, x_l, x_r, y_u, y_b, w_f, w_s, scale):
+    """ Builds the cv2.remap maps, combining the frame_cropping, warp_image and frame_resize steps.
+    Each pixel of the final (analysis) frame is mapped back to its raw frame coordinates, by the same
+    perspective matrix of warp_image; pixels falling outside the cropped area are mapped to -1, so
+    that they get black as with the warpPerspective border."""
+
+    w = width - x_l - x_r                                    # cropped frame width
+    h = height - y_u - y_b                                   # cropped frame height
+
+    grid_vertices = np.float32([[0,0], [h,0], [h,w], [0,w]]) # original frame vertices (as in warp_image)
+    d_x = int(w/w_f)                                         # pixels to 'remove' on top left and top righ sides of frame
+    straight = 1+d_x/h                                       # corrects the cube face deformation
+    warped_vertices = np.float32([[d_x,0], [h,0], [int(straight*h),w], [-d_x, w]])  # frame coordinates for the transformation matrix
+    matrix = cv2.getPerspectiveTransform(warped_vertices, grid_vertices)            # compute perspective matrix
+    inv_matrix = np.linalg.inv(matrix)                       # inverse matrix, from the warped frame to the cropped frame
+
+    w_w = max(w,h) - int(d_x/w_s)                            # warped (and sliced) frame width
+    h_w = max(w,h) - d_x                                     # warped (and sliced) frame height
+    ww = int(w_w * scale)                                    # final frame width
+    hh = int(h_w * scale)                                    # final frame height
+
+    x_w = (np.arange(ww, dtype=np.float64) + 0.5) * (w_w/ww) - 0.5  # final frame columns, as warped frame coordinates
+    y_w = (np.arange(hh, dtype=np.float64) + 0.5) * (h_w/hh) - 0.5  # final frame rows, as warped frame coordinates
+    x_w, y_w = np.meshgrid(x_w, y_w)                         # warped frame coordinates grid
+
+    den = inv_matrix[2,0]*x_w + inv_matrix[2,1]*y_w + inv_matrix[2,2]                      # perspective denominator
+    map_x = (inv_matrix[0,0]*x_w + inv_matrix[0,1]*y_w + inv_matrix[0,2]) / den            # cropped frame x coordinates
+    map_y = (inv_matrix[1,0]*x_w + inv_matrix[1,1]*y_w + inv_matrix[1,2]) / den            # cropped frame y coordinates
+
+    outside = (map_x < 0) | (map_x > w-1) | (map_y < 0) | (map_y > h-1)  # pixels outside the cropped frame
+    map_x = map_x + x_l                                      # cropped x coordinates are shifted to the raw frame
+    map_y = map_y + y_u                                      # cropped y coordinates are shifted to the raw frame
+    map_x[outside] = -1                                      # outside pixels are mapped outside the raw frame (black border)
+    map_y[outside] = -1                                      # outside pixels are mapped outside the raw frame (black border)
+
+    # fixed point maps, faster on the Raspberry Pi than the float ones
+    map1, map2 = cv2.convertMaps(map_x.astype(np.float32), map_y.astype(np.float32), cv2.CV_16SC2)
+
+    return map1, map2, ww, hh
+
+
+
+
+
+
+
+def frame_geometry(frame, scale=0):
+    """ Returns the analysis frame (cropped, warped and resized) in a single cv2.remap call.
+    The remap maps are cached per key; maps for a new key are built when a parameter changes (i.e. when the
+    crop and warp settings are changed via the servo GUI, and then re-imported).
+    Scale 0 means the usual scaling factor (0.8, or 0.75 with cv_wow).
+    The remap samples bilinearly (INTER_LINEAR) also where frame_resize used INTER_AREA (not Rpi_ZeroW boards):
+    pixels are slightly less averaged, while the facelets colors (averaged over the facelet area) change by less
+    than 1 BGR level on average (Cubotino_m_replay.py --geometry measures it on a recorded capture)."""
+
+    if scale == 0:                                          # case of default scale
+        scale = 0.75 if cv_wow else 0.8                     # scaling factor according to cv_wow
+    key = (width, height, x_l, x_r, y_u, y_b, w_f, w_s, scale)  # parameters defining the remap maps
+    if key not in geometry_cache:                           # case the maps are not cached, or the settings have changed
+        geometry_cache[key] = geometry_maps(*key)           # maps are built and cached, with their key
+
+    map1, map2, w, h = geometry_cache[key]                  # cached maps and final frame dimensions
+    frame = cv2.remap(frame, map1, map2, cv2.INTER_LINEAR, borderMode=cv2.BORDER_CONSTANT, borderValue=(0,0,0))
+
+    return frame, w, h
+
+
+
+
+
+
+
+def edge_analysis(frame, w, h, branch=None):
     """ Image analysis that returns a black & white image, based on the colors borders.
-        From 30th July 2022 differentiated the analysis for cube with /withouth the black frame around the facelets."""
+        From 30th July 2022 differentiated the analysis for cube with /withouth the black frame around the facelets.
+        With frameless_cube 'auto', once a face is locked only the branch that locked it ('false' or 'true') is used;
+        branch argument forces the branch ('false', 'true' or 'auto'), otherwise it follows the settings."""
     
     if cv_wow and screen:                                    # case screen and cv_wow variables are set true on __main__
         global gray, blurred, canny, dilated, eroded         # images are set as global variable
 
-    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)           # from BGR color space to gray scale
+    # on coarse detection mode (detect_scale < 0.8) the dilate/erode iterations are scaled, as the facelets gaps are smaller
+    k = detect_scale/0.8 if detect_scale < 0.8 and not cv_wow else 1  # iterations scaling factor
+    it = lambda n: max(1, int(round(n*k)))                   # scaled iterations, at least one
+    
+    if frame.ndim == 2:                                      # case of Y plane frame (luma capture mode)
+        gray = frame                                         # the Y plane is already a gray scale image
+    else:                                                    # case of BGR frame
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)       # from BGR color space to gray scale
+    
+    if branch == None:                                       # case the edge analysis branch isn't forced
+        branch = frameless_cube                              # edge analysis branch, as per frameless_cube setting
+        if branch == 'auto' and auto_branch != None:         # case of 'auto', with the branch that locked the previous faces
+            branch = auto_branch                             # only the branch that locked the previous faces is used
     
-    if frameless_cube == 'false':                            # case the cube has black frame around the facelets
+    if branch == 'false':                                    # case the cube has black frame around the facelets
         blurred = cv2.GaussianBlur(gray, (5, 5), 0)          # low pass gaussian filter, with a 5x5 gaussian filter (9x9 until 30th July 2022)
         canny = cv2.Canny(blurred, 10, 30)                   # single pixel edges, with intensity gradient range 10 to 30
         kernel = np.ones((5,5), np.uint8)                    # kernel of 5x5 pixels for the dilate transformation
-        dilated = cv2.dilate(canny, kernel, iterations = 4)  # higher "iterations" is overall faster
+        dilated = cv2.dilate(canny, kernel, iterations = it(4))  # higher "iterations" is overall faster
         kernel = np.ones((3,3), np.uint8)                    # smaller kernel is used for the erosion
-        eroded = cv2.erode(dilated, kernel, iterations = 2)  # smaller "iterations" keeps the contour apart from the edges
+        eroded = cv2.erode(dilated, kernel, iterations = it(2))  # smaller "iterations" keeps the contour apart from the edges
     
-    elif frameless_cube == 'true':                           # case the cube is a frameless cube
+    elif branch == 'true':                                   # case the cube is a frameless cube
         blurred = cv2.bilateralFilter(gray, 3, 80, 80)       # low pass bilateral filter, to de-noise while safegarding edges
         canny = cv2.Canny(blurred, 4, 25)                    # single pixel edges, with intensity gradient range 4 to 25
         kernel = np.ones((7,7), np.uint8)                    # kernel of 7x7 pixels for the dilate transformation
-        dilated = cv2.dilate(canny, kernel, iterations = 4)  # higher "iterations" is overall faster
+        dilated = cv2.dilate(canny, kernel, iterations = it(4))  # higher "iterations" is overall faster
         kernel = np.ones((5,5), np.uint8)                    # smaller kernel is used for the erosion
-        eroded = cv2.erode(dilated, kernel, iterations = 1)  # smaller "iterations" keeps the contour apart from the edges
+        eroded = cv2.erode(dilated, kernel, iterations = it(1))  # smaller "iterations" keeps the contour apart from the edges
     
-    # note: when frameless_cube == 'auto' the cube detection takes slightly longer
-    elif frameless_cube == 'auto':                           # case for cubes with and without the black frame around the facelets
+    # note: when frameless_cube == 'auto' the cube detection takes slightly longer (both branches until the first face lock)
+    elif branch == 'auto':                                   # case for cubes with and without the black frame around the facelets
         blurred = cv2.GaussianBlur(gray, (5, 5), 0)          # low pass gaussian filter, with a 5x5 gaussian filter
         canny_01 = cv2.Canny(blurred, 10, 30)                # single pixel edges, with intensity gradient range 10 to 30
         blurred = cv2.bilateralFilter(gray,4, 200, 200)  # 3, 80, 80)        # low pass bilateral filter, to de-noise while safegarding edges
         canny_02 = cv2.Canny(blurred, 4, 25)                 # single pixel edges, with intensity gradient range 4 to 25
         canny = cv2.bitwise_or(canny_01, canny_02, mask = None) # canny image, by (OR) combining those generated with parameters with and without frames
         kernel = np.ones((7,7), np.uint8)                    # kernel of 7x75 pixels for the dilate transformation
-        dilated = cv2.dilate(canny, kernel, iterations = 3)  # higher "iterations" is overall faster
+        dilated = cv2.dilate(canny, kernel, iterations = it(3))  # higher "iterations" is overall faster
         kernel = np.ones((3,3), np.uint8)                    # smaller kernel is used for the erosion
-        eroded = cv2.erode(dilated, kernel, iterations = 2)  # smaller "iterations" keeps the contour apart from the edges
+        eroded = cv2.erode(dilated, kernel, iterations = it(2))  # smaller "iterations" keeps the contour apart from the edges
     
 ############ visual check edge detection #############
 #     cv2.imshow("Gray", gray)           # gray is shown, on a window called Gray
@@ -826,35 +1192,22 @@ def distance_deviation(data, delta=0.3):
     -------------    
     """
     
-    d_to_exclude = []        # list of the contour index to be removed, due to excess of distance deviation
-    distance_list_h = []     # list of the horizontal distance, of each contour from the median one
-    distance_list_v = []     # list of the vertical distance, of each contour from the median one
-    
-    points_h=[1,2,4,5,7,8]   # coordinates, defining a segment with a previous coordinate,for 6 'horizontal' distances
-    for i in points_h:       # iteration over the 6 coordinates
-        j=i-1                # the other coordinate used for the segment length
-        # horizontal distance between the contours centers
-        dist=math.sqrt((data[i]['cx']-data[j]['cx'])**2 + (data[i]['cy']-data[j]['cy'])**2)
-        distance_list_h.append(dist)  # list with horizontal distance between the contours centers
-
-    points_v=[3,4,5,6,7,8]   # coordinates, defining a segment with a previous coordinate,for 6 'vertical' distances
-    for i in points_v:       # iteration over the 6 coordinates
-        k=i-3                # the other coordinate used for the segment length
-        # vertical distance between the contours centers
-        dist=math.sqrt((data[i]['cx']-data[k]['cx'])**2 + (data[i]['cy']-data[k]['cy'])**2)
-        distance_list_v.append(dist)  # list with vertical distance between the contours centers
-
-    dist_median_h = median(distance_list_h)                           # median value for horiz distances
-    for i in range(len(distance_list_h)):                             # iteration over the list with the (expected 6) horizontal distance
-        delta_dist_h=(distance_list_h[i]-dist_median_h)/dist_median_h # deviation in horiz distance
-        if delta_dist_h > delta:                                      # filter if horiz deviation > threshold
-            d_to_exclude.append(i) # list with contours indexto exlude, due excess on horiz deviation from median
-
-    dist_median_v = median(distance_list_v)                           # median value for vert distances
-    for i in range(len(distance_list_v)):                             # iteration over the list with the (expected 6) vertical distance
-        delta_dist_v=(distance_list_v[i]-dist_median_v)/dist_median_v # deviation in vert distance
-        if delta_dist_v > delta and i not in d_to_exclude: # filter if horiz deviation > threshold
-            d_to_exclude.append(i)  # list with contours indexto exlude, due excess on vert deviation from median
+    c = np.array([(f['cx'], f['cy']) for f in data], dtype=np.float64)  # array with the 9 contours centers
+    
+    # horizontal distances between the contours centers, on 6 segments (1-0, 2-1, 4-3, 5-4, 7-6, 8-7)
+    distance_list_h = np.hypot(*(c[[1,2,4,5,7,8]] - c[[0,1,3,4,6,7]]).T)
+    
+    # vertical distances between the contours centers, on 6 segments (3-0, 4-1, 5-2, 6-3, 7-4, 8-5)
+    distance_list_v = np.hypot(*(c[3:9] - c[0:6]).T)
+    
+    dist_median_h = np.median(distance_list_h)                                  # median value for horiz distances
+    dist_median_v = np.median(distance_list_v)                                  # median value for vert distances
+    exclude_h = (distance_list_h - dist_median_h)/dist_median_h > delta         # filter if horiz deviation > threshold
+    exclude_v = (distance_list_v - dist_median_v)/dist_median_v > delta         # filter if vert deviation > threshold
+    
+    # list with contours index to exlude, due excess on horiz deviation from median, followed by the vertical ones
+    d_to_exclude = np.flatnonzero(exclude_h).tolist()
+    d_to_exclude += [i for i in np.flatnonzero(exclude_v).tolist() if i not in d_to_exclude]
     
     return d_to_exclude
 
@@ -872,14 +1225,40 @@ def read_facelets(frame, w, h):
     Contour's tree is used (cv2.RETR_TREE), to identify children contours (contours within other contrours)
     Approximation (v2.CHAIN_APPROX_SIMPLE) reduces the amount of pixel down to only vertes."""
     
-    global prev_side
+    global prev_side, roi, roi_fails, auto_branch, auto_fails
  
-    if side!=prev_side:                           # case the current side differs from the previous side
-        if debug:                                 # case debug variable is set true on __main__
-            print()                               # print an empty line to the terminal
-        print(f'Reading side {sides[side]}')      # feedback is printed to the terminal
-        prev_side=side                            # current side is assigned to previous side variable
-
+    with side_lock:                               # prev_side is also set by fcs_first_frame, on the main thread
+        if side!=prev_side:                       # case the current side differs from the previous side
+            if debug:                             # case debug variable is set true on __main__
+                print()                           # print an empty line to the terminal
+            print(f'Reading side {sides[side]}')  # feedback is printed to the terminal
+            prev_side=side                        # current side is assigned to previous side variable
+    
+    if not frame_admission(frame):                # case the frame is moving or blurred
+        return ((), None)                         # no contours are returned
+    
+    if roi != None:                               # case the ROI is set (from the last locked face)
+        roi_fails += 1                            # frames counter without face lock is incremented
+        if roi_fails > roi_frames:                # case too many frames without face lock
+            roi = None                            # ROI is widened back to the full frame
+            if debug:                             # case debug variable is set true on __main__
+                print(f'ROI widened to full frame, after {roi_frames} frames without face lock')  # feedback is printed to the terminal
+    
+    if frameless_cube == 'auto' and auto_branch != None:  # case of 'auto', with a single edge analysis branch
+        auto_fails += 1                           # frames counter without face lock is incremented
+        if auto_fails > auto_frames:              # case too many frames without face lock
+            auto_branch = None                    # both the edge analysis branches are used
+            if debug:                             # case debug variable is set true on __main__
+                print(f'Both edge analysis branches in use, after {auto_frames} frames without face lock')  # feedback is printed to the terminal
+    
+    if roi != None:                               # case the ROI is set
+        x0, y0, x1, y1 = roi                      # ROI top left and bottom right coordinates
+        image, _, _ = edge_analysis(frame[y0:y1, x0:x1], x1-x0, y1-y0)  # image edges analysis is applied to the ROI only
+        
+        # contours are searched on the ROI, and shifted (offset) to the full frame coordinates
+        (contours, hierarchy) = cv2.findContours(image, cv2.RETR_TREE, cv2.CHAIN_APPROX_SIMPLE, offset=(x0, y0))
+        return (contours, hierarchy)              # contours are returned
+    
     image, w, h = edge_analysis(frame, w, h)      # image edges analysis is applied to the frame
     
     (contours, hierarchy) = cv2.findContours(image, cv2.RETR_TREE, cv2.CHAIN_APPROX_SIMPLE)  # contours are searched on the image
@@ -894,6 +1273,241 @@ def read_facelets(frame, w, h):
 
 
 
+def frame_admission(frame):
+    """ Admission gate, to skip the frames still moving or blurred after the cube has been flipped or spun.
+    A small gray thumbnail (160 pixels wide) is made from the frame: the motion score is the mean difference from
+    the previous frame thumbnail, the sharpness score is the thumbnail Laplacian variance.
+    Frames are rejected when the motion score exceeds gate_motion, or when the sharpness is below gate_blur times the
+    sharpest frame of the side; After 5 consecutive rejections a frame is anyhow admitted.
+    The first frame after gate_reset is held (rejected): without a previous thumbnail there isn't a motion score,
+    and it is likely the frame taken just after the cube move, that shouldn't become the sharpness reference.
+    Returns True when the frame is admitted to the edges and contours analysis; Counters are on prune_stats."""
+    
+    global gate_thumb, gate_sharp, gate_skipped
+    
+    if gate_motion <= 0 and gate_blur <= 0:       # case the admission gate is disabled by the settings
+        return True                               # frame is admitted
+    
+    t = time.time()                               # time reference
+    hh, ww = frame.shape[:2]                      # frame dimensions
+    size = (160, max(1, int(160*hh/ww)))          # thumbnail dimensions
+    thumb = cv2.resize(frame, size, interpolation=cv2.INTER_LINEAR)  # frame thumbnail (linear is much faster than area)
+    if thumb.ndim == 3:                           # case of BGR thumbnail
+        thumb = cv2.cvtColor(thumb, cv2.COLOR_BGR2GRAY)  # thumbnail is converted to gray scale
+    
+    if gate_thumb is None or gate_thumb.shape != thumb.shape:  # case of no previous thumbnail (first frame of the side)
+        gate_thumb = thumb                        # thumbnail is stored for the next frame
+        prune_stats['gate_time'] += time.time() - t  # admission gate time
+        prune_stats['held'] += 1                  # held frames counter
+        return False                              # frame is held, as the motion score isn't available
+    
+    sharp = cv2.meanStdDev(cv2.Laplacian(thumb, cv2.CV_32F))[1][0][0]**2  # sharpness score (Laplacian variance)
+    motion = cv2.absdiff(thumb, gate_thumb).mean()  # motion score (mean difference from the previous thumbnail)
+    gate_thumb = thumb                            # thumbnail is stored for the next frame
+    
+    reason = ''                                   # reason to reject the frame
+    if gate_motion > 0 and motion > gate_motion:  # case the frame differs too much from the previous one
+        reason = 'motion'                         # frame is moving
+    elif gate_blur > 0 and sharp < gate_blur * gate_sharp:  # case the frame is much less sharp than the sharpest one
+        reason = 'blur'                           # frame is blurred
+    if reason != 'motion':                        # case the frame isn't moving
+        gate_sharp = max(gate_sharp, sharp)       # sharpest frame of the side
+    
+    prune_stats['gate_time'] += time.time() - t   # admission gate time
+    if reason != '' and gate_skipped < 5:         # case the frame is rejected, and not too many consecutive rejections
+        gate_skipped += 1                         # consecutive rejections counter is incremented
+        prune_stats[reason] += 1                  # rejected frames counter, per reason
+        if debug:                                 # case debug variable is set true on __main__
+            print(f'Frame rejected by the admission gate ({reason}: motion {motion:.1f}, sharpness {sharp:.0f})')  # feedback is printed to the terminal
+        return False                              # frame is rejected
+    
+    gate_skipped = 0                              # consecutive rejections counter is reset
+    prune_stats['admitted'] += 1                  # admitted frames counter
+    return True                                   # frame is admitted
+
+
+
+
+
+
+
+def gate_reset():
+    """ Resets the admission gate references (previous thumbnail and sharpest frame), when the cube is moved to the next side."""
+    
+    global gate_thumb, gate_sharp, gate_skipped
+    gate_thumb, gate_sharp, gate_skipped = None, 0, 0  # previous thumbnail, sharpest frame score and consecutive rejections
+
+
+
+
+
+
+
+def roi_update(facelets, w, h):
+    """ Sets the ROI (Region Of Interest) for the edges and contours analysis, as the bounding box of the
+    last locked 3x3 facelets grid plus a margin; The cube sits in nearly the same frame position for all the sides.
+    The ROI is not used with cv_wow, as the cv_wow images (gray, blurred, etc) are expected on the full frame."""
+    
+    global roi, roi_fails
+    
+    if roi_frames <= 0 or cv_wow:                 # case the ROI is disabled by the settings, or cv_wow is set true
+        return                                    # function is terminated
+    
+    pts = np.concatenate([np.reshape(np.asarray(f['cont_ordered']), (-1,2)) for f in facelets]) # facelets vertices
+    x_min, y_min = np.min(pts, axis=0)            # top left coordinates of the facelets bounding box
+    x_max, y_max = np.max(pts, axis=0)            # bottom right coordinates of the facelets bounding box
+    margin = int(0.25 * max(x_max-x_min, y_max-y_min))  # margin around the bounding box (a bit less than a facelet)
+    
+    x0 = max(0, int(x_min) - margin)              # ROI left side, limited to the frame
+    y0 = max(0, int(y_min) - margin)              # ROI top side, limited to the frame
+    x1 = min(w, int(x_max) + margin)              # ROI right side, limited to the frame
+    y1 = min(h, int(y_max) + margin)              # ROI bottom side, limited to the frame
+    
+    if x1 - x0 > 10 and y1 - y0 > 10:             # case the ROI has a reasonable size
+        roi = (x0, y0, x1, y1)                    # ROI coordinates are assigned to the global variable
+        roi_fails = 0                             # frames counter without face lock is reset
+
+
+
+
+
+
+
+def prefilter_contours(contours, w, h):
+    """ Array based prefilter of the contours, before the (per contour) approximation and square checks.
+    Areas (shoelace formula) and bounding boxes of all the contours are calculated at once, on the concatenated points.
+    Discarded contours are those having less than 4 points, the bounding box area smaller than the min facelet area
+    (the approximated contour is within the bounding box), an area much larger than the max facelet area or a very
+    elongated bounding box.
+    Returns a boolean list (True for contours to be analysed), and updates the prune_stats counters."""
+    
+    if len(contours) == 0:                                          # case of no contours
+        return []                                                   # empty list is returned
+    
+    t = time.time()                                                 # time reference
+    min_area = int(0.08*(w*h)/9)                                    # min area limit for a single facelet's contour (as in get_facelets)
+    max_area = 6*min_area                                           # max area limit for a single facelet's contour (as in get_facelets)
+    
+    n_pts = np.array([len(c) for c in contours])                    # number of points of each contour
+    starts = np.concatenate(([0], np.cumsum(n_pts)[:-1]))           # index of the first point of each contour
+    pts = np.concatenate(contours).reshape(-1, 2).astype(np.float64)  # points of all the contours
+    x, y = pts[:,0], pts[:,1]                                       # x and y coordinates of the points
+    nxt = np.arange(1, len(pts) + 1)                                # index of the following point
+    nxt[starts + n_pts - 1] = starts                                # the last point of each contour is followed by the first one
+    area = np.abs(np.add.reduceat(x*y[nxt] - x[nxt]*y, starts))/2  # contours area (as cv2.contourArea)
+    bw = np.maximum.reduceat(x, starts) - np.minimum.reduceat(x, starts)  # bounding box width
+    bh = np.maximum.reduceat(y, starts) - np.minimum.reduceat(y, starts)  # bounding box height
+    
+    few = n_pts < 4                                                 # contours that can't be approximated to 4 corners
+    small = ~few & (bw * bh <= min_area)                            # contours smaller than a facelet
+    large = ~few & ~small & (area > 4*max_area)                     # contours much larger than a facelet
+    aspect = ~few & ~small & ~large & (np.minimum(bw, bh) < 0.5*rhombus_ratio*np.maximum(bw, bh))  # very elongated contours
+    keep = ~(few | small | large | aspect)                          # contours to be analysed
+    
+    prune_stats['frames'] += 1                                      # frames counter
+    prune_stats['contours'] += len(contours)                        # contours counter
+    prune_stats['points'] += int(np.sum(few))                       # contours pruned for less than 4 points
+    prune_stats['small'] += int(np.sum(small))                      # contours pruned for too small bounding box
+    prune_stats['large'] += int(np.sum(large))                      # contours pruned for too large area
+    prune_stats['aspect'] += int(np.sum(aspect))                    # contours pruned for too elongated bounding box
+    prune_stats['time'] += time.time() - t                          # prefilter time
+    
+    return keep.tolist()                                            # list of booleans, True for the contours to be analysed
+
+
+
+
+
+
+
+def prune_report():
+    """ Prints the prefilter and contours analysis counters, as average per frame."""
+    
+    s = prune_stats                                                 # prune_stats assigned to a local short variable name
+    gated = s['admitted'] + s['held'] + s['motion'] + s['blur']     # frames checked by the admission gate
+    if gated > 0:                                                   # case the admission gate is enabled
+        print(f"\nAdmission gate: admitted {s['admitted']},  held {s['held']},  rejected for motion {s['motion']},  for blur {s['blur']},   "
+              f"gate time: {1000*s['gate_time']/gated:.2f} ms per frame")
+    if s['frames'] == 0:                                            # case no frames have been analysed
+        return                                                      # function is terminated
+    n = s['frames']                                                 # frames analysed
+    print(f"\nContours per frame (average on {n} frames): {s['contours']/n:.1f}")
+    print(f"  pruned by prefilter:  points<4 {s['points']/n:.1f},  small {s['small']/n:.1f},  large {s['large']/n:.1f},  aspect {s['aspect']/n:.1f}")
+    print(f"  pruned by analysis:   corners!=4 {s['corners']/n:.1f},  area {s['area']/n:.1f},  square {s['square']/n:.1f}")
+    print(f"  facelets candidates:  {s['facelets']/n:.1f},   prefilter time: {1000*s['time']/n:.2f} ms")
+
+
+
+
+
+
+
+def prune_reset():
+    """ Resets the prefilter and contours analysis counters."""
+    
+    global prune_stats
+    prune_stats = {'frames':0, 'contours':0, 'points':0, 'small':0, 'large':0, 'aspect':0,
+                   'corners':0, 'area':0, 'square':0, 'facelets':0, 'time':0,
+                   'admitted':0, 'held':0, 'motion':0, 'blur':0, 'gate_time':0}
+
+
+
+
+
+
+
+def auto_branch_update(frame, facelets):
+    """ With frameless_cube 'auto', it selects the edge analysis branch for the next frames and cycles.
+    When the face has been locked with both the branches, the locked frame (before any drawing) is analysed by each
+    branch on the face area: the branch having more 4 corners contours matching the locked facelets is chosen, and
+    the framed branch ('false') is preferred on a tie, being faster; no branch is chosen if none matches the facelets."""
+    
+    global auto_branch, auto_fails
+    
+    auto_fails = 0                                          # frames counter without face lock is reset
+    if frameless_cube != 'auto' or auto_frames <= 0 or auto_branch != None or frame is None:  # case no selection is needed
+        return                                              # function is terminated
+    
+    h, w = frame.shape[:2]                                  # frame dimensions
+    centers = np.array([(f['cx'], f['cy']) for f in facelets], dtype=np.float64)  # locked facelets centers
+    pts = np.concatenate([np.reshape(np.asarray(f['contour']), (-1,2)) for f in facelets])  # locked facelets vertices
+    x_min, y_min = np.min(pts, axis=0)                      # top left coordinates of the facelets bounding box
+    x_max, y_max = np.max(pts, axis=0)                      # bottom right coordinates of the facelets bounding box
+    margin = int(0.25 * max(x_max-x_min, y_max-y_min))      # margin around the bounding box (a bit less than a facelet)
+    x0, y0 = max(0, int(x_min) - margin), max(0, int(y_min) - margin)   # top left corner of the face area
+    x1, y1 = min(w, int(x_max) + margin), min(h, int(y_max) + margin)   # bottom right corner of the face area
+    
+    min_area = int(0.08*(w*h)/9)                            # min area limit for a single facelet's contour (as in get_facelets)
+    max_area = 6*min_area                                   # max area limit for a single facelet's contour (as in get_facelets)
+    tol = 0.25 * np.sqrt(np.median([f['area'] for f in facelets]))  # max distance of a contour center from a facelet center
+    
+    matches = {}                                            # dict with the matched facelets per branch
+    for branch in ('false', 'true'):                        # iteration over the framed and frameless branches
+        image, _, _ = edge_analysis(frame[y0:y1, x0:x1], x1-x0, y1-y0, branch)  # edges analysis with the branch only
+        (contours, hierarchy) = cv2.findContours(image, cv2.RETR_TREE, cv2.CHAIN_APPROX_SIMPLE, offset=(x0, y0))
+        found = np.zeros(len(facelets), dtype=bool)         # facelets matched by a branch contour
+        if hierarchy is not None:                           # case of contours
+            for component in zip(contours, hierarchy[0]):   # each contour is analyzed
+                contour, _, corners = get_approx_contours(component)  # contours are approximated
+                if corners != 4 or not min_area < cv2.contourArea(contour) < max_area:  # case of contours not facelet like
+                    continue                                # next contour
+                M = cv2.moments(contour)                    # the shape moment (center) of the contour is retrieved
+                if M['m00']:                                # case the contour has an area
+                    c = np.array((M['m10']/M['m00'], M['m01']/M['m00']))  # contour center
+                    found |= np.hypot(*(centers - c).T) < tol  # facelets having the contour center nearby
+        matches[branch] = int(np.sum(found))                # matched facelets by the branch
+    
+    if max(matches.values()) > 0:                           # case at least one branch matches the locked facelets
+        auto_branch = 'false' if matches['false'] >= matches['true'] else 'true'  # branch with more matched facelets
+    if debug:                                               # case debug variable is set true on __main__
+        print(f"Edge analysis branch for 'auto': {auto_branch}  (matched facelets framed: {matches['false']}, frameless: {matches['true']})")
+
+
+
+
+
+
+
 def get_approx_contours(component):
     """ Function that simplifies contours (from: https://docs.opencv.org/4.5.3/dd/d49/tutorial_py_contour_features.html)
     Argument is a contour, having at least 4 vertex (contours with less than 4 vertex were previously filtered out)
@@ -933,6 +1547,7 @@ def get_facelets(facelets, frame, contour, hierarchy):
         contour_squeeze = np.squeeze(contour)                             # flattens out the list of list used by contours
         edges_delta, axes_ratio = square_check(contour_squeeze)           # sanity check on square and ronbhus shapes
         if edges_delta < square_ratio and axes_ratio > rhombus_ratio:     # check if the contour looks like a square
+            prune_stats['facelets'] += 1                                  # counter of contours with facelet characteristics
             cont, in_cont, out_cont = order_4points(contour_squeeze, w, h)  # vertex of each contour are ordered CW from top left
             contour_tmp = [cont]                                          # list is made with the ordered detected contour
             frame = cv2.drawContours(frame, contour_tmp, -1, (255, 255, 255), 1)  # a white polyline is drawn on the contour (1 px thickness)
@@ -957,8 +1572,12 @@ def get_facelets(facelets, frame, contour, hierarchy):
                     for i in a_to_exclude:              # contour deviating too much on area are removed from list of potential facelets
                         facelets.pop(i)                 # contour deviating too much on area are removed from list of potential facelets
                 else:                                   # case there are not facelets to be excluded, due to large area deviation
-                    if frameless_cube != 'false':       # case the cube status reading is for frameless cubes or auto (with and without frames)
+                    if frameless_cube != 'false' and face_fitter != 'lattice':  # case of frameless cubes or auto, and contours face fitter
                         facelets, frame = estimate_facelets(facelets,frame, w, h)  # calls the function to estimate the remaining facelets                                 
+        else:                                                             # case the contour doesn't look like a square
+            prune_stats['square'] += 1                                    # counter of contours discarded by the square check
+    else:                                                                 # case of too small or too large contours (areas)
+        prune_stats['area'] += 1                                          # counter of contours discarded by area
     
     return facelets, frame   # list of potential facelet's contour is returned
 
@@ -1162,6 +1781,143 @@ def estimate_facelets(facelets, frame, w, h):
 
 
 
+def lattice_facelets(facelets, frame, w, h):
+    """ Face fitter alternative to the 9 square contours: a 3x3 lattice is fitted to the centers of the square like
+    contours detected on the frame (Cubotino_m_lattice), so that a face can be locked from 4 good squares covering the
+    3 rows and the 3 columns.
+    Detected facelets are kept on their lattice point, while the missed ones are estimated on the lattice (as
+    in estimate_facelets). Returns the 9 facelets ordered from top left, or an empty list if the lattice doesn't fit."""
+    
+    if len(facelets) < 4:                                     # case of less than 4 candidates
+        return [], frame                                      # empty list is returned
+    
+    centers = [(f['cx'], f['cy']) for f in facelets]          # candidates centers
+    side = math.sqrt(median([f['area'] for f in facelets]))   # candidates (median) side length
+    angle = lattice.orientation([f['cont_ordered'] for f in facelets])  # candidates orientation (edges direction)
+    fit = lattice.fit_lattice(centers, side, angle)           # 3x3 lattice fitted to the candidates centers
+    if fit == None:                                           # case the lattice doesn't fit
+        return [], frame                                      # empty list is returned
+    
+    grid, slots, residual = fit                               # lattice points, candidate per lattice point and fit residual
+    if np.any(grid < 0) or np.any(grid[:,0] >= w) or np.any(grid[:,1] >= h):  # case of lattice points out of the frame
+        return [], frame                                      # empty list is returned
+    
+    med_a = int(median([facelets[j]['area'] for j in slots if j >= 0]))  # median area of the detected facelets
+    step = (np.hypot(*(grid[1]-grid[0])) + np.hypot(*(grid[3]-grid[0])))/2  # lattice step (facelets centers distance)
+    semi_side = int(0.85*int(step/2)/2)                       # half side dimension for the estimated contour square
+    
+    face = []                                                 # list for the 9 facelets
+    for k in range(9):                                        # iteration over the lattice points
+        if slots[k] >= 0:                                     # case of detected facelet on the lattice point
+            face.append(facelets[slots[k]])                   # detected facelet is appended
+            continue                                          # next lattice point
+        
+        cx, cy = int(round(grid[k][0])), int(round(grid[k][1]))  # estimated facelet center
+        pts = np.array([[cx - semi_side, cy - semi_side], [cx + semi_side, cy - semi_side],
+                        [cx + semi_side, cy + semi_side], [cx - semi_side, cy + semi_side]], dtype="int32")  # estimated contour
+        gap = 5                                               # pixels gap
+        outer_pts = np.array([[max(cx-semi_side-gap,0), max(cy-semi_side-gap,0)], [min(cx+semi_side+gap,w), max(cy-semi_side-gap,0)],
+                              [min(cx+semi_side+gap,w), min(cy+semi_side+gap,h)], [max(cx-semi_side-gap,0), min(cy+semi_side+gap,h)]],
+                             dtype="int32")                   # estimated contour coordinates, sligtly shifted toward the contour outer side
+        frame = cv2.drawContours(frame, [pts], -1, (0, 0, 0), 1)              # a black polyline is drawn on the contour (1 px thickness)
+        frame = cv2.drawContours(frame, [outer_pts], -1, (255, 255, 255), 1)  # a white polyline is drawn on the outer contour (1 px thickness)
+        face.append({'area': med_a, 'cx': cx, 'cy': cy, 'contour': pts, 'cont_ordered':pts})  # estimated facelet
+    
+    if debug:                                                 # case debug variable is set true on __main__
+        print(f'Lattice fitted on {int(np.sum(slots >= 0))} detected facelets, residual {residual:.3f}')  # feedback is printed to the terminal
+    
+    return order_9points(face, new_center=[]), frame          # the 9 facelets, ordered from top left
+
+
+
+
+
+
+
+def frame_facelets(frame, w, h, contours, hierarchy, fcs_due=False):
+    """ Per frame analysis, from the contours to the face lock decision; used by cubeAF and by the frames replay.
+    Contours are prefiltered (array based), approximated and checked for cube facelets characteristics (get_facelets);
+    at the end of the frame the candidates are merged with the previous frames ones (face_accumulator) and the face is
+    fitted (lattice face fitter), or 9 contours are checked for the 3x3 array (contours face fitter, also within the frame).
+    With fcs_due (FCS validated at the first frame, or edges analysis taking more than fcs_delay) the facelets are based
+    on the fix coordinates, and the contours aren't analysed.
+    Returns the facelets (the face is locked when these are 9), the frame, the flag for facelets based on fix coordinates,
+    and the frame copy before any drawing (for the edge branch selection with frameless_cube 'auto', otherwise None)."""
+    
+    if fcs_due and len(f_coordinates) > 0:                   # case the facelets are based on the fix coordinates
+        facelets, frame = get_facelets_fcs([], frame)        # facelets info are based on fix coordinates
+        return facelets, frame, True, None                   # facelets, frame, fcs flag and no clean frame are returned
+    
+    facelets = []                                            # list of contours having cube's square characteristics
+    if hierarchy is None:                                    # case of no contours
+        return facelets, frame, False, None                  # empty facelets are returned
+    
+    hierarchy = hierarchy[0]                                 # only top level contours (no childs)
+    clean = None                                             # frame copy before any drawing, for the edge branch selection
+    if frameless_cube == 'auto' and auto_branch == None and auto_frames > 0:  # case of 'auto' with both the edge branches
+        clean = frame.copy()                                 # frame copy, as contours are drawn on the frame
+    keep = prefilter_contours(contours, w, h)                # array based prefilter of the contours
+    last = len(contours) - 1                                 # index of the last contour of the frame
+    lattice_fit = face_fitter == 'lattice'                   # case of lattice face fitter
+    for i, component in enumerate(zip(contours, hierarchy)): # each contour is analyzed
+        if keep[i]:                                          # case the contour passed the prefilter
+            contour, hier, corners = get_approx_contours(component)  # contours are approximated
+            if corners != 4:                                 # case the approximated contour hasn't 4 corners
+                prune_stats['corners'] += 1                  # counter of contours discarded by the approximation
+            else:                                            # contours with 4 corners are of interest
+                facelets, frame = get_facelets(facelets, frame, contour, hier)  # returns a dict with cube compatible contours
+        
+        if i == last and face_accumulator != None and len(facelets) != 9:  # case the frame ends without 9 facelets
+            facelets = face_accumulator.merge(facelets)      # frame candidates merged with those of the previous frames
+            if not lattice_fit:                              # case of contours face fitter
+                facelets = facelets[:9]                      # the 9 most confident candidates are kept
+        
+        if lattice_fit:                                      # case of lattice face fitter
+            if i == last:                                    # case all the frame contours have been analyzed
+                facelets, frame = lattice_facelets(facelets, frame, w, h)  # 9 facelets, from the lattice fitted to the candidates
+        
+        elif len(facelets) == 9:                             # case there are 9 contours having facelets compatible characteristics
+            facelets = order_9points(facelets, new_center=[])  # contours are ordered from top left
+            d_to_exclude = distance_deviation(facelets)      # facelets to remove due inter-distance not as regular 3x3 array
+            for j in sorted(d_to_exclude, reverse=True):     # remove the contours too far to be part of the cube
+                facelets.pop(j)                              # facelet is removed
+            if len(facelets) == 9:                           # case of 9 facelets as regular 3x3 array
+                break                                        # face is locked, the other contours aren't analysed
+    
+    if len(facelets) != 9:                                   # case the face isn't locked
+        facelets = []                                        # facelets aren't returned (lattice fitter candidates)
+    return facelets, frame, False, clean                     # facelets, frame, fcs flag and clean frame are returned
+
+
+
+
+
+
+def face_lock(facelets, frame, raw, clean, w, h, fcs_frame, candidates, BGR_mean, H_mean, BGR_conf):
+    """ Actions at the face lock, shared by cubeAF and by the frames replay: facelets coordinates for the next FCS
+    validation (when locked via the edges), ROI and edge branch for the next sides, BGR frame for the colors reading
+    (raw frame on luma capture mode or coarse detection mode, otherwise None), facelets ordered as per viewer POV,
+    and colors reading (appended to BGR_mean, H_mean and BGR_conf).
+    Returns the facelets, the frame used for the colors reading and its dimensions."""
+    
+    global fcs_prev
+    
+    if not fcs_frame:                                        # case the face is locked via the edges analysis
+        fcs_prev = [v for f in facelets for v in (f['cx'], f['cy'])]  # facelets coordinates, for the next FCS validation
+    roi_update(facelets, w, h)                               # ROI for the next sides, around the locked facelets
+    auto_branch_update(clean, facelets)                      # edge branch for the next sides, with frameless_cube 'auto'
+    if raw is not None:                                      # case of luma capture mode or coarse detection mode
+        facelets, frame, w, h = fine_frame(facelets, raw, w, h)  # BGR frame, and facelets mapped to it, for colors reading
+    robot_facelets_rotation(facelets)                        # order facelets as per viewer POW (due to cube/camera rotations on robot)
+    read_color(frame, facelets, candidates, BGR_mean, H_mean, BGR_conf=BGR_conf)  # each facelet is read for color
+    return facelets, frame, w, h                             # facelets, frame and dimensions are returned
+
+
+
+
+
+
+
 def get_facelets_fcs(facelets, frame):
     """This function points to fix coordinates at the cube face image, to retrieve the color.
         Dummy contours are made, to visualize them on screen, or saved picture_collage, when debug is true."""
@@ -1169,7 +1925,9 @@ def get_facelets_fcs(facelets, frame):
     if debug:
         print("\nCalled the fix_coordinate_approach")
         
-    c = f_coordinates                          # f_coordinates assigned to a local very short variable name
+    c, spread = fcs_coordinates(side)          # coordinates for the side (or cube average), and their max std in pixels
+    if debug:                                  # case debug variable is set true on __main__
+        print(f"FCS coordinates max std: {spread:.1f} pixels")  # feedback is printed to the terminal
     
     # x and y distance between the facelets coordinates
     x_dist = (c[2]-c[0] + c[4]-c[2] + c[8]-c[6] + c[10]-c[8] + c[14]-c[12] + c[16]-c[14])/6
@@ -1221,21 +1979,16 @@ def area_deviation(data, min_area, max_area):
     too much from the median one."""
 
     
-    to_exclude = []                  # list of the contours index to be removed, due to excess of their area deviation
 #     delta_area_limit = 0.7            #(AF 0.7)   # 70% of area deviation from the median is set as threshold (quite permissive)
-    area_list = []                   # list to store the contour areas
-    
-    for i in range(len(data)):
-        area_list.append(data[i]['area'])                       # all the contour areas are listed
-#         print("contours areas detected:",area_list)             # feedback is printed to the terminal
+    area_list = np.array([f['area'] for f in data], dtype=np.float64)  # array with the contour areas
+#     print("contours areas detected:",area_list)                 # feedback is printed to the terminal
 
-    area_median = median(area_list)                             # median area values
-    for i in range(len(area_list)):                             # iteration over the facelets areas received
-        delta_area=abs((area_list[i]-area_median)/area_median)  # area deviation from the median
-        if delta_area > delta_area_limit:                       # filter on area deviating more than threshold
-            to_exclude.append(i)                                # list of the contours to exclude is populated
-            if debug:                                           # case debug variable is set true on __main__
-                print('removed contour with area: ',area_list[i], " having delta_area of:",delta_area) # feedback is printed to the terminal
+    area_median = np.median(area_list)                          # median area values
+    delta_area = np.abs((area_list-area_median)/area_median)    # areas deviation from the median
+    to_exclude = np.flatnonzero(delta_area > delta_area_limit).tolist()  # list of the contours index to exclude, due to excess of area deviation
+    if debug:                                                   # case debug variable is set true on __main__
+        for i in to_exclude:                                    # iteration over the contours to exclude
+            print('removed contour with area: ',area_list[i], " having delta_area of:",delta_area[i]) # feedback is printed to the terminal
 
     if debug:                                                   # case debug variable is set true on __main__
         if len(to_exclude)==0 and len(area_list)>=9:            # case all the face facelets have been detected
@@ -1357,21 +2110,60 @@ def order_9points(data, new_center):
 
 
 
+def coordinates_store():
+    """Returns the binary store of the facelets coordinates (Cubotino_m_coordinates.bin), used by the FCS.
+        At the first use, the coordinates are imported from the old text file (Cubotino_m_coordinates.txt)."""
+    
+    folder = pathlib.Path().resolve()                       # active folder (should be home/pi/cubotino/src)
+    fname = os.path.join(folder, 'Cubotino_m_coordinates.bin')  # folder and file name for the coordinates store
+    store = coords.CoordinatesStore(fname, size=5)          # store of the latest 5 cubes coordinates (more relevant, in case of settings changed at robot)
+    
+    old_fname = os.path.join(folder, 'Cubotino_m_coordinates.txt')  # folder and file name of the old coordinates text file
+    if not store.loaded and os.path.exists(old_fname):      # case the store doesn't exist yet, while the old text file does
+        try:                                                # tentative
+            with open(old_fname, "r") as f:                 # old text file is opened in reading mode
+                lines = f.read().splitlines()               # all lines (without LF) are assigned as list to lines variable
+            for line in lines[-5:]:                         # iteration over the latest 5 lines
+                values = [int(v) for v in line.replace(' ', '').split(',')]  # coordinates parsed to integers
+                if len(values) == 18:                       # case of 9 facelets coordinates
+                    store.add(values, 0)                    # coordinates are added to the cube average slot
+            store.save()                                    # store is saved
+            if debug:                                       # case debug is set true
+                print(f"Imported {store.count(0)} facelets coordinates sets from {old_fname}")  # feedback is printed to the terminal
+        except:                                             # case of exceptions (i.e. corrupted text file)
+            print(f"Not imported the facelets coordinates from {old_fname}")  # feedback is printed to the terminal
+    
+    return store                                            # coordinates store is returned
+
+
+
+
+
+
+
 def save_coordinates(coordinates):
-    """Saves the coordinates of the 9 facelets to a text file.
+    """Saves the coordinates of the 9 facelets to the binary store (atomic write).
         This action is done when a cubes_status is correctly determined.
-        The 9 coordinates are averaged from the 6 faces."""
-    
-    coordinates = np.array(coordinates)                     # the coordinates list is converted to numpy array 
-    avg = coordinates.mean(axis=0)                          # coordinates are averaged by 'columns'
-    avg = np.round(avg, decimals=0).astype(int)             # coordinates are first rounded to 0 decimal then converted to integers
-    avg = str(list(avg))                                    # coordinates are converted from array to list to string
-    avg = avg.replace('[','').replace(']','').replace(' ','')+'\n'  # coordinates string without parentheses and empty spaces
-    fname = 'Cubotino_m_coordinates.txt'                    # fname for the text file to retrieve the coordinates
-    folder = pathlib.Path().resolve()                       # active folder (should be home/pi/cubotino/src)
-    fname = os.path.join(folder, fname)                     # folder and file name for the coordinates, to be saved
-    with open (fname, 'a') as f:                            # text file is opened to write on it in 'appending' mode
-        f.write(avg)                                        # coordinates are saved to text file
+        Coordinates is a dict by side, with the sides locked via the edges analysis: these are stored per side (slots
+        1 to 6), while the average of the 6 faces (slot 0) is stored only when all the sides are available.
+        Sides locked via FCS at the first frame aren't stored, as their coordinates would just confirm the stored ones."""
+    
+    global fcs_store
+    
+    if fcs_store == None:                                   # case the coordinates store hasn't been loaded
+        fcs_store = coordinates_store()                     # coordinates store is loaded
+    
+    if len(coordinates) == 0:                               # case no sides have been locked via the edges analysis
+        return                                              # function is terminated
+    if len(coordinates) == 6:                               # case of coordinates for the 6 sides
+        avg = np.array(list(coordinates.values())).mean(axis=0)  # coordinates averaged by 'columns'
+        fcs_store.add(avg, 0)                               # averaged coordinates are added to the cube average slot
+    for s, c in coordinates.items():                        # iteration over the sides locked via the edges analysis
+        fcs_store.add(np.array(c), s)                       # side coordinates are added to the side slot
+    try:                                                    # tentative
+        fcs_store.save()                                    # coordinates store is saved
+    except:                                                 # case of exceptions
+        print("Could not save the facelets coordinates")    # feedback is printed to the terminal
 
 
 
@@ -1380,102 +2172,21 @@ def save_coordinates(coordinates):
 
 
 def load_coordinates():
-    """Loads the coordinates of the 9 facelets from a text file."""
-    
-    historical_data = False                                 # flag to track presence or assence of historical data is set False
-    lines=[]                                                # lines variable is set as empty list
-    fname = 'Cubotino_m_coordinates.txt'                    # fname for the text file to retrieve the coordinates
-    folder = pathlib.Path().resolve()                       # active folder (should be home/pi/cubotino/src) 
-    fname = os.path.join(folder, fname)                     # folder and file name for the coordinates, to be loaded
-    
-    if os.path.exists(fname):                               # case the coordinates file exists
-        with open(fname, "r") as f:                         # settings file is opened in reading mode
-            lines = f.read().splitlines()                   # all lines (without LF) are assigned as list to lines variable
-        if len(lines)>=1:                                   # case the file has at least one row of data
-            historical_data = True                          # flag to track presence or assence of historical data is set True
-    else:                                                   # case the coordinates file does not exist
-        print(f"Not found file {fname}")                    # print feedback to the terminal
-        print("This file is generated by the robot at the first successfull cycle") # print feedback to the terminal
-
-    corrupted_data = False                                  # corrupted_data is initially set False
-    if historical_data:                                     # case there is historical data
-        lines = [line.replace(' ', '') for line in lines]   # all spaces are removed
-        valid_chars = set('0123456789,')                    # set of valid charcters (includes comma)
-        for line in lines:                                  # iteration through the lines
-            for c in line:                                  # iteration through the characters in line
-                if c not in valid_chars:                    # case the character is not valid
-                    corrupted_data = True                   # corrupted_data is set True
-                    break                                   # inner for_loop s interrupted
-            if corrupted_data:                              # case corrupted_data is True
-                break                                       # outer loop_is interrupted
-       
-    if historical_data and corrupted_data:                  # case there is historical yet corrupted_data
-        if debug:                                           # case debug is set true
-            print(f"\nNot valid characters in {fname}")     # feedback is printed to the terminal
-        new_lines=[]                                        # empty list to store the cleaned lines
-        with open(fname, "w") as f:                         # settings file is opened in writing mode
-            for line in lines:                              # iteration through the lines
-                if not line.isspace():                      # case the line is not empty
-                    keep_line=True                          # keep_line variable is initially set True
-                    for c in line.strip().strip('\n'):      # iteration through the characters in line
-                        if c not in valid_chars:            # case the character is not valid
-                            keep_line=False                 # keep_line variable is set False
-                            break                           # inner for_loop is interrupted
-                    if keep_line:                           # case keep_line variable is (still) True
-                        f.write(line)                       # that line is written to text file
-                        new_lines.append(line)              # line is appended to lines
-        
-        if len(new_lines)>=1:                               # case the file has at least one row of data
-            lines = new_lines                               # new_lines is assigned to lines
-            if debug:                                       # case debug is set true
-                print(f"The file got repaired")             # feedback is printed to the terminal
-        else:                                               # case the remaining file does not have any row of data
-            lines=[]                                        # lines variable is set as an empty list
-            historical_data = False                         # historical data variable is set False
-            
-    if historical_data:                                     # case there is historical data
-        if len(lines)>=1:                                   # case the file has at least one row of data
-            for line in lines:                              # iteration over the lines
-                if len(line)>35:                            # case the line has at least 35 characters
-                    historical_data = True                  # flag to track presence or assence of historical data is set True
-                else:                                       # case the line has at less than 26 characters
-                    historical_data = False                 # flag to track presence or assence of historical data is set True
-                    print("The file with facelets coordinates seems empty") # feedback is printed to the terminal
-                    print("File will be filled and/or repaired the next time Cubotino_m.py is launched") # feedback is printed to the terminal
-                    break                                   # for loop is interrupted
-    
-    if historical_data:                                     # case there is historical data
-        # convert from string to integers and feed a list with coordinates values as tuple
-        all_coordinates = []                                # empty list to store all the coordinates (prevoius solves cubes)
-        for line in lines:                                  # iterating on each set of coordinates (each cube)
-            coordinates=[]                                  # empty list to store the coordinated parsed from text to integers
-            for i in range(17):                             # iterating over the 9 facelets of each cube set of coordinates
-                val = int(line[: line.find(',')])           # coordinate is retrieved and converted to integer
-                line = line[line.find(',')+1:]              # line is sliced for the remaining coordinates
-                coordinates.append(val)                     # facelet coordinate is appended to the coordinates list
-            coordinates.append(int(line))                   # the last facelet is appended to the coordinates list
-            all_coordinates.append(coordinates)             # all the facelet coordinates are appended to all_coordinates list variable
-        
-        # limits the dataset to latest 5 cube readings saved (latest scans are more relevant, in case of settings changed at robot)
-        n = len(all_coordinates)                            # quantity of coordinates sets (cubes) stored
-        if n > 5:                                           # case there are more than 5 sets of coordinates (more than 5 cubes' history)
-            all_coordinates = all_coordinates[-5:]          # only the last 5 are considered
-        
-        if n > 10:                                          # case there are more than 10 sets of coordinates (more than 5 cubes' history)
-            remove_old_data(fname)                          # call a function that removes old data from the text file
-        
-        # average the coordinates from the dataset
-        all_coordinates = np.array(all_coordinates)         # the list of lists all_coordinates is changed to a 2d numpy array
-        avg = all_coordinates.mean(axis=0)                  # coordinates are averaged by 'columns'
-        avg = np.round(avg, decimals=0).astype(int)         # coordinates are first rounded to 0 decimal then converted to integers
-        avg = avg.tolist()                                  # coordinates are assigned to a list
+    """Loads the coordinates of the 9 facelets (mean of the latest cubes) from the binary store."""
+    
+    global fcs_store
+    
+    fcs_store = coordinates_store()                         # coordinates store is loaded
+    avg = fcs_store.mean(0)                                 # mean coordinates (cube average slot), empty list if no records
+    
+    if len(avg) > 0:                                        # case there is historical data
         if debug:                                           # case debug is set true
             print("Loaded facelets coordinates:", avg)      # feedback is printed to the terminal
+            print("Facelets coordinates max std (pixels):", round(float(np.max(fcs_store.std(0))), 1))  # feedback is printed to the terminal
         return avg                                          # the average coordinates are returned
     
     else:                                                   # case there isn't historical data
-        if debug:                                           # case debug is set true
-            print("Not loaded facelets coordinates")        # feedback is printed to the terminal
+        print("Not found facelets coordinates: these are stored by the robot at the first successfull cycle") # print feedback to the terminal
         return []                                           # an empty list is returned 
 
 
@@ -1484,22 +2195,64 @@ def load_coordinates():
 
 
 
-def remove_old_data(fname):
-    """"Removes excess data from the coordinates file (it keeps the last 5 rows)."""
+def fcs_coordinates(side):
+    """Returns the FCS coordinates for the side (the side slot when it has records, otherwise the cube average),
+        and their confidence as max standard deviation in pixels (0 when a single record, or no store)."""
     
-    with open(fname, "r") as f:                             # settings file is opened in reading mode
-        lines = f.readlines()                               # all lines are assigned as list to lines variable
-        lines = lines[-5:]                                  # the last 5 lines are assigned to a local variable
+    if fcs_store != None and fcs_store.count(side) > 0:     # case of records for the side
+        return fcs_store.mean(side), float(np.max(fcs_store.std(side)))  # side coordinates and their max std
+    if fcs_store != None and fcs_store.count(0) > 0:        # case of records for the cube average
+        return f_coordinates, float(np.max(fcs_store.std(0)))  # cube average coordinates and their max std
+    return f_coordinates, 0                                 # coordinates without confidence
+
+
+
+
+
+
+
+def fcs_score(frame, c):
+    """ Scores the fix coordinates (c, 9 facelets centers as x,y list) on the frame, as fraction of the checks passed:
+    - uniformity: the patch at the center of each facelet (half facelet side) has a small color deviation.
+    - contrast: the gap between neighbour facelets (12 gaps) has a darker line than the two facelets patches.
+    Also returns the facelets step (pixels), used for the geometry consistency."""
     
-    with open (fname, 'w') as f:                            # text file is opened to write on it (to empty it)
-        f.write('')                                         # an empty character is saved
+    pts = np.array(c, dtype=np.float64).reshape(9, 2)          # facelets centers, from top left
+    dx = np.mean(pts[[1,2,4,5,7,8],0] - pts[[0,1,3,4,6,7],0])  # x distance between the facelets centers
+    dy = np.mean(pts[[3,4,5,6,7,8],1] - pts[[0,1,2,3,4,5],1])  # y distance between the facelets centers
+    fh, fw = frame.shape[:2]                                   # frame height and width
+    if dx < 8 or dy < 8 or np.any(pts < 0) or np.any(pts[:,0] >= fw) or np.any(pts[:,1] >= fh):  # case of unplausible coordinates
+        return 0, 0                                            # zero score is returned
     
-    with open (fname, 'a') as f:                            # text file is opened to write on it, in appending mode
-        for line in lines:                                  # iteration over the lines variable
-            f.write(line)                                   # line is written to file
+    gray = frame if frame.ndim == 2 else cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)  # gray frame for the gaps contrast
+    px, py = int(0.25*dx), int(0.25*dy)                        # half side of the patches (half facelet side)
+    passed = 0                                                 # checks passed
     
-    if debug:                                               # case debug is set true
-        print(f"\nRemoved excessive data from {fname}")     # feedback is printed to the terminal
+    patch_gray = []                                            # patches gray mean
+    for x, y in pts.astype(int):                               # iteration over the 9 facelets centers
+        patch = frame[max(y-py,0):y+py+1, max(x-px,0):x+px+1]  # patch at the facelet center
+        _, std = cv2.meanStdDev(patch)                         # std of each color channel in the patch
+        patch_gray.append(cv2.mean(gray[max(y-py,0):y+py+1, max(x-px,0):x+px+1])[0])  # patch gray mean
+        if np.max(std) < 18:                                   # case of uniform patch
+            passed += 1                                        # checks passed counter is incremented
+    
+    for a, b in ((0,1),(1,2),(3,4),(4,5),(6,7),(7,8),(0,3),(1,4),(2,5),(3,6),(4,7),(5,8)):  # neighbour facelets
+        (xa, ya), (xb, yb) = pts[a].astype(int), pts[b].astype(int)  # centers of the neighbour facelets
+        if b == a + 1:                                         # case of neighbours along x
+            ym = (ya + yb)//2                                  # gap y coordinate
+            strip = gray[max(ym-py,0):ym+py+1, xa+px:xb-px+1]  # strip across the gap, between the two patches
+            axis = 0                                           # profile along x (mean of each column)
+        else:                                                  # case of neighbours along y
+            xm = (xa + xb)//2                                  # gap x coordinate
+            strip = gray[ya+py:yb-py+1, max(xm-px,0):xm+px+1]  # strip across the gap, between the two patches
+            axis = 1                                           # profile along y (mean of each row)
+        if strip.size == 0:                                    # case of empty strip
+            continue                                           # next gap
+        line = np.min(np.mean(strip, axis=axis))               # darkest line across the gap
+        if line < 0.8 * min(patch_gray[a], patch_gray[b]):     # case the gap is darker than both the facelets
+            passed += 1                                        # checks passed counter is incremented
+    
+    return passed / 21, (dx + dy)/2                            # fraction of checks passed, and facelets step
 
 
 
@@ -1507,7 +2260,43 @@ def remove_old_data(fname):
 
 
 
-def cube_colors_interpr(BGR_detected):
+def fcs_first_frame(frame):
+    """ Fix Coordinates System attempted at the first frame of each side, instead of waiting fcs_delay seconds.
+    The FCS coordinates are validated on the frame (fcs_score), and checked for consistency with the geometry of the
+    previous side locked via the edges (or with the coordinates std, on the first side).
+    Returns True when the face can be accepted via FCS, otherwise the edges analysis is used as usual."""
+    
+    global fcs_tried, prev_side
+    
+    if fcs_first <= 0 or len(f_coordinates) == 0 or fcs_tried == side:  # case disabled, no coordinates or already tried on the side
+        return False                                           # False is returned
+    fcs_tried = side                                           # one attempt per side
+    
+    t = time.time()                                            # time reference
+    c, spread = fcs_coordinates(side)                          # coordinates for the side, and their max std in pixels
+    score, step = fcs_score(frame, c)                          # fraction of the checks passed, and facelets step
+    if len(fcs_prev) == 18:                                    # case of a previous side locked via the edges
+        shift = np.mean(np.hypot(*(np.array(c, dtype=np.float64) - fcs_prev).reshape(9, 2).T))  # mean shift of the facelets
+        consistent = shift < 0.25 * step                       # geometry consistent with the previous side
+    else:                                                      # case of no previous sides locked via the edges
+        consistent = spread < 0.15 * step                      # coordinates consistent over the latest cubes
+    
+    accepted = consistent and score >= fcs_first               # case the FCS coordinates are validated
+    if debug:                                                  # case debug variable is set true on __main__
+        print(f"FCS at first frame: score {score:.2f}, consistent {consistent}, accepted {accepted} ({(time.time()-t)*1000:.1f} ms)")
+    with side_lock:                                            # prev_side is also set by read_facelets, on the vision pipeline thread
+        if accepted and side != prev_side:                     # case the face is accepted (edges analysis not used on this side)
+            print(f'Reading side {sides[side]}')               # feedback is printed to the terminal
+            prev_side = side                                   # current side is assigned to previous side variable
+    return accepted                                            # True when the face can be accepted via FCS
+
+
+
+
+
+
+
+def cube_colors_interpr(BGR_detected, BGR_conf=None):
     """ This function is used to decide wich color belongs to which facelet (cube's side) and related facelet position
     From the mean BGR color, detected per each facelet, the euclidean distance is calculated toward the 6 reference colors (centers).
     The basic principle is to measure the color distance from the cube's center facelets.
@@ -1518,17 +2307,23 @@ def cube_colors_interpr(BGR_detected):
     certain facelets, and use them to adapt the references.
     After completing this process, for all the facelets, the interpreted colors have to be ordered back to URFDLB order.
     
-    In case the BGR color distance doesn't provide coherent result, a second approach based on HVS color space takes place."""
+    In case the BGR color distance doesn't provide coherent result, a second approach based on HVS color space takes place.
+    
+    BGR_conf (optional) has the facelets color confidence (0 to 1, from read_color): facelets with low confidence (i.e.
+    partially covered by reflections) are interpreted after all the others, and they don't adapt the color references.
+    
+    When the interpreted colors don't have 9 facelets each, the colors are re-assigned as min cost assignment with 9 facelets
+    per color (transportation problem on the color distances): the cost margin of the assignment is kept as color_margin.
+    The distances from the adapted references are kept as color_costs, for the cube status hypotheses."""
+    
+    global color_margin, color_costs
 
-    # Step1: dict with BGR_detected and facelet's position as key
-    #        dict with HSV (detected color) and facelet's position as key
-    BGR_detected_dict={}                                    # empty dict to store the average BGR values detected per each facelet
+    # Step1: dict with HSV (detected color) and facelet's position as key (all the facelets converted at once)
+    BGR_detected_arr = np.array(BGR_detected, dtype=np.float64).reshape(-1, 3)             # BGR detected on the facelets
+    hsv = cv2.cvtColor(np.array([BGR_detected], dtype=np.uint8), cv2.COLOR_BGR2HSV)      # HSV color space
     HSV_detected={}                                         # empty dict to store the average HSV values detected per each facelet
     for i in range(len(BGR_detected)):                      # iteration over the (expected 54) elemnt is list with avg BGR detected 
-        BGR=BGR_detected[i]                                 # BGR detected on facelet i
-        BGR_detected_dict[i]=BGR                            # BGR detected on facelet i is assigned to the dict, having the facelet i as key
-        hsv = cv2.cvtColor( np.array([[[BGR[0],BGR[1],BGR[2]]]], dtype=np.uint8), cv2.COLOR_BGR2HSV)   # HSV color space
-        HSV_detected[i]=(hsv[0][0][0],hsv[0][0][1],hsv[0][0][2])                                       # HSV tuple 
+        HSV_detected[i]=(hsv[0][i][0],hsv[0][i][1],hsv[0][i][2])  # HSV tuple 
 
     if debug:                                         # case debug variable is set true on __main__
         print(f'\nBGR_detected: {BGR_detected}')      # feedback is printed to the terminal
@@ -1537,75 +2332,89 @@ def cube_colors_interpr(BGR_detected):
     # Step2: detected BGR, of the center's facelets, are used as initial reference
     cube_ref_colors = {'white':BGR_detected[4], 'red':BGR_detected[13], 'green':BGR_detected[22],
                        'yellow':BGR_detected[31], 'orange':BGR_detected[40], 'blue':BGR_detected[49]}
-    
-    # Step3: dictionary with the color distances from the (initial) references
-    color_distance={}                                             # empty dict to store all the color distances for all the facelets
-    cube_ref_colors_lab={}                                        # empty dictionary to store color refences in Lab color space
-    for color, BGR in cube_ref_colors.items():                    # iteration over the 6 centers
-        B,G,R = BGR                                               # BGR values are unpact from the dict
-        cube_ref_colors_lab[color]=tuple(rgb2lab([R,G,B]))        # BGR conversion to lab color space and dict feeding
-            
-    for facelet, color_measured in BGR_detected_dict.items():     # iteration over the 54 facelets
-        B,G,R = color_measured                                    # individual BGR components
-        lab_meas = rgb2lab([R,G,B])                               # conversion to lab color space (due CIEDE2000 function)
-        distance=[]                                               # list with the distance from the 6 references, for each facelet
-        for color, lab_ref in cube_ref_colors_lab.items():        # iteration over the 6 reference colors
-            distance.append(CIEDE2000(tuple(lab_meas), lab_ref))  # Euclidean distance toward the 6 reference colors
-        color_distance[facelet]=distance   # dict (facelet num as key) is populated with the measured distance from the 6 centes
-    
-    
-    # Step4: Ordering the color distance (the min value per each facelet) by increasing values
-    color_distance_copy=color_distance.copy()                     # a dict copy is made, to drop items while the analysis progresses
-    color_distance_ordered={}                                     # empty dictiony to store the (min) color distance by increasing values
-    for i in range(len(color_distance_copy)):                     # iteration over the dict copy
-        key_min_dist = min(color_distance_copy,key=lambda key:min(color_distance_copy[key])) # dict key for the facelet with smaller color dist
-        color_distance_ordered[key_min_dist] = color_distance_copy[key_min_dist]  # dict with facelets ordered by smaller distance, is populated
-        color_distance_copy.pop(key_min_dist)   # removed the facelet from the dic copy, to search the next facelect with smaler color distance
-    
-    
-    # Step5: List with facelets position ordered according to the color distance increasing order
-    # this is needed to come back later to original URFDLB facelets order
-    key_ordered_by_color_distance = [x for x in color_distance_ordered.keys()]
-
-
-    # Step6: Ordering the facelets BGR color values according to color distance from the reference colors
-    BGR_ordered={}
-    for key in color_distance_ordered.keys():
-        BGR_ordered[key]=BGR_detected[key]    # key is always the facelet number, yet the ordered dict is by increasing color distance
-
-
-    # Step7: Color interpretation
-    cube_status_by_color_distance={}          # dict to store the cube status reppresentation wih the interpreted colors
-    distance={}                               # dict to store the color distance during each facelet check
-#     distance_value=[]                       # list to store the color distance for the selectec color/facelet association
-                                         
-    for i, value in enumerate(BGR_ordered.values()):        # iteration on the facelet's BGR values ordered by increasing color distance from ref
-        B,G,R = value
-        lab_meas = rgb2lab([R,G,B])                                         # conversion to lab color space (due CIEDE2000 function)
-        for color, lab_ref in cube_ref_colors_lab.items():                  # iteration over the 6 reference colors
-            distance[color]=CIEDE2000(tuple(lab_meas), lab_ref)             # Euclidean distance toward the 6 reference colors
-        color = min(distance, key=distance.get)                             # chosem color is the one with min distance from reference
-  
-        cube_status_by_color_distance[i]=color                              # dict of cube status wih the interpreted colors  
-#         distance_value.append(distance[min(distance, key=distance.get)])  # list with the color distance of the chosen facelet's color
-        distance.clear()                                                    # distance dict is cleared for the next facelet
+    ref_names = list(cube_ref_colors.keys())                      # reference colors names (distance matrix columns)
+    
+    # Step3: matrix with the color distances from the (initial) references (54 facelets x 6 references)
+    lab_meas = colors_lab(BGR_detected_arr)                       # all the facelets converted to lab color space (due CIEDE2000 function)
+    lab_list = [tuple(lab) for lab in lab_meas.tolist()]          # facelets Lab colors, as tuples (for the scalar CIEDE2000 function)
+    lab_ref = [lab_list[i] for i in (4, 13, 22, 31, 40, 49)]      # color refences in Lab color space (the centers facelets)
+    color_distance = colors.ciede2000(lab_meas, lab_ref)          # CIEDE2000 distances toward the 6 reference colors
+    
+    
+    # Step4: Ordering the facelets by increasing color distance (the min value per each facelet)
+    low_conf = [BGR_conf != None and BGR_conf[i] < 0.6 for i in range(len(BGR_detected))]  # facelets with low color confidence
+    if debug and any(low_conf):                                   # case debug variable is set true on __main__, and low confidence facelets
+        print(f'\nFacelets with low color confidence: {[i for i in range(len(low_conf)) if low_conf[i]]}')  # feedback is printed to the terminal
+    min_distance = np.min(color_distance, axis=1)                 # min color distance per facelet
+    key_ordered_by_color_distance = np.lexsort((min_distance, low_conf))  # facelets by increasing distance (low confidence ones last)
+    
+    # distances closer than colors.TOL (ties) are re-calculated with the scalar CIEDE2000, to keep the same order
+    ties = np.abs(np.diff(min_distance[key_ordered_by_color_distance])) < colors.TOL  # ties between consecutive facelets
+    if np.any(ties):                                              # case of ties
+        for i in np.flatnonzero(ties):                            # iteration over the ties
+            for facelet in key_ordered_by_color_distance[i:i+2]:  # iteration over the two facelets of the tie
+                min_distance[facelet] = min(CIEDE2000(lab_list[facelet], ref) for ref in lab_ref)
+        key_ordered_by_color_distance = np.lexsort((min_distance, low_conf))  # facelets by increasing distance
+    key_ordered_by_color_distance = key_ordered_by_color_distance.tolist()    # list with the facelets order
+    
+    
+    # Step5: Color interpretation
+    # facelets are interpreted by increasing color distance, while the references are adapted to the interpreted facelets:
+    # the distances matrix row of each facelet is updated only toward the references changed since Step3.
+    cube_status={}                            # dict to store the cube status reppresentation wih the interpreted colors
+    changed = [False]*6                       # references changed since Step3
+    for facelet in key_ordered_by_color_distance:               # iteration on the facelets ordered by increasing color distance from ref
+        distance = color_distance[facelet]                      # distance toward the 6 reference colors
+        for k in range(6):                                      # iteration over the 6 reference colors
+            if changed[k]:                                      # case the reference has been adapted
+                distance[k] = CIEDE2000(lab_list[facelet], lab_ref[k])  # distance toward the adapted reference
+        k = int(np.argmin(distance))                            # chosen color is the one with min distance from reference
+        if np.sum(np.abs(distance - distance[k]) < colors.TOL) > 1:  # case of ties, distances are re-calculated with the scalar CIEDE2000
+            distance = [CIEDE2000(lab_list[facelet], ref) for ref in lab_ref]
+            k = distance.index(min(distance))                   # chosen color is the one with min distance from reference
+        color = ref_names[k]                                    # chosen color name
+        cube_status[facelet]=color                              # dict of cube status wih the interpreted colors
+        if low_conf[facelet]:                                   # case of facelet with low color confidence
+            continue                                            # the color reference isn't adapted
         
+        B,G,R = BGR_detected[facelet]                                   # BGR detected on the facelet
         B_avg = math.sqrt((B**2+ (cube_ref_colors[color][0])**2)/2)     # average Red color is made from the chosen color and previous reference
         G_avg = math.sqrt((G**2+ (cube_ref_colors[color][1])**2)/2)     # average Green color is made from the chosen color and previous reference
         R_avg = math.sqrt((R**2+ (cube_ref_colors[color][2])**2)/2)     # average Blue color is made from the chosen color and previous reference
 
         cube_ref_colors[color]=(B_avg, G_avg, R_avg)                    # Color reference dict is updated with the new BGR averaged color
-        cube_ref_colors_lab[color]=tuple(rgb2lab([R_avg,G_avg,B_avg]))  # Lab color space reference dict is updated with the new color reference 
-    
-    
-    # Step8: Cube detection status is generated (a dict having the facelet number as key and the color as value)
+        lab_ref[k]=tuple(rgb2lab([R_avg,G_avg,B_avg]))                  # Lab color space reference is updated with the new color reference 
+        changed[k] = True                                               # the reference has been adapted
+    
+    
+    # Step6: Count constraint (9 facelets per color), as min cost assignment on the distances from the adapted references
+    # a cube status without 9 facelets per color cannot be solved, and it would require the HSV approach and a second solver call.
+    # The cost margin (CIEDE2000) is the cost increase of the cheapest different assignment: it is logged as colors confidence.
+    # When Step5 has 9 facelets per color but it isn't the min cost assignment, the margin is negative (cost above the min one).
+    color_distance = colors.ciede2000(lab_meas, lab_ref)          # CIEDE2000 distances toward the adapted references
+    labels = np.array([ref_names.index(cube_status[i]) for i in range(len(BGR_detected))])  # colors assigned by Step5
+    counts = np.bincount(labels, minlength=6)                     # facelets per color
+    best = np.argmin(color_distance, axis=1)                      # colors with min distance from the adapted references
+    best[[4, 13, 22, 31, 40, 49]] = range(6)                      # centers are the references
+    best, color_margin = colors.assign_counts(color_distance, best, fixed=(4, 13, 22, 31, 40, 49))  # min cost assignment
+    if np.any(counts != 9):                                       # case the colors don't have 9 facelets each
+        labels = best                                             # min cost assignment with 9 facelets per color
+        cube_status = {i:ref_names[labels[i]] for i in range(len(labels))}  # cube status with 9 facelets per color
+        print(f'\nColors count {counts.tolist()} adjusted to 9 facelets per color (cost margin {round(color_margin,1)})')
+    elif np.any(labels != best):                                  # case Step5 isn't the min cost assignment
+        idx = np.arange(len(labels))                              # facelets index
+        color_margin = float(np.sum(color_distance[idx, best]) - np.sum(color_distance[idx, labels]))  # negative margin
+    color_costs = color_distance                                  # distances from the adapted references, for the hypotheses
+    if debug:                                                     # case debug variable is set true on __main__
+        print(f'\nColors assignment cost margin: {round(color_margin,1)}')  # feedback is printed to the terminal
+    
+    
+    # Step7: Cube detection status is generated (a dict having the facelet number as key and the color as value)
     # colors are still as per the conventional one (URFDLB being White Red Green Yellow Orange Blue), later will match to those really detected at URFDLB
-    cube_status={}
-    for i in range(54):  # iteration over the 54 facelets
-        cube_status[i]=cube_status_by_color_distance[key_ordered_by_color_distance.index(i)] # dict with facelet as key and color as value
+    cube_status = {i:cube_status[i] for i in range(54)}  # dict with facelet as key and color as value, ordered by facelet
     
     
-    # Step9: Cube color sequence, to plot a realistic cube status detection (by colors, not by URFDLB letters)
+    # Step8: Cube color sequence, to plot a realistic cube status detection (by colors, not by URFDLB letters)
     VS_value={}                            # dict to store the V-S (Value-Saturation) value of all facelets
     Hue={}                                 # dict to store the Hue value of all facelets
     
@@ -1615,7 +2424,7 @@ def cube_colors_interpr(BGR_detected):
         Hue[i]=int(H)                      # Hue, for all the facelets, populates the related dict
         i+=1                               # iterator index is increased
     
-    #step 10: function to get the color (sides) order, list of colored center's facelets and white center facelet
+    # Step9: function to get the color (sides) order, list of colored center's facelets and white center facelet
     # this depends on the cube orientation when dropped on the robot
     cube_color_sequence, HSV_analysis = retrieve_cube_color_order(VS_value, Hue)  # call to the specific function
     if debug:                                                   # case debug variable is set true on __main__
@@ -1894,6 +2703,22 @@ def cube_colors_interpr_HSV(BGR_detected, HSV_detected):
 
 
 
+def colors_lab(BGR):
+    """ Converts the BGR colors (numpy array, one row per color) in L*a*b color space, all at once (Cubotino_m_colors).
+    Colors close to a rounding step, of the rgb2lab function, are converted with the scalar function (same values)."""
+    
+    lab, near = colors.rgb2lab(BGR[:, ::-1])                 # RGB colors converted to Lab, and colors close to a rounding step
+    for i in np.flatnonzero(near):                           # iteration over the colors close to a rounding step
+        B, G, R = BGR[i]                                     # BGR components
+        lab[i] = rgb2lab([R, G, B])                          # color converted with the scalar function
+    return lab                                               # Lab colors
+
+
+
+
+
+
+
 def rgb2lab(inputColor):
     """ Convert RGB (not BGR !!!) in L*a*b colors space
     from: https://gist.github.com/manojpandey/f5ece715132c572c80421febebaf66ae (RGB to CIELab color space conversion)
@@ -2089,6 +2914,73 @@ def cube_string(cube_status):
 
 
 
+def cube_status_select(cube_status, cube_color_seq, BGR_detected, HSV_detected):
+    """ Selects the cube status to be sent to the solver, without calling the solver on impossible cubes.
+    The cube status via BGR color distance is checked at cubie level (few micro secs); When not valid, the cube status is decoded
+    at cubie level (the facelets of each corner and edge are matched together to the existing cubies): decoding always returns
+    a valid cube, also from a misread one, so the decoded cube status is accepted only when all its cubies have high confidence
+    (cubies.DECODE_CONF). Otherwise the hypotheses by increasing color distance penalty are checked until a valid one is found,
+    and the decoded cube status is preferred only if cheaper (total color distance); In case none of them is valid, the HSV
+    interpretation is checked, and the decoded cube status is the last resort before giving up (solver error).
+    The solver is then called only once, on the selected cube status.
+    The cubies with low confidence, on the selected cube status, are listed on the global uncertain_cubies.
+    Returns the cube status, the cube color sequence and the color detection approach (BGR or HSV)."""
+    
+    global uncertain_cubies
+    
+    colors_order = ['white', 'red', 'green', 'yellow', 'orange', 'blue']    # colors as per URFDLB order
+    labels = np.array([colors_order.index(cube_status[i]) for i in range(len(cube_status))])  # colors index, per facelet
+    valid, reason = cubies.check(cube_string(cube_status))                  # cube status check at cubie level
+    decoded = None                                                          # cube status decoded at cubie level
+    if valid:                                                               # case the cube status is valid
+        cubies_conf = cubies.confidence(color_costs, labels)                # confidence per cubie
+    else:                                                                   # case the cube status is not valid
+        print(f'\nCube status via BGR color distance is not valid: {reason}')  # feedback is printed to the terminal
+        dec_labels, dec_conf = cubies.decode(color_costs)                   # cube status decoded at cubie level
+        status = {i:colors_order[c] for i, c in enumerate(dec_labels)}      # cube status of the decoded cubies
+        if cubies.check(cube_string(status))[0]:                            # case the decoded cube status is valid
+            if min(dec_conf.values()) >= cubies.DECODE_CONF:                # case all the decoded cubies are confident
+                print('Cube status decoded at cubie level')                 # feedback is printed to the terminal
+                cube_status, labels, cubies_conf, valid = status, dec_labels, dec_conf, True  # decoded cube status
+            else:                                                           # case of decoded cubies with low confidence
+                decoded = (cubies.cost(color_costs, dec_labels), status, dec_labels, dec_conf)  # decoded cube status, and its cost
+
+    if not valid:                                                           # case the cube status is (still) not valid
+        for n, (penalty, hyp) in enumerate(cubies.hypotheses(color_costs, labels, fixed=(4, 13, 22, 31, 40, 49))):
+            status = {i:colors_order[c] for i, c in enumerate(hyp)}          # cube status of the hypothesis
+            if n > 0 and cubies.check(cube_string(status))[0]:              # case the hypothesis is valid
+                if decoded != None and decoded[0] < cubies.cost(color_costs, hyp):  # case the decoded cube status is cheaper
+                    print('Cube status decoded at cubie level (cheaper than the hypotheses)')  # feedback is printed to the terminal
+                    _, cube_status, labels, cubies_conf = decoded           # decoded cube status
+                else:                                                       # case the hypothesis is cheaper
+                    print(f'Cube status hypothesis {n} (color distance penalty {round(penalty,1)}) is valid')  # feedback is printed to the terminal
+                    cube_status, labels = status, hyp                       # cube status of the hypothesis
+                    cubies_conf = cubies.confidence(color_costs, labels)    # confidence per cubie
+                valid = True                                                # valid cube status
+                break                                                       # for loop is interrupted
+
+    if not valid:                                                           # case the cube status is (still) not valid
+        uncertain_cubies = []                                               # cubies confidence not available
+        print('No valid cube status hypotheses via BGR color distance')      # feedback is printed to the terminal
+        a, b, c = cube_colors_interpr_HSV(BGR_detected, HSV_detected)       # cube status with colors detected via HSV
+        if len(a) == 54 and cubies.check(cube_string(a))[0]:                # case the HSV cube status is valid
+            return a, c, 'HSV'                                              # cube status, color sequence and approach are returned
+        if decoded == None:                                                 # case of no decoded cube status
+            return cube_status, cube_color_seq, 'BGR'                       # BGR interpretation is returned (solver will return an error)
+        print('Cube status decoded at cubie level (last resort)')           # feedback is printed to the terminal
+        _, cube_status, labels, cubies_conf = decoded                       # decoded cube status, with low confidence cubies
+
+    uncertain_cubies = [slot for slot, conf in cubies_conf.items() if conf < 0.5]  # cubies with low confidence
+    if len(uncertain_cubies) > 0:                                           # case of cubies with low confidence
+        print(f'Cubies with low color confidence: {uncertain_cubies}')      # feedback is printed to the terminal
+    return cube_status, cube_color_seq, 'BGR'                               # cube status, color sequence and approach are returned
+
+
+
+
+
+
+
 def scrambling_cube():
     """function to scramble the cube via the robot.
         The function first generate a random cube status, via a function available form the Kociemba solver package.
@@ -2101,9 +2993,7 @@ def scrambling_cube():
     disp.show_on_display('CUBE', 'SCRAMBLING', y2=80, fs1=46, fs2=26)  # feedback is printed on the display
     time.sleep(1)                   # little delay, to let user reading the screen
     start_time = time.time()        # current time 
-    cc = cubie.CubieCube()          # cube in cubie reppresentation
-    cc.randomize()                  # randomized cube in cubie reppresentation 
-    random_cube_string = str(cc.to_facelet_cube())   # randomized cube in facelets string reppresentation
+    random_cube_string = sv.random_cube()            # randomized cube in facelets string reppresentation (via solver daemon, or in process)
     print("Random cube status:", random_cube_string) # feedback is printed to the terminal
     solution, solution_Text = cube_solution(random_cube_string, scrambling = True) # Kociemba solver is called to have the solution string
     print(solution_Text)            # feedback is printed to the terminal
@@ -2189,6 +3079,44 @@ def scrambling_cube():
 
 
 
+def fastest_solution(candidates, max_moves=20):
+    """ Returns the solver solution (among the candidates) having the shortest estimated robot time.
+        The robot time depends on the robot moves, more than on the solution length: U, F and B moves require cube
+        flips, therefore the robot moves of each solution are timed via the servos settings (Cubotino_m_servos).
+        Solutions longer than max_moves aren't considered, unless none of them is within max_moves (the shortest
+        one is then returned, as the solver does at timeout)."""
+    
+    if len(candidates) == 0:        # case of no solutions
+        return 'Error: no solutions found'  # error string, as from the solver
+    lengths = [len(s[:s.find('(')].split()) for s in candidates]  # solutions length
+    if min(lengths) > max_moves or len(candidates) == 1:  # case of single solution (or solver error), or none within max_moves
+        return candidates[lengths.index(min(lengths))]    # the (shortest) solution is returned
+    candidates = [s for s, n in zip(candidates, lengths) if n <= max_moves]  # solutions within max_moves
+    
+    robot_times = []                # estimated robot time per solution
+    for s in candidates:            # iteration over the solutions
+        solution = s[:s.find('(')]  # solution capture the sequence of manoeuvres
+        solution_Text = s[s.find('(')+1:s.find(')')-1]+' moves  '+ solution  # moves amount and solution
+        _, robot_moves, total_robot_moves = rm.robot_required_moves(solution, solution_Text)  # robot movements
+        try:                                                       # tentative
+            robot_times.append(servo.estimate_robot_time(robot_moves))  # robot time estimated via servos timers
+        except:                                                    # case the servos settings aren't available
+            robot_times.append(total_robot_moves)                  # robot movements used instead of the robot time
+    
+    best = robot_times.index(min(robot_times))  # index of the solution requiring the shortest robot time
+    lengths = [len(s[:s.find('(')].split()) for s in candidates]  # solutions length
+    shortest = lengths.index(min(lengths))      # index of the shortest solution
+    if debug:                       # case debug variable is set true
+        print(f'\nSolver solutions: {len(candidates)}, estimated robot times: {[round(t,1) for t in robot_times]}')
+    print(f'Estimated robot time: {round(robot_times[best],1)} (shortest solution: {round(robot_times[shortest],1)})')
+    return candidates[best]
+
+
+
+
+
+
+
 def cube_solution(cube_string, scrambling=False):
     """ Calls the Hegbert Kociemba solver, and returns the solution's moves
     from: https://github.com/hkociemba/RubiksCube-TwophaseSolver 
@@ -2201,7 +3129,8 @@ def cube_solution(cube_string, scrambling=False):
 #     sv_max_time = 2       #(AF 2)   # solver parameter: timeout of 2 seconds, if not solution within max moves
    
 
-    s = sv.solve(cube_string, sv_max_moves, sv_max_time)  # solver is called
+    candidates = sv.solutions(cube_string, sv_max_moves, sv_max_time)  # solver is called, for solutions on different search directions
+    s = fastest_solution(candidates, sv_max_moves)  # solution requiring the shortest robot time, within sv_max_moves
 
     
 #################  solveto function to reach a wanted cube target from a known starting cube status   ######
@@ -2448,60 +3377,66 @@ def robot_facelets_rotation(facelets):
 
 
 
-def average_color(frame, x, y, edge):
+def average_color(frame, centers, edge):
     """ From: https://sighack.com/post/averaging-rgb-colors-the-right-way
-     Averages the pixels within a square defined area on an image
+     Averages the pixels within square defined areas on an image
      The average is calculated as the square root of the sum of the squares for the BGR colors
-     region centered at (x, y) meant as the square center, with 2*side as quare side lenght in pixels.
-     The function return a tuple with the averaged BGR colors
-     Pixel by pixel iteration doesn't sound efficient, yet for the small aarea I couldn't notice a time increment."""
-    
-    # square edge, is used as (half) side of the square to calculate the averaged color
-    
-    blue=float(0)    # blue variable set as float
-    green=float(0)   # green variable set as float
-    red=float(0)     # red variable set as float
-    
-    #Iterate through pixels of a bounding box having 2*edge as square side length in pixels
-    for i in range(2*edge):              # foor loop used to iterate the colums on the image square 
-        j=i-edge                         # iterator j is "shifted" by half of the square of pixels to analyse
-        for i in range(2*edge):          # for loops to iterate trhough the rows of the image square
-            bgr=frame[y+j,x-edge+i]      # gbr of a single pixel
-            b,g,r = bgr                  # bgr components
-            b=int(b)                     # from uint8 to integer
-            g=int(g)                     # from uint8 to integer
-            r=int(r)                     # from uint8 to integer
-            
-            #Sum the squares of components
-            blue += b*b                  # progressive sum of the square values for the blue component
-            green += g*g                 # progressive sum of the square values for the green component
-            red += r*r                   # progressive sum of the square values for the red component
-    num=4*edge*edge                      # amount of pixels in the image square under analysis    
+     regions centered at (x, y) of each center, with 2*edge as square side lenght in pixels.
+     
+     The sums of the pixels, and of their squares, are retrieved in O(1) from the integral images (cv2.integral2)
+     of the frame portion having the facelets, for 5 squares per facelet: the central one (as used so far) and 4 squares
+     shifted by edge along the diagonals. Squares with a large color deviation (specular reflections, dirty spots)
+     are rejected: the facelet color is the central square one when this is accepted, otherwise the average of the
+     accepted squares (the less deviating square if none is accepted).
+     The function returns a list of tuples with the averaged BGR colors, and a list with the facelets confidence
+     (fraction of accepted squares, 0 to 1)."""
+    
+    fh, fw = frame.shape[:2]                                 # frame height and width
+    xy = np.array(centers, dtype=np.int64).reshape(-1, 1, 2) # squares centers coordinates
+    ox, oy = max(int(np.min(xy[..., 0])) - 2*edge, 0), max(int(np.min(xy[..., 1])) - 2*edge, 0)  # top left of the frame portion
+    ex, ey = min(int(np.max(xy[..., 0])) + 2*edge, fw), min(int(np.max(xy[..., 1])) + 2*edge, fh)  # bottom right of the frame portion
+    sums, sqsums = cv2.integral2(frame[oy:ey, ox:ex], sdepth=cv2.CV_32S, sqdepth=cv2.CV_64F)  # integral images, once per face
+    fh, fw = ey - oy, ex - ox                                # frame portion height and width
+    
+    shift = edge * np.array(((0,0), (-1,-1), (1,-1), (1,1), (-1,1)))  # central square and the 4 shifted along the diagonals
+    tl = xy + shift - edge - (ox, oy)                        # top left of the squares (n facelets, 5 squares), on the frame portion
+    x0, y0 = np.clip(tl[..., 0], 0, fw), np.clip(tl[..., 1], 0, fh)                # top left, within the frame
+    x1, y1 = np.clip(tl[..., 0] + 2*edge, 0, fw), np.clip(tl[..., 1] + 2*edge, 0, fh)  # bottom right (excluded), within the frame
+    
+    num = np.maximum((x1 - x0) * (y1 - y0), 1)[..., np.newaxis]      # amount of pixels in each image square
+    s_sum = (sums[y1, x1] - sums[y0, x1] - sums[y1, x0] + sums[y0, x0]).astype(np.float64)  # sum of the BGR components, per square
+    sq_sum = sqsums[y1, x1] - sqsums[y0, x1] - sqsums[y1, x0] + sqsums[y0, x0]     # sum of the squares for the BGR components, per square
+    std = np.max(np.sqrt(np.maximum(sq_sum/num - (s_sum/num)**2, 0)), axis=2)      # max BGR standard deviation, per square
+    
+    ok = std <= 15                                           # squares with acceptable color deviation
+    pooled = np.sqrt(np.sum(sq_sum * ok[..., np.newaxis], axis=1) / np.maximum(np.sum(num * ok[..., np.newaxis], axis=1), 1))  # accepted squares
+    best = np.argmin(std, axis=1)                            # less deviating square, per facelet
+    single = np.sqrt(sq_sum / num)[np.arange(len(xy)), best] # sqrt of the mean of squared BGR sums, less deviating square
+    bgr = np.where(ok[:, :1], np.sqrt(sq_sum[:, 0] / num[:, 0]), np.where(np.any(ok, axis=1)[:, np.newaxis], pooled, single)).astype(int)
+    confidence = np.sum(ok, axis=1) / len(shift)             # fraction of accepted squares, per facelet
     
     # for debug purpose it is drawn the contour of the used area where the facelet's color is averaged 
     if debug and screen:                 # case debug and screed variables are set true on __main__
-        tl=(x-edge, y-edge)              # top left coordinate 
-        tr=(x+edge, y-edge)              # top right coordinate 
-        br=(x+edge, y+edge)              # bottom left coordinate 
-        bl=(x-edge, y+edge)              # bottom left coordinate 
-        pts=np.array([tl, tr, br, bl])   # array of coordinates
-        contour = [pts]                  # list is made with the array of coordinates
-        cv2.drawContours(frame, contour, -1, (230, 230, 230), 2)  # a white polyline is drawn on the contour (2 px thickness)
+        for x, y in xy[:, 0]:            # iteration over the squares centers
+            tl=(x-edge, y-edge)          # top left coordinate 
+            tr=(x+edge, y-edge)          # top right coordinate 
+            br=(x+edge, y+edge)          # bottom left coordinate 
+            bl=(x-edge, y+edge)          # bottom left coordinate 
+            pts=np.array([tl, tr, br, bl])   # array of coordinates
+            contour = [pts]              # list is made with the array of coordinates
+            cv2.drawContours(frame, contour, -1, (230, 230, 230), 2)  # a white polyline is drawn on the contour (2 px thickness)
     
-    #Return the sqrt of the mean of squared B, G, and R sums 
-    return (int(math.sqrt(blue/num)), int(math.sqrt(green/num)), int(math.sqrt(red/num)))
-
+    return [tuple(c) for c in bgr.tolist()], confidence.tolist()  # averaged BGR colors, and facelets confidence
 
 
 
 
-
-
-def read_color(frame, facelets, candidates, BGR_mean, H_mean, wait=20, index=0):
+def read_color(frame, facelets, candidates, BGR_mean, H_mean, wait=20, index=0, BGR_conf=None):
     """ Reads the average BGR color on the each facelet of the cube face just detected.
     Draw the contour used on each facelect (eventually the facelet number), to feedback on correct facelet reading/ordering
     Wait is the time (in ms) to keep each facelet visible while the remaining frame is forced black
-    The function returns (or updates) global variables, like BGR_mean, hsv, hue, s, v, H_mean. """
+    The function returns (or updates) global variables, like BGR_mean, hsv, hue, s, v, H_mean.
+    When BGR_conf list is provided, the facelets color confidence (0 to 1) is appended to it. """
     
     global edge
     
@@ -2514,19 +3449,20 @@ def read_color(frame, facelets, candidates, BGR_mean, H_mean, wait=20, index=0):
         # this square is later used to define a central (and small) square on each facelet, where to measure the average HSV
         edge = int(math.sqrt(area/500))    # use 270 for 3.3%, 500 for 1.3%
     
-    for facelet in facelets:                                  # iteration over the 9 facelets just detected
+    centers = [(facelet['cx'], facelet['cy']) for facelet in facelets]  # facelets contour center coordinates
+    bgr_mean_sq, confidence = average_color(frame, centers, edge)  # colors are averaged with sqr sum of squares, and their confidence
+    BGR_mean_sq = np.array([bgr_mean_sq], dtype=np.uint8)     # BGR are positioned in cv2 array form (1 row, a column per facelet)
+    hsv = cv2.cvtColor( BGR_mean_sq, cv2.COLOR_BGR2HSV)       # HSV color space equilavent values, for the average facelets colors
+    
+    for i, facelet in enumerate(facelets):                    # iteration over the 9 facelets just detected
         contour = facelet.get('contour')                      # contour of the facelet under analysis
         candidates.append(contour)                            # new contour is added to the candidates list
 #         mask = np.zeros(frame.shape[:2], dtype='uint8')       # mask of zeros is made for the frame shape dimension
 #         cv2.drawContours(mask, [contour], -1, 255, -1)        # mask is applied to vsualize one facelet at the time
-        cm_point=facelet['cx'],facelet['cy']                  # contour center coordinate
-        bgr_mean_sq = average_color(frame, facelet['cx'], facelet['cy'], edge)  # color is averaged with sqr sum of squares
-        BGR_mean.append(bgr_mean_sq)                          # Initially used a simpler mean to average the facelet color
-        b,g,r = bgr_mean_sq                                   # BGR (avg) components are retrieved
-        BGR_mean_sq = np.array([[[b,g,r]]], dtype=np.uint8)   # BGR are positioned in cv2 array form
-        hsv = cv2.cvtColor( BGR_mean_sq, cv2.COLOR_BGR2HSV)   # HSV color space equilavent values, for the average facelet color
-        hue, s, v = cv2.split(hsv)                            # HSV components are retrieved
-        H_mean.append((hue[0][0]))                            # the (avg) Hue value is stored on a list
+        BGR_mean.append(bgr_mean_sq[i])                       # Initially used a simpler mean to average the facelet color
+        H_mean.append(hsv[0][i][0])                           # the (avg) Hue value is stored on a list
+        if BGR_conf != None:                                  # case the facelets color confidence is requested
+            BGR_conf.append(confidence[i])                    # the color confidence is stored on a list
         
         # a progressive facelet numer, 1 to 9, is placed over the facelets
         # the facelet order is the one from camera point of view, therefore before re-ordering according to user POV
@@ -2705,6 +3641,9 @@ def robot_move_cube(robot_moves, total_robot_moves, solution_Text, start_time, s
                 time.sleep(7)                                  # 7 secs delay is applied, to let user reading info on screen
             else:                                              # case a screen is connected
                 time.sleep(1)                                  # 1 sec delay is applied, to let user reading info on screen
+            if len(uncertain_cubies) > 0:                      # case of cubies with low color confidence
+                disp.show_on_display('UNCERTAIN', ' '.join(uncertain_cubies[:3]), fs1=30, fs2=26)  # cubies to check are printed to the display
+                time.sleep(3)                                  # 3 secs delay is applied, to let user reading info on screen
         
         elif scrambling:                                       # case the robot is used to scramble a cube
             disp.show_on_display('CUBE', 'SCRAMBLED', fs1=46, y2=80, fs2=29)  # feedback is printed to the display
@@ -2879,7 +3818,7 @@ def check_headers(folder, fname):
         # 'CubeSolution'                            # latest_header used until 13/03/2024
         
         # additional headers since the first script release in a tuple (1st element is the last original header)
-        added_headers = ('CubeSolution', 'FCS')
+        added_headers = ('CubeSolution', 'FCS', 'ColorMargin')
         latest_header = added_headers[-1]           # header meant to be the latest
         last_header = headers[-1].strip().strip('\t') # header found as last        
         
@@ -2959,9 +3898,10 @@ def log_data(timestamp, facelets_data, cube_status_string, solution, color_detec
         m = 'CubeStatus'                                # 12th column header
         n = 'CubeSolution'                              # 13th column header
         o = 'FCS'                                       # 14th column header
+        p = 'ColorMargin'                               # 15th column header
         
         # tab separated string of the the headers
-        log_data = (a,b,c,d,e,f,g,h,i,k,l,m,n,o)        # tuple with the columns headers
+        log_data = (a,b,c,d,e,f,g,h,i,k,l,m,n,o,p)      # tuple with the columns headers
         log_data_len = len(log_data)                    # elements in tuple
         s=''                                            # empty string is assigned to the variable s
         for i, header in enumerate(log_data):           # interation trhough the tuple
@@ -2995,9 +3935,10 @@ def log_data(timestamp, facelets_data, cube_status_string, solution, color_detec
     m=str(cube_status_string)                           # string with the detected cbe status
     n=str(solution)                                     # solution returned by Kociemba solver
     o=str(fcs)                                          # fix coordinates system
+    p=str(round(color_margin,1))                        # colors assignment cost margin (BGR color distance approach)
     
     # tab separated string with info to log
-    log_data = (a,b,c,d,e,f,g,h,i,k,l,m,n,o)            # tuple with the columns data
+    log_data = (a,b,c,d,e,f,g,h,i,k,l,m,n,o,p)          # tuple with the columns data
     log_data_len = len(log_data)                        # elements in tuple
     s=''                                                # empty string is assigned to the variable s
     for i, data in enumerate(log_data):                 # interation trhough the tuple
@@ -3040,6 +3981,8 @@ def close_camera():
     """ Closes the camera object; It's important to close the camera, if the cube detection is performed more than once.
     On PiCamera it's importan to close it, at the end of a cube solving cycle to drop the AWB and Exposure setting used before."""
     
+    pipeline_stop()                     # vision pipeline is stopped, if running
+    capture_stop()                      # continuous capture via video port is stopped, if running
     try:
         camera.close()                  # necessary to close the camera to release the fix settings, like analog/digital gains
         if debug:                       # case debug variable is set true on __main__
@@ -3726,7 +4669,8 @@ def test_picamera():
 def tune_image_setup(display, gui_debug):
     
     global PiRGBArray, PiCamera, np, time, sys, cv2
-    global disp, debug, screen, robot_stop, picamera_test, cv_wow, Rpi_ZeroW, side, cycles_num
+    global disp, debug, screen, robot_stop, picamera_test, cv_wow, Rpi_ZeroW, side, cycles_num, capture_engine, vision_pipeline, roi, roi_fails
+    global auto_branch, auto_fails, frames_recorder
     global camera, rawCapture, width, height
     
     # import libraries
@@ -3742,6 +4686,11 @@ def tune_image_setup(display, gui_debug):
     screen = True                                   # scrren is always true when using the GUI
     robot_stop = False                              # false is assigned to robot_stop (variable used by webcam() function)
     picamera_test = True                            # this variable helps to use limited functionality from this script
+    capture_engine = None                           # the GUI uses the still capture
+    vision_pipeline = None                          # the GUI doesn't use the vision pipeline
+    frames_recorder = None                          # the GUI doesn't record frames
+    roi, roi_fails = None, 0                        # the GUI doesn't use the ROI
+    auto_branch, auto_fails = None, 0               # the GUI uses both the edge branches with frameless_cube 'auto'
     cv_wow = False                                  # cw_wow is set false
     Rpi_ZeroW = True                                # Rpi_ZeroW is set true for larger compatibility
     import_parameters(debug)                        # imports the robot parameters (not the servo ones)
@@ -3755,6 +4704,52 @@ def tune_image_setup(display, gui_debug):
 
 
 
+def replay_setup(replay_debug):
+    """ Sets the global variables needed to use the cube status detection functions without the robot.
+        This function is used by Cubotino_m_replay.py, to replay the frames recorded via the --record argument."""
+
+    global np, math, time, cv2, os, pathlib, dt, median, lattice, colors, cubies
+    global debug, screen, robot_stop, picamera_test, cv_wow, Rpi_ZeroW, side, prev_side, sides
+    global font, fontScale, fontColor, lineType, geometry_cache, roi, roi_fails, auto_branch, auto_fails, fcs_store
+    global f_coordinates, fcs_tried, fcs_prev, frames_recorder, face_accumulator
+
+    # import libraries
+    from statistics import median                   # median is used as sanity check while evaluating facelets contours
+    import os.path, pathlib                         # import libraries for file and folder management
+    import datetime as dt                           # mainly used as timestamp, like on data logging
+    import numpy as np                              # data array management
+    import math                                     # math package
+    import time                                     # time package
+    import cv2                                      # computer vision package
+    import Cubotino_m_lattice as lattice            # custom library, 3x3 lattice fitter for the facelets centers
+    import Cubotino_m_colors as colors              # custom library, vectorized Lab conversion and CIEDE2000 distance
+    import Cubotino_m_cubies as cubies              # custom library, cube status check at cubie level and hypotheses
+
+    debug = replay_debug                            # debug variable set in the replay script
+    screen = False                                  # screen is always false when replaying frames
+    robot_stop = False                              # false is assigned to robot_stop
+    picamera_test = False                           # picamera_test is set false
+    cv_wow = False                                  # cw_wow is set false
+    Rpi_ZeroW = False                               # Rpi_ZeroW is set false
+    import_parameters(debug)                        # imports the robot parameters (not the servo ones)
+    side = 0                                        # zero is assigned to side
+    prev_side = 0                                   # zero is assigned to prev_side
+    sides={0:'Empty',1:'U',2:'B',3:'D',4:'F',5:'R',6:'L'}  # cube side order used by the robot while detecting facelets colors
+    font, fontScale, fontColor, lineType = text_font()     # setting text font paramenters
+    geometry_cache = {}                             # cached remap maps, built at the first replayed frame
+    roi, roi_fails = None, 0                        # ROI for the edges analysis, set after the first locked face
+    auto_branch, auto_fails = None, 0               # edge branch with frameless_cube 'auto', set after the first locked face
+    prune_reset()                                   # contours prefilter counters
+    gate_reset()                                    # admission gate references
+    fcs_store = None                                # binary store of the facelets coordinates, not used on replay
+    frames_recorder = None                          # frames are not recorded while replaying them
+    face_accumulator = None                         # facelets candidates accumulator, set at each replay
+    f_coordinates, fcs_tried, fcs_prev = [], 0, []  # fix coordinates, side with FCS attempted, last side locked via edges
+
+
+
+
+
 def cube_facelets_permutation(cube_status, move_type, direction):
     """Function that updates the cube status, according to the move type the robot does
        The 'ref' tuples provide the facelet current reference position to be used on the updated position.
@@ -3920,7 +4915,7 @@ def start_up(first_cycle=False, set_cropping=False):
     # global variables
     global camera, width, height, w, h, rawCapture, camera_set_gains       # camera and frame related variables
     global show_time, cam_led_bright                                       # camera and frame related variables
-    global sides, side, faces, prev_side, BGR_mean, H_mean, URFDLB_facelets_BGR_mean      # cube status detection related variables
+    global sides, side, faces, prev_side, BGR_mean, H_mean, URFDLB_facelets_BGR_mean, BGR_conf  # cube status detection related variables
     global timeout, detect_timeout, robot_stop                             # robot related variables
     global font, fontScale, fontColor, lineType                            # cv2 text related variables
     global f_coordinates, fcs_delay
@@ -3931,6 +4926,7 @@ def start_up(first_cycle=False, set_cropping=False):
     prev_side=0                      # set the initial previous side, when the fps is calculated
     BGR_mean=[]                      # empty list to be filled with with 54 facelets BGR colors while reading cube status
     H_mean=[]                        # empty list to be filled with with 54 facelets HUE values, while reading cube status
+    BGR_conf=[]                      # empty list to be filled with with 54 facelets color confidence, while reading cube status
     URFDLB_facelets_BGR_mean=[]      # empty list to be filled with with 54 facelets colors, ordered according URFDLB order
     faces={}                         # dictionary that store the image of each face
     side=0                           # set the initial cube side (cube sides are 1 to 6, while zero is used as starting for other setting)
@@ -3987,10 +4983,10 @@ def cubeAF():
     
     # global variables
     global camera, rawCapture, width, height, h, w, cam_led_bright, fixWindPos, screen    # camera and frame related variables          
-    global sides, side, prev_side, faces, BGR_mean, H_mean, URFDLB_facelets_BGR_mean      # cube status detection related variables
+    global sides, side, prev_side, faces, BGR_mean, H_mean, URFDLB_facelets_BGR_mean, BGR_conf  # cube status detection related variables
     global font, fontScale, fontColor, lineType                                           # cv2 text related variables
     global servo, robot_stop, robot_idle, timeout, detect_timeout                         # robot related variables
-    global fcs
+    global fcs, frames_recorder, roi, face_accumulator, fcs_tried, fcs_prev
 
 
     robot_idle = False                              # robot is not anymore idling
@@ -4005,7 +5001,13 @@ def cubeAF():
     start_time = time.time()                        # initial time is stored before picamera warmup and setting
     faces.clear()                                   # empties the dict of images (6 sides) recorded during previous solving cycle
     facelets = []                                   # empties the list of contours having cube's square characteristics
-    all_coordinates = []                            # empties the list of contours centers coordinate as reference for next facelet search
+    all_coordinates = {}                            # empties the dict (by side) of contours centers coordinate as reference for next facelet search
+    fcs_tried = 0                                   # side with the Fix Coordinates System attempted at the first frame
+    fcs_prev = []                                   # facelets coordinates of the last side locked via the edges analysis
+    roi = None                                      # ROI for the edges analysis is reset (full frame until the first face is locked)
+    prune_reset()                                   # contours prefilter counters are reset
+    face_accumulator = accumulator.FaceletsAccumulator(accumulate_frames) if accumulate_frames > 0 else None  # facelets candidates over the frames
+    gate_reset()                                    # admission gate references are reset
     robot_to_cube_side(side, cam_led_bright)        # robot set with camera on read position
     servo.cam_led_On(cam_led_bright)                # led on top_cover is switched on before the PiCamera warmup phase     
     PiCamera_param = robot_camera_warmup(camera, start_time)    # calls the warmup function for PiCamera
@@ -4015,8 +5017,13 @@ def cubeAF():
         timestamp = dt.datetime.now().strftime('%Y%m%d_%H%M%S') # date_time variable is assigned, for file name and log purpose
         camera_ready_time=time.time()               # time stored after picamera warmup and settings for consistent pictures
         side = 1                                    # side is changed to 1, as the cube faces are numbered from 1 to 6
-        fcs = 0                                     # fcs = fix coordinates system, is initially set False (0)
+        fcs = 0                                     # fcs = fix coordinates system after fcs_delay, is initially set False (0)
+        fcs_locks = 0                               # sides locked via the fix coordinates system at the first frame
         t_ref = time.time()                         # timer is reset (timer used on each face detection to eventually witch to fix coordinates)
+        if args.record:                             # case the --record argument has been provided
+            frames_recorder = replay.FramesRecorder(width, height)  # frames recorder object, for offline replay
+        capture_start()                             # continuous capture via video port is started (if enabled)
+        pipeline_start(t_ref)                       # vision pipeline stage is started (if video port and no screen)
         
 
     while not robot_stop:                           # substantially the main loop, it can be interrupted by quit_func() 
@@ -4024,144 +5031,143 @@ def cubeAF():
             break                                   # while loop is interrupted
         
         plot_to_display(side)                       # feedback is printed to the display
-        frame, w, h = read_camera()                 # video stream and frame dimensions
+        result = None                               # result from the vision pipeline
+        if vision_pipeline != None:                 # case the vision pipeline is running
+            result = vision_pipeline.get()          # frame, dimensions and contours, from the pipeline queue
+            if result == None:                      # case no results from the pipeline
+                print('Vision pipeline not responding, back to sequential analysis')  # feedback is printed to the terminal
+                pipeline_stop()                     # vision pipeline is stopped
+        
+        if result != None:                          # case the vision pipeline returned a result
+            frame, w, h, contours, hierarchy, raw = result  # frame, dimensions, contours and raw YUV frame from the pipeline
+        else:                                       # case the vision pipeline isn't used
+            frame, w, h = read_camera(after=t_ref)  # video stream (frame taken after the last cube move) and frame dimensions
+            raw = raw_frame                         # raw frame (luma capture mode or coarse detection mode only)
         
         if screen:                                  # case screen variable is set true on __main__
             cv2.namedWindow('cube')                 # create the cube window
             if fixWindPos:                          # case the fixWindPos variable is chosen  
                 cv2.moveWindow('cube', 0,0)         # move the window to (0,0)
         
+        fcs_now = False                                      # flag for the Fix Coordinates System validated at the first frame
         if not robot_stop:                                   # case there are no requests to stop the robot
-            (contours, hierarchy)=read_facelets(frame, w, h) # reads cube's facelets and returns the contours
+            fcs_now = fcs_first_frame(frame)                 # Fix Coordinates System attempted at the first frame of the side
+            if fcs_now:                                      # case the fix coordinates are validated on the frame
+                contours, hierarchy = (), None               # the edges analysis isn't needed
+            elif result == None:                             # case the contours weren't retrieved by the vision pipeline
+                (contours, hierarchy)=read_facelets(frame, w, h) # reads cube's facelets and returns the contours
             candidates = []                                  # empties the list of potential contours
         
-        if not robot_stop and hierarchy is not None:         # analyze the contours in case these are previously retrieved
-            hierarchy = hierarchy[0]                         # only top level contours (no childs)
-            facelets = []                                    # empties the list of contours having cube's square characteristics
-            
-            if timeout or robot_stop:                        # in case of reached timeout or stop_button pressed
-                quit_func(quit_script=False)                 # quit function is called, withou forcing the script quitting
-                break                                        # while loop is interrupted
+        if  not robot_stop and time.time() - camera_ready_time > detect_timeout:  # timeout is calculated for the robot during cube status reading
+            pipeline_stop()                                  # vision pipeline is stopped
+            capture_stop()                                   # continuous capture via video port is stopped
+            if frames_recorder != None:                      # case the frames have been recorded
+                frames_recorder.save(settings)               # recorded frames are saved, useful to analyse the timeout
+                frames_recorder = None                       # frames recorder is released
+            timeout = robot_timeout_func()                   # in case the timeout is reached
+        
+        if not robot_stop and not timeout:                   # case there are no requests to stop the robot, and no timeout
+            fcs_due = fcs_now or time.time() - t_ref > fcs_delay  # case of validated FCS, or edges based detection taking more than fcs_delay secs
+            facelets, frame, fcs_frame, clean = frame_facelets(frame, w, h, contours, hierarchy, fcs_due)  # facelets from the frame analysis
+            if fcs_frame:                                    # case the facelets are based on the fix coordinates
+                if fcs_now:                                  # case of FCS validated at the first frame of the side
+                    fcs_locks += 1                           # first frame FCS locks counter is incremented
+                else:                                        # case of edges based detection taking more than fcs_delay
+                    fcs += 1                                 # fcs (Fix Coordinates System) is incremented
             
-            for component in zip(contours, hierarchy):                # each contour is analyzed   
-                contour, hierarchy, corners = get_approx_contours(component)  # contours are approximated
-    
-                if  time.time() - camera_ready_time > detect_timeout:  # timeout is calculated for the robot during cube status reading
-                    timeout = robot_timeout_func()                     # in case the timeout is reached
-                    break                                              # for loop is interrupted
-                
-                if robot_stop:                                         # case the robot has been stopped
-                    break                                              # for loop is interrupted
-                
-                if screen and not robot_stop:                          # case screen variable is set true on __main__
-                    cv2.imshow('cube', frame)                          # shows the frame 
-                    cv2.waitKey(1)      # refresh time is minimized to 1ms, refresh time mostly depending to all other functions
-                
-                if len(f_coordinates)>0 and time.time() - t_ref > fcs_delay:  # case the (edges based) facelets detection takes more than fcs_delay secs
-                    facelets, frame = get_facelets_fcs(facelets, frame)  # facelets info are based on fix coordinates
-                    fcs += 1                                           # fcs (Fix Coordinates System) is incremented
+            if screen and not robot_stop:                    # case screen variable is set true on __main__
+                cv2.imshow('cube', frame)                    # shows the frame 
+                cv2.waitKey(1)                               # refresh time is minimized to 1ms, real refresh time depends on other functions
             
-                if corners==4:                                         # contours with 4 corners are of interest
-                    facelets, frame = get_facelets(facelets, frame, contour, hierarchy) # returns a dict with cube compatible contours
-
-                if len(facelets)==9:                                   # case there are 9 contours having facelets compatible characteristics
-                    facelets = order_9points(facelets, new_center=[])  # contours are ordered from top left
-                    d_to_exclude = distance_deviation(facelets)        # facelets to remove due inter-distance not as regular 3x3 array
-                    if len(d_to_exclude)>=1:                           # check if any contour is too far to be part of the cube
-                        d_to_exclude.sort(reverse=True)                # reverse the contours order
-                        for i in d_to_exclude:                         # remove the contours too faar far to be part of the cube
-                            facelets.pop(i)                            # facelet is removed
+            if len(facelets)==9:                             # case having 9 contours compatible to a cube face
+                if vision_pipeline != None:                  # case the vision pipeline is running
+                    vision_pipeline.pause()                  # pipeline is paused, until the cube is on the next side
+                if fcs == 0 and not fcs_frame:               # case facelets were detected without the fix coordinates system method
+                    coordinates=[]                           # empty list to store the facelets coordinates of the last scanned face
+                    for i in range(9):                       # iteration over the 9 facelets
+                        coordinates.append(facelets[i]['cx'])  # x coordinate is retrieved and appended to the coordinates list
+                        coordinates.append(facelets[i]['cy'])  # y coordinate is retrieved and appended to the coordinates list
+                    all_coordinates[side] = coordinates      # 9 facelets centers coordinates of the side are stored in all_coordinates
                 
-                if len(facelets)==9:                                   # case having 9 contours compatible to a cube face
-                    if fcs == 0:                                       # case facelets were detected without the fix coordinates system method
-                        coordinates=[]                                 # empty list to store the facelets coordinates of the last scanned face
-                        for i in range(9):                             # iteration over the 9 facelets
-                            coordinates.append(facelets[i]['cx'])      # x coordinate is retrieved and appended to the coordinates list
-                            coordinates.append(facelets[i]['cy'])      # y coordinate is retrieved and appended to the coordinates list
-                        all_coordinates.append(coordinates)            # 9 facelets centers coordinates are appended to all_coordinates (all faces)
-                    
-                    robot_facelets_rotation(facelets)                              # order facelets as per viewer POW (due to cube/camera rotations on robot)
-                    read_color(frame, facelets, candidates, BGR_mean, H_mean)      # each facelet is read for color
-                    URFDLB_facelets_BGR_mean = URFDLB_facelets_order(BGR_mean)     # facelets are ordered as per URFDLB order
-                    plot_to_display(side, URFDLB_facelets_BGR_mean)                # detected colour are plot to the display
-#                     if not screen and side ==6:
-#                         time.sleep(0.3)
-                    faces = face_image(frame, facelets, side, faces)               # image of the cube side is taken for later reference
+                facelets, frame, w, h = face_lock(facelets, frame, raw, clean, w, h, fcs_frame, candidates, BGR_mean, H_mean, BGR_conf)  # colors reading
+                URFDLB_facelets_BGR_mean = URFDLB_facelets_order(BGR_mean)     # facelets are ordered as per URFDLB order
+                plot_to_display(side, URFDLB_facelets_BGR_mean)                # detected colour are plot to the display
+#                 if not screen and side ==6:
+#                     time.sleep(0.3)
+                faces = face_image(frame, facelets, side, faces)               # image of the cube side is taken for later reference
                     
-                    if screen and not robot_stop:                # case screen variable is set true on __main__
-                        if cv_wow:                               # case the cv image analysis plot is set true                              
-                            cv2.destroyWindow('cube')            # cube window is closed
-                            show_cv_wow(frame, time = 4000 if Rpi_ZeroW else 2000)  # call the function that shows the cv_wow image
-                        else:                                    # case the cv image analysis plot is set false
-                            for i in range(9):
-                                cv2.imshow('cube', frame)            # shows the frame 
-                                cv2.waitKey(1)                       # refresh time is minimized (1ms), yet real time is much higher
-                            time.sleep(vnc_delay)                # delay for cube face change, to compensate VNC viewer delay
+                if screen and not robot_stop:                # case screen variable is set true on __main__
+                    if cv_wow:                               # case the cv image analysis plot is set true                              
+                        cv2.destroyWindow('cube')            # cube window is closed
+                        show_cv_wow(frame, time = 4000 if Rpi_ZeroW else 2000)  # call the function that shows the cv_wow image
+                    else:                                    # case the cv image analysis plot is set false
+                        for i in range(9):
+                            cv2.imshow('cube', frame)            # shows the frame 
+                            cv2.waitKey(1)                       # refresh time is minimized (1ms), yet real time is much higher
+                        time.sleep(vnc_delay)                # delay for cube face change, to compensate VNC viewer delay
                     
-                    robot_to_cube_side(side, cam_led_bright)     # cube is rotated/flipped to the next face
-                    t_ref = time.time()                          # timer is reset (used on each face detection to eventually use fix coordinates)
-
-                    if side < 6:                                 # actions when a face has been completely detected, and there still are other to come
-                        side +=1                                 # cube side index is incremented
-                        break                                    # with this break the process re-starts from contour detection at the next cube face
-
-                    if side == 6:                                # case last cube's face is acquired
-                        disp.clean_display()                     # cleans the display
-                        servo.cam_led_Off()                      # led at top_cover is set off         
-                        cube_detect_time = time.time()           # time stored after detecteing all the cube facelets
-                        if screen:                               # case screen variable is set true on __main__
-                            try:                                 # tentative
-                                cv2.destroyAllWindows()          # cube window and eventual other open windows are closed
-                            except:                              # in case of exceptions
-                                pass                             # do nothing
+                robot_to_cube_side(side, cam_led_bright)     # cube is rotated/flipped to the next face
+                t_ref = time.time()                          # timer is reset (used on each face detection to eventually use fix coordinates)
+                if face_accumulator != None:                 # case the facelets candidates are accumulated over the frames
+                    face_accumulator.reset()                 # candidates of the previous side are removed
+                gate_reset()                                 # admission gate references are reset for the next side
+
+                if side < 6:                                 # actions when a face has been completely detected, and there still are other to come
+                    side +=1                                 # cube side index is incremented
+                    if vision_pipeline != None:              # case the vision pipeline is running
+                        vision_pipeline.resume(t_ref)        # pipeline resumed on the next side, on frames taken after the cube move
+                    continue                                 # the process re-starts from contour detection at the next cube face
+
+                if side == 6:                                # case last cube's face is acquired
+                    disp.clean_display()                     # cleans the display
+                    servo.cam_led_Off()                      # led at top_cover is set off         
+                    cube_detect_time = time.time()           # time stored after detecteing all the cube facelets
+                    if debug:                                # case debug variable is set true on __main__
+                        prune_report()                       # contours prefilter counters are printed to the terminal
+                    pipeline_stop()                          # vision pipeline is stopped
+                    capture_stop()                           # continuous capture via video port is stopped
+                    if frames_recorder != None:              # case the frames have been recorded
+                        frames_recorder.save(settings)       # recorded frames and related info are saved
+                        frames_recorder = None               # frames recorder is released
+                    if screen:                               # case screen variable is set true on __main__
+                        try:                                 # tentative
+                            cv2.destroyAllWindows()          # cube window and eventual other open windows are closed
+                        except:                              # in case of exceptions
+                            pass                             # do nothing
                         
-                        # cube string status with colors detected 
-                        cube_status, HSV_detected, cube_color_seq, HSV_analysis = cube_colors_interpr(URFDLB_facelets_BGR_mean)
-                        cube_status_string = cube_string(cube_status)                 # cube string for the solver
-                        solution, solution_Text = cube_solution(cube_status_string)   # Kociemba solver is called to have the solution string
-                        color_detection_winner='BGR'                                  # variable used to log which method gave the solution
-                        cube_solution_time=time.time()                                # time stored after getting the cube solution
-                        print(f'\nCube status (via BGR color distance): {cube_status_string}')   # feedback is printed to the terminal
-                        print(f'Camera warm-up, camera setting, cube status (BGR), and solution, in: {round(time.time()-start_time,1)} secs')
+                    # cube string status with colors detected 
+                    URFDLB_facelets_conf = URFDLB_facelets_order(BGR_conf)        # facelets color confidence, as per URFDLB order
+                    cube_status, HSV_detected, cube_color_seq, HSV_analysis = cube_colors_interpr(URFDLB_facelets_BGR_mean, URFDLB_facelets_conf)
                         
-################### DEBUG #############             
-#                         solution_Text = 'Error' # uncoment this row to force HSV color analysis method (this assignes 'Error' to solution_Text variable)
-#######################################             
-
-                        if solution_Text == 'Error':               # if colors interpretation on BGR color distance fail an attempt is made on HSV
-                            print(f'Solver return: {solution}\n')  # feedback is printed to the terminal
-                            a, b, c = cube_colors_interpr_HSV(URFDLB_facelets_BGR_mean,HSV_detected) # cube string status with colors detected
-                            cube_status, cube_status_HSV, cube_color_seq = a, b, c        # cube string status with colors detected to variables with proper name
-                            cube_status_string = cube_string(cube_status)                 # cube string for the solver
-                            solution, solution_Text = cube_solution(cube_status_string)   # Kociemba solver is called to have the solution string
-                            color_detection_winner='HSV'                                  # variable used to log which method give the solution
-                            cube_solution_time=time.time()                                # time stored after getting the cube solution
-                            print('Camera warm-up, camera setting, cube status (HSV), and solution, in:', round(time.time()-start_time,1))
-                            if solution_Text == 'Error':                   # in case color color detection fail also with HSV approach
-                                color_detection_winner='Error'             # the winner approach goes to error, for log purpose
-                            else: 
-                                print(f'\nCube status (via HSV color distance): {cube_status_string}')  # nice information to print at terminal, sometime useful to copy
-                                print(f'\nCube solution: {solution_Text}') # nice information to print at terminal, sometime useful to copy 
-
-      
-                        elif solution_Text != '0 moves  ':                 # case of interest, the cube isn't already solved
-                            print(f'\nCube solution: {solution_Text}')     # nice information to print at terminal, sometime useful to copy 
+                    # first valid cube status (BGR hypotheses, or HSV) is selected, so that the solver is called only once
+                    a, b, c = cube_status_select(cube_status, cube_color_seq, URFDLB_facelets_BGR_mean, HSV_detected)
+                    cube_status, cube_color_seq, color_detection_winner = a, b, c # cube status, color sequence and approach used
+                    cube_status_string = cube_string(cube_status)                 # cube string for the solver
+                    solution, solution_Text = cube_solution(cube_status_string)   # Kociemba solver is called to have the solution string
+                    cube_solution_time=time.time()                                # time stored after getting the cube solution
+                    print(f'\nCube status (via {color_detection_winner} color distance): {cube_status_string}')   # feedback is printed to the terminal
+                    print(f'Colors assignment cost margin: {round(color_margin,1)}')            # feedback is printed to the terminal
+                    print(f'Camera warm-up, camera setting, cube status ({color_detection_winner}), and solution, in: {round(time.time()-start_time,1)} secs')
+
+                    if solution_Text == 'Error':                       # case the solver returns an error (no valid cube status found)
+                        print(f'Solver return: {solution}\n')          # feedback is printed to the terminal
+                        color_detection_winner='Error'                 # the winner approach goes to error, for log purpose
+
+                    elif solution_Text != '0 moves  ':                 # case of interest, the cube isn't already solved
+                        print(f'\nCube solution: {solution_Text}')     # nice information to print at terminal, sometime useful to copy 
                         
-                        if fcs == 0:   # (fcs = fix coordinates system) case the all facelets were detected without the fix coordinates method
-                            save_coordinates(all_coordinates)              # saves the coordinates of the 9 facelets found during scanning
+                    if fcs == 0:   # (fcs = fix coordinates system) case the fcs_delay fallback wasn't needed on any side
+                        save_coordinates(all_coordinates)              # saves the coordinates of the sides locked via the edges analysis
+                    if debug and fcs_locks > 0:                        # case debug is set true, and sides locked via FCS at the first frame
+                        print(f'Sides locked via FCS at the first frame: {fcs_locks}')  # feedback is printed to the terminal
                         
-                        # function related to cube solving via the robot
-                        robot_solve_cube(fixWindPos, screen, frame, faces, cube_status, cube_color_seq, HSV_analysis, 
-                                            URFDLB_facelets_BGR_mean, font, fontScale, lineType, show_time, timestamp,
-                                            solution, solution_Text, color_detection_winner, cube_status_string, BGR_mean,
-                                            HSV_detected, start_time, camera_ready_time, cube_detect_time, cube_solution_time) 
+                    # function related to cube solving via the robot
+                    robot_solve_cube(fixWindPos, screen, frame, faces, cube_status, cube_color_seq, HSV_analysis, 
+                                        URFDLB_facelets_BGR_mean, font, fontScale, lineType, show_time, timestamp,
+                                        solution, solution_Text, color_detection_winner, cube_status_string, BGR_mean,
+                                        HSV_detected, start_time, camera_ready_time, cube_detect_time, cube_solution_time) 
                         
-                        return              # closes the cube reading/solver function in case it reaches the end
-                
-                
-                if screen and not robot_stop:        # case screen variable is set true on __main__
-                    cv2.imshow('cube', frame)        # shows the frame 
-                    cv2.waitKey(1)                   # refresh time is minimized to 1ms, real refresh time depends on other functions
+                    return              # closes the cube reading/solver function in case it reaches the end
               
         
         
@@ -4238,6 +5244,18 @@ if __name__ == "__main__":
         if args.no_motors:            # case the Cubotino_m.py has been launched with 'motors_hw' argument
             motors_hw = False         # flag to enable/disable the servos and step motor is set False
     
+    frames_recorder = None            # frames recorder object, set at each solving cycle when the --record argument is provided
+    capture_engine = None             # continuous capture (video port) object, running during the cube status detection
+    vision_pipeline = None            # vision pipeline stage (frame geometry, edges and contours), running during the cube status detection
+    roi, roi_fails = None, 0          # ROI for the edges analysis (set after the first locked face), and frames without face lock
+    warmup_seed = None                # PiCamera parameters converged at the previous cycle warmup, to seed the next one
+    auto_branch, auto_fails = None, 0 # edge branch locking the faces with frameless_cube 'auto' (kept over cycles), and frames without lock
+    prune_reset()                     # contours prefilter counters (contours pruned at each stage, per frame)
+    gate_reset()                      # admission gate references (previous frame thumbnail and sharpest frame of the side)
+    fcs_store = None                  # binary store of the facelets coordinates (FCS), loaded at each solving cycle
+    uncertain_cubies = []             # cubies with low color confidence, on the latest cube status sent to the solver
+    geometry_cache = {}               # cached remap maps for the frame cropping, warping and resizing (built at first frame)
+    
     btn = True                        # flag to enable/disable the start button at first cycle
     if args.no_btn != None:           # case 'no_btn' argument exists
         if args.no_btn:               # case the Cubotino_m.py has been launched with 'no_btn' argument
@@ -0,0 +1,70 @@
+#!/usr/bin/python
+# coding: utf-8
+
+"""
+#############################################################################################################
+# Andrea Favero 17 October 2026
+#
+# This script relates to CUBOTino micro, an extremely small and simple Rubik's cube solver robot 3D printed
+# CUBOTino micro is the smallest version of the CUBOTino versions
+#
+# Temporal accumulation of the facelets candidates (square like contours) over consecutive frames of a side.
+#  - The cube doesn't move while a side is read, therefore a facelet detected on a frame is still valid on the
+#    next frames, even if a reflection (glare) hides it on these frames.
+#  - Each candidate is a track, matched to the candidates of the next frames by the center distance.
+#  - At each frame the tracks confidence decays, and it increases when the track is matched again.
+#  - Tracks not matched within a short window of frames are dropped.
+#  - The merged candidates (tracks) are then checked as usual (3x3 array or lattice) for the face lock.
+#
+#############################################################################################################
+"""
+
+import numpy as np                             # data array management
+
+
+class FaceletsAccumulator:
+
+    def __init__(self, window=3, decay=0.5):
+        """Window is the number of frames a candidate is kept without being detected again, decay the
+            confidence factor applied at each frame (the confidence is increased by 1 when detected)."""
+
+        self.window = window                                                # frames a track is kept without detections
+        self.decay = decay                                                  # confidence decay factor, per frame
+        self.reset()                                                        # tracks are initialized
+
+
+
+    def reset(self):
+        """Removes all the tracks (i.e. when the cube is moved to the next side)."""
+
+        self.tracks = []                                                    # list of tracks: [facelet, confidence, last frame]
+        self.frame = 0                                                      # frames counter
+
+
+
+    def merge(self, facelets):
+        """Adds the candidates of a frame to the tracks, and returns the candidates of all the tracks (the
+            latest detection of each track), sorted by confidence (the most confident first)."""
+
+        self.frame += 1                                                     # frames counter is incremented
+        for track in self.tracks:                                           # iteration over the tracks
+            track[1] *= self.decay                                          # confidence decays
+
+        for f in facelets:                                                  # iteration over the frame candidates
+            best, best_d = None, 0.5 * np.sqrt(f['area'])                   # max matching distance, half facelet side
+            for track in self.tracks:                                       # iteration over the tracks
+                if track[2] == self.frame:                                  # case the track is already matched on this frame
+                    continue                                                # next track
+                d = np.hypot(track[0]['cx'] - f['cx'], track[0]['cy'] - f['cy'])  # distance between the centers
+                if d < best_d:                                              # case of closer track
+                    best, best_d = track, d                                 # closest track so far
+            if best is None:                                                # case the candidate doesn't match any track
+                self.tracks.append([f, 1.0, self.frame])                    # new track
+            else:                                                           # case the candidate matches a track
+                best[0] = f                                                 # latest detection is kept
+                best[1] += 1                                                # confidence is increased
+                best[2] = self.frame                                        # frame of the latest detection
+
+        self.tracks = [t for t in self.tracks if self.frame - t[2] < self.window]  # tracks not detected within the window are dropped
+        self.tracks.sort(key=lambda t: -t[1])                               # tracks sorted by confidence
+        return [t[0] for t in self.tracks]                                  # candidates of all the tracks
@@ -12,6 +12,16 @@ source /home/pi/cubotino_micro/src/.virtualenvs/bin/activate
 # enter the folder with the main scripts
 cd /home/pi/cubotino_micro/src
 
+# starts the solver daemon (Kociemba solver tables loaded once per boot), if not already running,
+# and waits for the tables to be loaded (max 300 secs, or until the daemon process exits on errors)
+# before starting the robot main script
+if ! python Cubotino_m_solver.py --ping;
+then
+    nohup python Cubotino_m_solver.py > /home/pi/cubotino_micro/src/Cubotino_m_solver.log 2>&1 &
+    solver_pid=$!
+    python Cubotino_m_solver.py --wait 300 --pid $solver_pid
+fi
+
 # runs the robot main script (--fast option requires a good cube holder tuning)
 # python Cubotino_m.py --fast
 python Cubotino_m.py
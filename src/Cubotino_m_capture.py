@@ -0,0 +1,265 @@
+#!/usr/bin/python
+# coding: utf-8
+
+"""
+#############################################################################################################
+# Andrea Favero 17 October 2026
+#
+# This script relates to CUBOTino micro, an extremely small and simple Rubik's cube solver robot 3D printed
+# CUBOTino micro is the smallest version of the CUBOTino versions
+#
+# Continuous PiCamera capture, via the video port, on a background thread.
+#  - Frames are written on two preallocated buffers (double buffer): the thread writes on the back buffer while
+#    the front buffer holds the latest complete frame.
+#  - Each frame has a sequence number and the time the capture started, so that the cube status detection
+#    can skip frames taken before the last servo move was completed.
+#  - Compared to the still capture (camera.capture per frame) the capture time is not anymore serialized with
+#    the frame analysis: when the analysis of a frame is done, the next one is (normally) already available.
+#  - Frames can be captured as 'bgr', or as 'yuv' (I420) for the luma capture mode: the Y plane is used for the
+#    edges and contours, while colors are converted to BGR only when a cube face is locked.
+#
+# Staged vision pipeline, to overlap capture, preprocessing and contours analysis on the Raspberry Pi cores:
+#  - capture stage: the CaptureEngine thread.
+#  - geometry/edge stage: a StageThread calling a function (i.e. frame remap, edge analysis and findContours).
+#  - contour/facelet stage: the caller (cubeAF), getting the results from a bounded queue.
+#  - Queues drop the oldest item when full; the stage queue holds one result, so that the analysis always works on
+#    the most recent frame.
+#  - While the cube is moved to the next side the stage is paused (no frames analysed, state reset by the caller),
+#    and the queued or pending results are discarded.
+#
+#############################################################################################################
+"""
+
+import threading, collections, time
+import numpy as np                             # data array management
+
+
+class CaptureEngine:
+
+    def __init__(self, camera, width, height, fmt='bgr'):
+        """Preallocates the two capture buffers and the output one.
+            With fmt='yuv' the buffers have the I420 layout: Y plane (height rows) followed by the U and V planes."""
+
+        self.camera = camera                                                # PiCamera object
+        self.fmt = fmt                                                      # capture format ('bgr' or 'yuv')
+        if fmt == 'yuv':                                                    # case of YUV (I420) capture
+            shape = (height*3//2, width)                                    # Y plane plus the quarter size U and V planes
+        else:                                                               # case of BGR capture
+            shape = (height, width, 3)                                      # three channels frame
+        self.buffers = [np.empty(shape, dtype=np.uint8) for i in range(2)]  # double buffer for the video port
+        self.frame = np.empty(shape, dtype=np.uint8)                        # frame returned to the analysis (copy of the front buffer)
+        self.front = -1                                                     # index of the buffer with the latest complete frame (-1 = none)
+        self.seq = 0                                                        # sequence number of the latest complete frame
+        self.stamp = 0                                                      # time the capture of the latest complete frame started
+        self.read_seq = 0                                                   # sequence number of the latest frame returned by read()
+        self.running = False                                                # flag for the capture thread
+        self.thread = None                                                  # capture thread
+        self.cond = threading.Condition()                                   # lock and notification for a new frame
+
+
+
+    def _buffers(self):
+        """Generator for camera.capture_sequence: each buffer is yielded to be written by the video port.
+            When the generator is resumed the yielded buffer is complete, and it becomes the front buffer."""
+
+        back = 0                                                            # index of the buffer to be written
+        while self.running:                                                 # case the capture is not stopped
+            stamp = time.time()                                             # capture start time for the frame
+            yield self.buffers[back]                                        # buffer is passed to the camera to be filled
+            with self.cond:                                                 # lock is acquired
+                self.front = back                                           # buffer just filled becomes the front buffer
+                self.seq += 1                                               # sequence number is incremented
+                self.stamp = stamp                                          # capture start time is stored
+                self.cond.notify_all()                                      # waiting read() is notified
+            back = 1 - back                                                 # the other buffer is used for the next frame
+
+
+
+    def _run(self):
+        """Capture thread."""
+
+        try:
+            self.camera.capture_sequence(self._buffers(), format=self.fmt, use_video_port=True)  # continuous capture
+        except Exception as e:                                              # case of exceptions
+            print('Capture thread error:', e)                               # feedback is printed to the terminal
+        with self.cond:                                                     # lock is acquired
+            self.running = False                                            # capture is not running anymore
+            self.cond.notify_all()                                          # waiting read() is notified
+
+
+
+    def start(self):
+        """Starts the capture thread."""
+
+        if not self.running:                                                # case the thread is not running
+            self.running = True                                             # flag for the capture thread is set True
+            self.thread = threading.Thread(target=self._run, daemon=True)   # capture thread
+            self.thread.start()                                             # capture thread is started
+
+
+
+    def stop(self):
+        """Stops the capture thread (after the frame under capture)."""
+
+        self.running = False                                                # flag for the capture thread is set False
+        if self.thread != None:                                             # case the thread was started
+            self.thread.join(timeout=2)                                     # waits the thread to end
+            self.thread = None                                              # thread is released
+
+
+
+    def read(self, after=0, timeout=1):
+        """Returns the latest complete frame not yet returned, having the capture started after the 'after' time.
+            Waits for such a frame up to timeout secs; returns (frame, seq, stamp), or (None, 0, 0) on timeout."""
+
+        with self.cond:                                                     # lock is acquired
+            fresh = lambda: self.front >= 0 and self.seq > self.read_seq and self.stamp > after  # new frame condition
+            if not self.cond.wait_for(lambda: fresh() or not self.running, timeout) or not fresh():
+                return None, 0, 0                                           # case no new frame within the timeout
+            np.copyto(self.frame, self.buffers[self.front])                 # front buffer is copied to the output frame
+            self.read_seq = self.seq                                        # sequence number of the returned frame
+            return self.frame, self.seq, self.stamp                         # frame, sequence number and capture start time
+
+
+
+
+class DropOldestQueue:
+
+    def __init__(self, maxlen=2):
+        """Bounded queue: when full, the oldest item is dropped to make room for the new one."""
+
+        self.items = collections.deque(maxlen=maxlen)                       # deque with maxlen drops the oldest item
+        self.dropped = 0                                                    # counter of the dropped items
+        self.cond = threading.Condition()                                   # lock and notification for a new item
+
+
+
+    def put(self, item):
+        """Adds an item, dropping the oldest one if the queue is full."""
+
+        with self.cond:                                                     # lock is acquired
+            if len(self.items) == self.items.maxlen:                        # case the queue is full
+                self.dropped += 1                                           # dropped items counter is incremented
+            self.items.append(item)                                         # item is added (the oldest is dropped if full)
+            self.cond.notify()                                              # waiting get() is notified
+
+
+
+    def get(self, timeout=1):
+        """Returns the oldest item in the queue, waiting up to timeout secs; returns None on timeout."""
+
+        with self.cond:                                                     # lock is acquired
+            if not self.cond.wait_for(lambda: len(self.items) > 0, timeout):  # case no items within the timeout
+                return None                                                 # None is returned
+            return self.items.popleft()                                     # oldest item is returned
+
+
+
+    def flush(self):
+        """Removes all the items from the queue."""
+
+        with self.cond:                                                     # lock is acquired
+            self.items.clear()                                              # items are removed
+
+
+
+
+class StageThread:
+
+    def __init__(self, stage_func, maxlen=1):
+        """Pipeline stage running stage_func on a background thread, and feeding the results to a DropOldestQueue.
+            stage_func(after) gets the 'after' time (set at flush) and returns a result, or None if nothing to queue.
+            With maxlen=1 the queue holds only the newest result, so that the caller never works one frame behind."""
+
+        self.stage_func = stage_func                                        # function processed by the stage
+        self.queue = DropOldestQueue(maxlen)                                # output queue of the stage
+        self.after = 0                                                      # time reference passed to the stage function
+        self.generation = 0                                                 # incremented at each flush, to discard pending results
+        self.running = False                                                # flag for the stage thread
+        self.active = threading.Event()                                     # event cleared while the stage is paused (i.e. while the cube moves)
+        self.active.set()                                                   # stage is not paused
+        self.busy = threading.Lock()                                        # lock held while the stage function is processed
+        self.thread = None                                                  # stage thread
+
+
+
+    def _run(self):
+        """Stage thread."""
+
+        while self.running:                                                 # case the stage is not stopped
+            if not self.active.wait(timeout=1):                             # waits (without polling) while the stage is paused
+                continue                                                    # running flag is checked again
+            if not self.running:                                            # case the stage has been stopped while paused
+                break                                                       # while loop is interrupted
+            with self.busy:                                                 # stage function is processed while holding the lock
+                if not self.active.is_set():                                # case the stage has been paused meanwhile
+                    continue                                                # stage function is not processed
+                generation = self.generation                                # generation before processing
+                try:
+                    result = self.stage_func(self.after)                    # stage function is processed
+                except Exception as e:                                      # case of exceptions
+                    print('Pipeline stage error:', e)                       # feedback is printed to the terminal
+                    break                                                   # while loop is interrupted
+                if result is not None and generation == self.generation and self.active.is_set():  # case of result, and no flush or pause
+                    self.queue.put(result)                                  # result is queued
+        self.running = False                                                # stage is not running anymore
+
+
+
+    def start(self):
+        """Starts the stage thread."""
+
+        if not self.running:                                                # case the thread is not running
+            self.running = True                                             # flag for the stage thread is set True
+            self.thread = threading.Thread(target=self._run, daemon=True)   # stage thread
+            self.thread.start()                                             # stage thread is started
+
+
+
+    def stop(self):
+        """Stops the stage thread, after the result under processing."""
+
+        self.running = False                                                # flag for the stage thread is set False
+        self.active.set()                                                   # paused thread is released, to end
+        if self.thread != None:                                             # case the thread was started
+            self.thread.join(timeout=2)                                     # waits the thread to end
+            self.thread = None                                              # thread is released
+        self.queue.flush()                                                  # queue is emptied
+
+
+
+    def flush(self, after):
+        """Discards the queued and the under processing results; next results are based on data after the 'after' time."""
+
+        self.after = after                                                  # time reference for the stage function
+        self.generation += 1                                                # pending result (under processing) will be discarded
+        self.queue.flush()                                                  # queued results are removed
+
+
+
+    def pause(self):
+        """Pauses the stage: returns once the stage function under processing (if any) has ended, so that the caller can
+            change the state used by the stage function (i.e. while the cube moves); queued results are discarded."""
+
+        self.active.clear()                                                 # stage is paused
+        with self.busy:                                                     # waits the stage function under processing
+            self.generation += 1                                            # pending result will be discarded
+            self.queue.flush()                                              # queued results are removed
+
+
+
+    def resume(self, after):
+        """Resumes the paused stage; next results are based on data after the 'after' time."""
+
+        self.flush(after)                                                   # time reference, and no results from before the pause
+        self.active.set()                                                   # stage is resumed, and the thread is released
+
+
+
+    def get(self, timeout=1):
+        """Returns the queued result (the newest one, with maxlen=1), waiting up to timeout secs; returns None on timeout
+            or stopped stage."""
+
+        if not self.running and len(self.queue.items) == 0:                 # case the stage is stopped and the queue empty
+            return None                                                     # None is returned
+        return self.queue.get(timeout)                                      # queued result
@@ -0,0 +1,692 @@
+#!/usr/bin/python
+# coding: utf-8
+
+"""
+#############################################################################################################
+# Andrea Favero 17 October 2026
+#
+# This script relates to CUBOTino micro, an extremely small and simple Rubik's cube solver robot 3D printed
+# CUBOTino micro is the smallest version of the CUBOTino versions
+#
+# Self checks of the modules used by the cube status detection and by the solver, without the robot (no PiCamera,
+# servos or display), on synthetic data (fake camera and fake solver where needed):
+#  - colors: the vectorized colors interpretation (Cubotino_m_colors) against the former scalar one (rgb2lab and
+#    CIEDE2000 per facelet), on synthetic cubes with exact ties; the Lab conversion of all the sampled colors.
+#  - lattice: Cubotino_m_lattice.fit_lattice on synthetic grids (rotation, step/side ratio, missed facelets), and
+#    rejection of corners plus center and of two rows only.
+#  - coordinates: Cubotino_m_coordinates running mean and std against numpy on the ring buffer, and save/load.
+#  - assign: the min cost assignment with counts (Cubotino_m_colors.assign_counts) and its cost margin, against
+#    the brute force enumeration of all the assignments on small instances.
+#  - cubies: Cubotino_m_cubies.check against the twophase validation (face and cubie levels) on random and
+#    altered cubes; hypotheses against the brute force enumeration of the single and double swaps.
+#  - decode: Cubotino_m_cubies.decode always returning a valid cube, and exact with confidence above DECODE_CONF on
+#    clean readings.
+#  - pipeline: Cubotino_m_capture.CaptureEngine on a fake camera (fresh, not repeated and not torn frames, stop),
+#    and StageThread (newest result, no stage function calls while paused, results after resume, stop while paused).
+#  - cache: the camera calibration records of Cubotino_m.py (ambient fingerprint tolerance, led level, latest 10
+#    records, corrupted file), in a temporary folder.
+#  - gate: the admission gate of Cubotino_m.py on synthetic frames (first frame held, moving and blurred frames
+#    rejected, a frame admitted after 5 consecutive rejections, disabled gate).
+#  - daemon: the solver daemon of Cubotino_m_solver with a fake solver (no tables) on a temporary socket: requests,
+#    errors, socket permissions, stop, in process fallback without solver, and --wait ending on an exited daemon.
+#  - tables: the move and symmetry twophase tables memory mapped by Cubotino_m_tables, against the ones loaded by
+#    twophase (each on a new process), with a thread creating arrays while importing.
+#  - fastest: Cubotino_m_moves.robot_time on elementary robot moves, and fastest_solution of Cubotino_m.py on random
+#    solutions (robot time via the servos timers, or robot moves count when the servos aren't initialized).
+#  - python Cubotino_m_checks.py runs all the checks (or the ones listed as arguments, i.e. colors lattice), and
+#    exits with code 1 if any check fails.
+#  - The settings files created by Cubotino_m.py import (local settings and backups) are removed at the end.
+#
+#############################################################################################################
+"""
+
+import os, sys, glob, tempfile, itertools, time, threading, json
+import numpy as np                             # data array management
+
+COLORS = ('white', 'red', 'green', 'yellow', 'orange', 'blue')  # colors as per URFDLB order
+BGR_BASE = ((235, 235, 235), (40, 30, 190), (50, 160, 40), (40, 215, 225), (30, 120, 245), (180, 70, 20))  # synthetic BGR
+CENTERS = (4, 13, 22, 31, 40, 49)              # centers facelets
+SETTINGS_FILES = ('Cubotino_m_settings*.txt', 'Cubotino_m_servo_settings*.txt')  # settings files (local, AF and backups)
+
+
+
+def _colors_reference(cm, BGR_detected, BGR_conf=None):
+    """Former scalar colors interpretation (rgb2lab and CIEDE2000 per facelet, adaptive references, without the count
+        constraint); Returns the colors name per facelet."""
+
+    ref = {c: BGR_detected[f] for c, f in zip(COLORS, CENTERS)}            # BGR references, from the centers
+    ref_lab = {c: tuple(cm.rgb2lab([R, G, B])) for c, (B, G, R) in ref.items()}  # Lab references
+    low_conf = [BGR_conf != None and BGR_conf[i] < 0.6 for i in range(54)]  # facelets with low color confidence
+    dist = {i: [cm.CIEDE2000(tuple(cm.rgb2lab([R, G, B])), lab) for lab in ref_lab.values()]
+            for i, (B, G, R) in enumerate(BGR_detected)}                    # distances from the initial references
+    order = []                                                              # facelets by increasing distance
+    while dist:                                                             # iteration until all the facelets are ordered
+        key = min(dist, key=lambda k: (low_conf[k], min(dist[k])))          # facelet with the smallest distance
+        order.append(key)                                                   # facelet is appended
+        dist.pop(key)                                                       # facelet is removed
+
+    status = {}                                                             # colors name per facelet
+    for f in order:                                                         # iteration over the ordered facelets
+        B, G, R = BGR_detected[f]                                           # BGR of the facelet
+        lab = tuple(cm.rgb2lab([R, G, B]))                                  # Lab of the facelet
+        d = {c: cm.CIEDE2000(lab, ref_lab[c]) for c in COLORS}              # distances from the adapted references
+        color = min(d, key=d.get)                                           # closest reference
+        status[f] = color                                                   # facelet color
+        if low_conf[f]:                                                     # case of low confidence facelet
+            continue                                                        # reference isn't adapted
+        rb, rg, rr = ref[color]                                             # reference BGR
+        ref[color] = tuple(np.sqrt((np.array((B, G, R), dtype=float)**2 + np.array((rb, rg, rr))**2)/2).tolist())
+        B_avg, G_avg, R_avg = ref[color]                                    # adapted reference
+        ref_lab[color] = tuple(cm.rgb2lab([R_avg, G_avg, B_avg]))           # adapted Lab reference
+    return [status[i] for i in range(54)]
+
+
+
+def _synthetic_colors(rng, sigma=8):
+    """Returns 54 synthetic facelets BGR (integers), with 9 facelets per color, and some exact ties."""
+
+    labels = np.repeat(np.arange(6), 9)                                     # 9 facelets per color
+    labels = np.delete(labels, [9*c for c in range(6)])                     # one facelet per color is a center
+    rng.shuffle(labels)                                                     # random colors position
+    labels = np.insert(labels, [4, 12, 20, 28, 36, 44], np.arange(6))       # centers at the URFDLB positions
+    bgr = np.array(BGR_BASE)[labels] * rng.uniform(0.8, 1.05, (54, 1)) + rng.normal(0, sigma, (54, 3))  # vignetting and noise
+    bgr = np.clip(np.round(bgr), 0, 255).astype(int)                        # BGR integers
+    for _ in range(rng.integers(0, 4)):                                     # some exact ties
+        a, b = rng.choice(54, 2, replace=False)                             # facelets
+        bgr[a] = bgr[b]                                                     # same BGR
+    return [tuple(v) for v in bgr.tolist()]
+
+
+
+def _cubotino_m():
+    """Returns the Cubotino_m module, with the globals set as for the replay (no robot)."""
+
+    sys.argv = sys.argv[:1]                                                 # arguments are removed, as Cubotino_m.py parses its own ones
+    import Cubotino_m as cm                                                 # Cubotino_m functions
+    if not hasattr(cm, 'side'):                                             # case the globals aren't set yet
+        cm.replay_setup(False)                                              # Cubotino_m globals, as for the replay
+    return cm
+
+
+
+def check_colors(n=5000, seed=1):
+    """Vectorized colors interpretation against the former scalar one; Returns True when no mismatches."""
+
+    cm = _cubotino_m()                                                      # Cubotino_m functions
+
+    rng = np.random.default_rng(seed)                                       # random generator
+    rgb = rng.uniform(0, 255, (20000, 3))                                   # random RGB colors (also not integer, as the references)
+    lab = cm.colors_lab(rgb[:, ::-1].copy())                                # vectorized conversion (BGR input)
+    lab_err = sum(tuple(l) != tuple(cm.rgb2lab(c)) for l, c in zip(lab.tolist(), rgb.tolist()))  # differences from rgb2lab
+
+    compared, mismatches = 0, 0                                             # cubes compared, and mismatches
+    for _ in range(n):                                                      # iteration over the synthetic cubes
+        bgr = _synthetic_colors(rng)                                        # facelets BGR
+        conf = rng.choice([1.0, 0.4], 54, p=[0.95, 0.05]).tolist() if rng.random() < 0.5 else None  # low confidence facelets
+        ref = _colors_reference(cm, bgr, conf)                              # former interpretation
+        if any(ref.count(c) != 9 for c in COLORS):                          # case without 9 facelets per color
+            continue                                                        # count constraint applies (different by design)
+        status = cm.cube_colors_interpr(bgr, conf)[0]                       # vectorized interpretation
+        compared += 1                                                       # compared cubes counter
+        mismatches += [status[i] for i in range(54)] != ref                 # mismatches counter
+    print(f'colors:       Lab conversion {lab_err} differences on {len(rgb)} colors; '
+          f'{mismatches} mismatches on {compared} cubes (9 facelets per color, of {n})')
+    return lab_err == 0 and mismatches == 0
+
+
+
+def check_lattice(seed=4):
+    """fit_lattice on synthetic grids; Returns True when all the cases are as expected."""
+
+    import Cubotino_m_lattice as lattice                                    # lattice face fitter
+    rng = np.random.default_rng(seed)                                       # random generator
+    cases = (('all', range(9), True), ('6 of 9', (0, 2, 3, 5, 7, 8), True), ('5 of 9', (1, 3, 4, 5, 7), True),
+             ('4 of 9', (0, 1, 4, 8), True), ('corners+center', (0, 2, 4, 6, 8), False), ('rows 0-1', (0, 1, 2, 3, 4), False),
+             ('corners', (0, 2, 6, 8), False))
+    failed, total = [], 0                                                   # failed cases, and cases
+    side = 40                                                               # facelets side, pixels
+    for ratio in (1.1, 1.25, 1.4):                                          # step/side ratio (frameless to framed cube)
+        for deg in (0, 7, 30, 44):                                          # grid rotation
+            a = np.deg2rad(deg)                                             # rotation, radians
+            R = np.array(((np.cos(a), -np.sin(a)), (np.sin(a), np.cos(a)))) # rotation matrix
+            grid = np.array([(c, r) for r in range(3) for c in range(3)], dtype=float) * side * ratio @ R.T + 200
+            square = np.array(((-1, -1), (1, -1), (1, 1), (-1, 1))) * side / 2 @ R.T  # facelet contour
+            for name, idx, fit in cases:                                    # iteration over the cases
+                total += 1                                                  # cases counter
+                pts = grid[list(idx)] + rng.normal(0, 1, (len(idx), 2))     # detected centers, with noise
+                angle = lattice.orientation([square + p for p in pts])      # facelets orientation
+                r = lattice.fit_lattice(pts, side, angle)                   # fitted lattice
+                if fit:                                                     # case the lattice should fit
+                    err = np.inf if r is None else max(np.min(np.hypot(*(r[0] - g).T)) for g in grid)  # max grid error
+                    ok = err < 4                                            # lattice on the right points
+                else:                                                       # case the lattice should be rejected
+                    ok = r is None                                          # no lattice
+                if not ok:                                                  # case of unexpected result
+                    failed.append(f'{name} ratio {ratio} rotation {deg}')   # failed case
+    print(f'lattice:      {total - len(failed)}/{total} synthetic cases as expected {failed if failed else ""}')
+    return len(failed) == 0
+
+
+
+def check_coordinates(n=50, seed=5):
+    """Coordinates store running statistics against numpy, and save/load; Returns True when all the checks pass."""
+
+    import Cubotino_m_coordinates as coords                                 # coordinates store
+    rng = np.random.default_rng(seed)                                       # random generator
+    failed = 0                                                              # failed checks
+    with tempfile.TemporaryDirectory() as folder:                           # temporary folder
+        fname = os.path.join(folder, 'store.bin')                           # store file
+        store = coords.CoordinatesStore(fname, size=5)                      # coordinates store
+        records = {s: [] for s in range(coords.SLOTS)}                      # records added per slot
+        for i in range(n):                                                  # iteration over the records
+            slot = int(rng.integers(coords.SLOTS))                          # slot
+            rec = rng.normal(300, 20, coords.COORDS)                        # record
+            store.add(rec, slot)                                            # record is added to the store
+            records[slot].append(rec)                                       # record is added to the reference
+            last = np.array(records[slot][-5:])                             # ring buffer content
+            failed += store.count(slot) != len(last)                        # records count
+            failed += store.mean(slot) != np.round(last.mean(axis=0)).astype(int).tolist()  # mean
+            failed += not np.allclose(store.std(slot), last.std(axis=0), atol=1e-6)  # std
+        store.save()                                                        # store is saved
+        loaded = coords.CoordinatesStore(fname, size=5)                     # store is loaded
+        for s in range(coords.SLOTS):                                       # iteration over the slots
+            failed += loaded.count(s) != store.count(s) or loaded.mean(s) != store.mean(s)  # same content
+    print(f'coordinates:  {failed} differences from numpy on {n} records, and after save/load')
+    return failed == 0
+
+
+
+def check_assign(n=300, seed=2):
+    """assign_counts against the brute force enumeration; Returns True when cost and margin are always the same."""
+
+    from Cubotino_m_colors import assign_counts                             # min cost assignment with counts
+    rng = np.random.default_rng(seed)                                       # random generator
+    failed = 0                                                              # failed instances
+    for t in range(n):                                                      # iteration over the instances
+        m, count = rng.integers(2, 4), rng.integers(1, 3)                   # colors, and facelets per color
+        d = rng.uniform(0, 50, (m*count, m))                                # distance matrix
+        if t % 3 == 0:                                                      # case of instances with ties
+            d = np.round(d / 10) * 10                                       # rounded distances
+        fixed = (0,) if t % 2 else ()                                       # fixed facelet (as a center)
+        start = np.argmin(d, axis=1)                                        # min distance labels
+        start[list(fixed)] = 0                                              # fixed facelet label
+        labels, margin = assign_counts(d, start, fixed=fixed, count=count)  # min cost assignment
+
+        costs = []                                                          # costs of all the feasible assignments
+        for lab in itertools.product(range(m), repeat=m*count):             # iteration over all the assignments
+            lab = np.array(lab)                                             # labels
+            if np.all(np.bincount(lab, minlength=m) == count) and all(lab[f] == 0 for f in fixed):
+                costs.append(d[np.arange(len(lab)), lab].sum())             # feasible assignment cost
+        costs.sort()                                                        # costs by increasing value
+        cost = d[np.arange(len(labels)), labels].sum()                      # cost of assign_counts
+        bf_margin = costs[1] - costs[0] if len(costs) > 1 else 0.0          # brute force margin
+        if abs(cost - costs[0]) > 1e-9 or abs(margin - bf_margin) > 1e-9:   # case of different cost or margin
+            failed += 1                                                     # failed instances counter
+    print(f'assign:       {n - failed}/{n} instances with brute force cost and margin')
+    return failed == 0
+
+
+
+def _twophase_valid(s):
+    """Returns True when the cube string is valid for the twophase solver (face and cubie level checks), and the
+        cubie cube gives back the same string (twophase identifies a corner from two colors, accepting mirrored corners)."""
+
+    import twophase.face as face                                            # facelets level (no tables)
+    import twophase.cubie as cubie                                          # cubie level (no tables)
+    fc = face.FaceCube()                                                    # cube in facelets reppresentation
+    if fc.from_string(s) != cubie.CUBE_OK:                                  # case of invalid cube string
+        return False                                                        # False is returned
+    cc = fc.to_cubie_cube()                                                 # cube in cubie reppresentation
+    return cc.verify() == cubie.CUBE_OK and str(cc.to_facelet_cube()) == s  # cubie level verification, and same string
+
+
+
+def check_cubies(n=300, seed=3):
+    """cubies check and hypotheses; Returns True when all the checks pass."""
+
+    import Cubotino_m_cubies as cubies                                      # cubie level check and hypotheses
+    from Cubotino_m_colors import assign_counts                             # min cost assignment with counts
+    import twophase.cubie as tc                                             # random cubes (no tables)
+    rng = np.random.default_rng(seed)                                       # random generator
+    fs = [i for i in range(54) if i not in CENTERS]                         # not center facelets
+
+    check_err, cases = 0, 0                                                 # errors counter, and cube strings checked
+    for _ in range(n):                                                      # iteration over the random cubes
+        cc = tc.CubieCube()                                                 # cube in cubie reppresentation
+        cc.randomize()                                                      # random cube
+        s = str(cc.to_facelet_cube())                                       # cube string
+        alt = list(s)                                                       # altered cube string
+        a, b = rng.choice(fs, 2, replace=False)                             # facelets to swap
+        alt[a], alt[b] = alt[b], alt[a]                                     # swapped facelets (also same color)
+        for t in (s, ''.join(alt)):                                         # valid and altered cube
+            cases += 1                                                      # cube strings counter
+            check_err += cubies.check(t)[0] != _twophase_valid(t)           # different validation
+
+    hyp_err = 0                                                             # hypotheses errors
+    for _ in range(n):                                                      # iteration over small instances
+        d = rng.uniform(0, 30, (8, 4))                                      # distance matrix (8 facelets, 4 colors)
+        start = np.argmin(d, axis=1)                                        # min distance labels
+        start[0] = 0                                                        # fixed facelet label
+        labels, _ = assign_counts(d, start, fixed=(0,), count=2)            # min cost assignment
+        base = d[np.arange(8), labels].sum()                                # assignment cost
+        bf = []                                                             # brute force single and double swaps penalty
+        pairs = [(i, j) for i, j in itertools.combinations(range(1, 8), 2) if labels[i] != labels[j]]
+        for k in (1, 2):                                                    # single and double swaps
+            for combo in itertools.combinations(pairs, k):                  # iteration over the swaps combinations
+                f = [x for p in combo for x in p]                           # facelets of the swaps
+                if len(set(f)) != len(f):                                   # case of swaps sharing a facelet
+                    continue                                                # next combination
+                h = labels.copy()                                           # hypothesis
+                for i, j in combo:                                          # iteration over the swaps
+                    h[i], h[j] = labels[j], labels[i]                       # swap
+                bf.append(d[np.arange(8), h].sum() - base)                  # hypothesis penalty
+        bf.sort()                                                           # penalties by increasing value
+        gen = list(cubies.hypotheses(d, labels, fixed=(0,), k=len(bf) + 1))[1:]  # hypotheses, without the assignment
+        real = [d[np.arange(8), h].sum() - base for _, h in gen]            # penalties of the hypotheses labels
+        hyp_err += (len(gen) != len(bf) or not np.allclose([p for p, _ in gen], bf) or not np.allclose(real, bf))
+    print(f'cubies:       check {check_err} differences from twophase on {cases} cubes; '
+          f'hypotheses {hyp_err} differences from brute force on {n} instances')
+    return check_err == 0 and hyp_err == 0
+
+
+
+def check_decode(n=300, seed=6):
+    """cubies decode always valid, and exact with confidence on clean readings; Returns True when all the checks pass."""
+
+    import Cubotino_m_cubies as cubies                                      # cubie level check and decoder
+    import twophase.cubie as tc                                             # random cubes (no tables)
+    rng = np.random.default_rng(seed)                                       # random generator
+
+    decode_err, conf_err = 0, 0                                             # errors counters
+    for _ in range(n):                                                      # iteration over the random cubes
+        cc = tc.CubieCube()                                                 # cube in cubie reppresentation
+        cc.randomize()                                                      # random cube
+        lab = np.array(['URFDLB'.index(c) for c in str(cc.to_facelet_cube())])  # colors index per facelet
+        d = rng.uniform(25, 60, (54, 6))                                    # clean reading: far from the other colors
+        d[np.arange(54), lab] = rng.uniform(0, 15, 54)                      # close to the facelet color
+        dec, conf = cubies.decode(d)                                        # decoded cube status
+        decode_err += not np.array_equal(dec, lab)                          # clean reading must be decoded exactly
+        conf_err += min(conf.values()) < cubies.DECODE_CONF                 # clean reading must be accepted as it is
+        dec, _ = cubies.decode(rng.uniform(0, 60, (54, 6)))                 # random distances
+        decode_err += not cubies.check(''.join('URFDLB'[c] for c in dec))[0]  # decoded cube must be valid
+    print(f'decode:       {decode_err} errors on {2*n} cubes (clean and random readings); '
+          f'{conf_err} clean readings below DECODE_CONF')
+    return decode_err == 0 and conf_err == 0
+
+
+
+class _FakeCamera:
+
+    def __init__(self, period=0.005):
+        """Camera stand in for CaptureEngine: each buffer is filled with the frame counter, one frame per period."""
+
+        self.period = period                                                # secs per frame
+        self.frames = 0                                                     # frames counter
+
+
+
+    def capture_sequence(self, outputs, format='bgr', use_video_port=True):
+        """Fills the buffers yielded by the outputs generator, as the PiCamera video port."""
+
+        for buf in outputs:                                                 # iteration over the buffers to be filled
+            time.sleep(self.period)                                         # frame capture time
+            self.frames += 1                                                # frames counter
+            buf.fill(self.frames % 256)                                     # whole buffer written with the frame counter
+
+
+
+def check_pipeline():
+    """CaptureEngine and StageThread (start, read, flush, pause, resume, stop) with a fake camera and stage function;
+        Returns True when all the checks pass."""
+
+    import Cubotino_m_capture as capture                                    # capture engine and pipeline stage
+    errors = []                                                             # failed checks
+
+    engine = capture.CaptureEngine(_FakeCamera(), 16, 8)                    # capture engine on the fake camera
+    engine.start()                                                          # capture thread is started
+    seqs = []                                                               # sequence numbers of the read frames
+    for _ in range(20):                                                     # iteration over the frames read
+        t_ref = time.time()                                                 # time reference (i.e. end of a servo move)
+        frame, seq, stamp = engine.read(after=t_ref)                        # frame captured after the time reference
+        if frame is None or stamp <= t_ref or frame.min() != frame.max():   # case of missed, old or torn frame
+            errors.append('capture read')                                   # failed check
+        seqs.append(seq)                                                    # sequence number is stored
+    if any(b <= a for a, b in zip(seqs, seqs[1:])):                         # case a frame is returned twice
+        errors.append('capture sequence')                                   # failed check
+    engine.stop()                                                           # capture thread is stopped
+    engine.read(timeout=0)                                                  # frame completed while stopping (if any)
+    t_ref = time.time()                                                     # time reference
+    if engine.thread is not None or engine.read(timeout=1)[0] is not None or time.time() - t_ref > 0.5:
+        errors.append('capture stop')                                       # read must return at once after stop
+
+    calls = []                                                              # stage function calls (after, paused)
+    paused = threading.Event()                                              # set while the stage is paused
+    def stage_func(after):                                                  # stage function
+        calls.append((after, paused.is_set()))                              # call is stored
+        time.sleep(0.002)                                                   # processing time
+        return after, len(calls)                                            # result: time reference and call number
+
+    stage = capture.StageThread(stage_func)                                 # pipeline stage
+    stage.flush(1.0)                                                        # time reference for the stage function
+    stage.start()                                                           # stage thread is started
+    r = stage.get()                                                         # first result
+    if r is None or r[0] != 1.0:                                            # case of missed result
+        errors.append('stage get')                                          # failed check
+    time.sleep(0.05)                                                        # the stage produces more results than read
+    r = stage.get()                                                         # newest result
+    if r is None or len(calls) - r[1] > 2 or len(stage.queue.items) > 1:    # case of old result, or results piling up
+        errors.append('stage newest result')                                # failed check
+
+    stage.pause()                                                           # stage is paused (i.e. the cube moves)
+    paused.set()                                                            # state changed by the caller while paused
+    time.sleep(0.1)                                                         # cube moving time
+    if any(p for _, p in calls) or len(stage.queue.items) > 0:              # case of calls or results while paused
+        errors.append('stage pause')                                        # failed check
+    paused.clear()                                                          # state restored before resuming
+    stage.resume(2.0)                                                       # stage is resumed, with a new time reference
+    r = stage.get()                                                         # first result after resume
+    if r is None or r[0] != 2.0:                                            # case of result from before the pause
+        errors.append('stage resume')                                       # failed check
+
+    stage.pause()                                                           # stage is paused
+    t_ref = time.time()                                                     # time reference
+    stage.stop()                                                            # paused stage is stopped
+    if stage.thread is not None or time.time() - t_ref > 0.5 or stage.get() is not None:
+        errors.append('stage stop while paused')                            # the paused thread must end at once
+    print(f'pipeline:     capture engine and stage thread {"checks passed" if not errors else errors}')
+    return len(errors) == 0
+
+
+
+def check_camera_cache():
+    """Camera calibration records (load_camera_cache and save_camera_cache) in a temporary folder; Returns True when
+        all the checks pass."""
+
+    cm = _cubotino_m()                                                      # Cubotino_m functions
+    cm.json = json                                                          # json module (imported by import_libraries on the robot)
+    param = (1.5, 1.2, (1.6, 1.4), 20000)                                   # PiCamera parameters at the end of the warmup
+    fp = cm.camera_fingerprint(param)                                       # ambient light fingerprint
+    tol = 2 * (1 - cm.kl)                                                   # relative tolerance of the fingerprint
+    errors = []                                                             # failed checks
+    cwd = os.getcwd()                                                       # script folder
+    with tempfile.TemporaryDirectory() as folder:                           # temporary folder
+        os.chdir(folder)                                                    # records are saved in the active folder
+        try:
+            if cm.load_camera_cache(fp) != 0:                               # case of shutter time without records file
+                errors.append('no records')                                 # failed check
+            cm.save_camera_cache(fp, param, 10000)                          # calibration record is saved
+            if cm.load_camera_cache(fp) != 10000:                           # case the record isn't found
+                errors.append('same fingerprint')                           # failed check
+            near = fp[:1] + [v * (1 + 0.5*tol) for v in fp[1:]]             # ambient light within the tolerance
+            far = fp[:1] + [fp[1] * (1 + 2*tol)] + fp[2:]                   # brightness out of the tolerance
+            led = [fp[0] + 0.05] + fp[1:]                                   # different led brightness
+            if cm.load_camera_cache(near) != 10000 or cm.load_camera_cache(far) != 0 or cm.load_camera_cache(led) != 0:
+                errors.append('fingerprint tolerance')                      # failed check
+            for i in range(12):                                             # more records than the kept ones
+                cm.save_camera_cache(fp, param, 11000 + i)                  # calibration record is saved
+            with open('Cubotino_m_camera_cache.txt', 'r') as f:             # calibration records file
+                records = json.load(f)                                      # calibration records
+            if len(records) != 10 or cm.load_camera_cache(fp) != 11011:     # case of more records, or not the most recent
+                errors.append('latest records')                             # failed check
+            with open('Cubotino_m_camera_cache.txt', 'w') as f:             # calibration records file
+                f.write('{corrupted')                                       # corrupted file (i.e. power loss while writing)
+            if cm.load_camera_cache(fp) != 0:                               # case the corrupted file isn't ignored
+                errors.append('corrupted file')                             # failed check
+            cm.save_camera_cache(fp, param, 12000)                          # record saved over the corrupted file
+            if cm.load_camera_cache(fp) != 12000 or os.listdir(folder) != ['Cubotino_m_camera_cache.txt']:
+                errors.append('file rewrite')                               # failed check (also temporary file left)
+        finally:
+            os.chdir(cwd)                                                   # back to the script folder
+    print(f'camera cache: calibration records {"checks passed" if not errors else errors}')
+    return len(errors) == 0
+
+
+
+def check_gate(seed=7):
+    """Admission gate (frame_admission and gate_reset) on synthetic frames; Returns True when all the checks pass."""
+
+    import cv2                                                              # computer vision package
+    cm = _cubotino_m()                                                      # Cubotino_m functions
+    rng = np.random.default_rng(seed)                                       # random generator
+    tiles = rng.integers(0, 256, (24, 32, 3)).astype(np.uint8)              # random tiles
+    sharp = cv2.resize(tiles, (640, 480), interpolation=cv2.INTER_NEAREST)  # sharp frame, with strong edges
+    moved = np.roll(sharp, 40, axis=1)                                      # same frame, moved (i.e. cube still spinning)
+    blurred = cv2.GaussianBlur(sharp, (0, 0), 6)                            # same frame, blurred
+    settings = cm.gate_motion, cm.gate_blur                                 # gate settings
+    cm.gate_motion, cm.gate_blur = 6.0, 0.5                                 # gate settings, as per the default ones
+    cm.prune_reset()                                                        # gate counters
+    cm.gate_reset()                                                         # gate references
+    errors = []                                                             # failed checks
+    try:
+        if cm.frame_admission(sharp) or cm.prune_stats['held'] != 1:        # case the first frame after reset isn't held
+            errors.append('first frame held')                               # failed check
+        if not cm.frame_admission(sharp):                                   # case the still and sharp frame is rejected
+            errors.append('still frame')                                    # failed check
+        if cm.frame_admission(moved) or cm.prune_stats['motion'] != 1:      # case the moved frame is admitted
+            errors.append('motion')                                         # failed check
+        cm.frame_admission(blurred)                                         # blurred frame, also moving from the previous one
+        if cm.frame_admission(blurred) or cm.prune_stats['blur'] < 1:       # case the still blurred frame is admitted
+            errors.append('blur')                                           # failed check
+        cm.gate_reset()                                                     # gate references, as for a new side
+        cm.frame_admission(sharp)                                           # first frame, held
+        admitted = [cm.frame_admission((moved, sharp)[i % 2]) for i in range(7)]  # frames always moving
+        if admitted != [False]*5 + [True, False]:                           # case the 6th consecutive frame isn't admitted
+            errors.append('consecutive rejections')                         # failed check
+        cm.gate_motion, cm.gate_blur = 0, 0                                 # gate disabled
+        if not all(cm.frame_admission(f) for f in (moved, sharp, blurred)): # case of frames rejected by the disabled gate
+            errors.append('disabled gate')                                  # failed check
+    finally:
+        cm.gate_motion, cm.gate_blur = settings                             # gate settings are restored
+        cm.gate_reset()                                                     # gate references
+    print(f'gate:         admission gate {"checks passed" if not errors else errors}')
+    return len(errors) == 0
+
+
+
+FAKE_DAEMON = """
+import os, sys, types
+import Cubotino_m_solver as sv
+sv.SOCKET_DIR = sys.argv[1]
+sv.SOCKET = os.path.join(sv.SOCKET_DIR, 'solver.sock')
+def load():
+    cube = types.SimpleNamespace(to_facelet_cube=lambda: 'UUUUUUUUURRRRRRRRRFFFFFFFFFDDDDDDDDDLLLLLLLLLBBBBBBBBB', randomize=lambda: None)
+    sv._sv = types.SimpleNamespace(solve=lambda c, m, t: 'R1 U2 (2f)' if len(c) == 54 else 'Error: 54 facelets')
+    sv._cubie = types.SimpleNamespace(CubieCube=lambda: cube)
+    return True
+sv.load = load
+sv._solutions = lambda c, m, t: ['R1 U2 (2f)', 'F1 B3 D2 (3f)']
+sv.serve()
+"""                                                                         # solver daemon with a fake solver (no tables)
+
+
+
+def check_daemon():
+    """Solver daemon protocol (fake solver on a temporary socket), in process fallback and --wait on an exited daemon;
+        Returns True when all the checks pass."""
+
+    import subprocess, signal                                               # daemon process
+    import Cubotino_m_solver as sv                                          # Kociemba solver via daemon or in process
+    errors = []                                                             # failed checks
+    backup = sv.SOCKET_DIR, sv.SOCKET, sv.load                              # module settings and loader
+    with tempfile.TemporaryDirectory() as folder:                           # temporary folder
+        sv.SOCKET_DIR = os.path.join(folder, 'solver')                      # socket folder
+        sv.SOCKET = os.path.join(sv.SOCKET_DIR, 'solver.sock')              # socket
+        sv.load = lambda: False                                             # solver tables not available in process
+        daemon = None                                                       # daemon process
+        try:
+            if sv.daemon_running():                                         # case of daemon running before being started
+                errors.append('ping before start')                          # failed check
+            daemon = subprocess.Popen([sys.executable, '-c', FAKE_DAEMON, sv.SOCKET_DIR], stdout=subprocess.PIPE,
+                                      stderr=subprocess.STDOUT, text=True)  # daemon with the fake solver
+            t_ref = time.time()                                             # time reference
+            while not sv.daemon_running() and time.time() - t_ref < 10:     # waits the daemon to be ready
+                time.sleep(0.1)                                             # short sleep before checking again
+            cube = 'UUUUUUUUURRRRRRRRRFFFFFFFFFDDDDDDDDDLLLLLLLLLBBBBBBBBB'     # cube string
+            if sv.solve(cube) != 'R1 U2 (2f)' or sv.solve('U') != 'Error: 54 facelets':
+                errors.append('solve')                                      # failed check
+            if sv.solutions(cube) != ['R1 U2 (2f)', 'F1 B3 D2 (3f)'] or sv.random_cube() != cube:
+                errors.append('solutions and random')                       # failed check
+            if sv._request({'cmd': 'other'}, 2) != 'Error: unknown request':  # case of unknown request not answered
+                errors.append('unknown request')                            # failed check
+            if not str(sv._request({'cmd': 'solve'}, 2)).startswith('Error: solver daemon'):  # case of malformed request
+                errors.append('malformed request')                          # failed check
+            if os.stat(sv.SOCKET_DIR).st_mode & 0o777 not in (0o700, 0o750) or os.stat(sv.SOCKET).st_mode & 0o777 != 0o660:
+                errors.append('socket permissions')                         # failed check
+            daemon.send_signal(signal.SIGTERM)                              # daemon is terminated
+            out = daemon.communicate(timeout=5)[0]                          # daemon feedback
+            if os.path.exists(sv.SOCKET) or sv.daemon_running() or 'Solver daemon stopped' not in out:
+                errors.append('daemon stop')                                # failed check
+            if (sv.solve(cube), sv.solutions(cube), sv.random_cube()) != ('Error: Kociemba solver not found',
+                    ['Error: Kociemba solver not found'], 'Error: Kociemba solver not found'):
+                errors.append('fallback without solver')                    # failed check (no daemon, no tables)
+        finally:
+            if daemon is not None and daemon.poll() is None:                # case the daemon is still running
+                daemon.kill()                                               # daemon is killed
+                daemon.communicate()                                        # daemon process is ended
+            sv.SOCKET_DIR, sv.SOCKET, sv.load = backup                      # module settings and loader are restored
+
+    if sv.daemon_running():                                                 # case of solver daemon running (i.e. on the robot)
+        print('daemon:       --wait check skipped, as the solver daemon is running')
+    else:                                                                   # case the solver daemon isn't running
+        t_ref = time.time()                                                 # time reference
+        wait = subprocess.run([sys.executable, 'Cubotino_m_solver.py', '--wait', '20', '--pid', str(daemon.pid)],
+                              stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)  # wait on the exited daemon process
+        if wait.returncode != 1 or 'exited before being ready' not in wait.stdout or time.time() - t_ref > 5:
+            errors.append('wait on exited daemon')                          # failed check (the wait must end at once)
+    print(f'daemon:       solver daemon protocol and fallback {"checks passed" if not errors else errors}')
+    return len(errors) == 0
+
+
+
+TABLES_CHILD = """
+import sys, json, hashlib, array, threading
+import Cubotino_m_tables as tables
+affected = []
+stop = threading.Event()
+def other_thread():
+    while not stop.is_set() and not affected:
+        if type(array.array('H')) is not array.array:
+            affected.append(True)
+th = threading.Thread(target=other_thread, daemon=True)
+th.start()
+if sys.argv[1] == 'mmap':
+    modules = tables.import_mapped('twophase.moves', 'twophase.symmetries')
+else:
+    import twophase.moves, twophase.symmetries
+    modules = [twophase.moves, twophase.symmetries]
+stop.set()
+th.join()
+out = {m.__name__ + '.' + k: [type(v).__name__, len(v), hashlib.md5(bytes(v)).hexdigest(), getattr(v, 'readonly', True)]
+       for m in modules for k, v in vars(m).items() if isinstance(v, (array.array, memoryview))}
+print(json.dumps({'tables': out, 'arrays': not affected, 'array_module': all(m.ar is array for m in modules)}))
+"""                                                                         # imports the move and symmetry tables (in memory or mapped)
+
+
+
+def check_tables():
+    """Memory mapped twophase tables (Cubotino_m_tables.import_mapped) against the tables loaded by twophase, on the move
+        and symmetry tables only (the pruning tables might be generated); Returns True when all the checks pass."""
+
+    import subprocess                                                       # child processes
+    if not os.path.isfile(os.path.join('twophase', 'move_twist')):           # case of missing move tables
+        print('tables:       check skipped, as the twophase move tables are missing')
+        return True
+
+    results = {}                                                            # results per mode
+    for mode in ('array', 'mmap'):                                          # iteration over the modes
+        try:
+            out = subprocess.run([sys.executable, '-c', TABLES_CHILD, mode], capture_output=True, text=True,
+                                 timeout=120).stdout                        # child process output
+            results[mode] = json.loads(out.strip().splitlines()[-1])        # results of the child process
+        except (subprocess.TimeoutExpired, ValueError, IndexError):         # case the import fails, or doesn't end
+            print(f'tables:       twophase import failed, with the tables {"memory mapped" if mode == "mmap" else "in memory"}')
+            return False
+    ref, mapped = results['array']['tables'], results['mmap']['tables']     # tables in memory, and memory mapped
+    views = [k for k, v in mapped.items() if v[0] == 'memoryview']          # memory mapped tables
+    errors = []                                                             # failed checks
+    if set(ref) != set(mapped) or any(ref[k][1:3] != mapped[k][1:3] for k in ref):  # case of different tables
+        errors.append('tables content')                                     # failed check
+    if len(views) < 15 or not all(mapped[k][3] for k in views):             # case of tables not mapped, or writable
+        errors.append(f'{len(views)} mapped tables')                        # failed check
+    if not results['mmap']['arrays'] or not results['mmap']['array_module']:  # case the array module is affected
+        errors.append('array module')                                       # failed check (other threads, or not restored)
+    print(f'tables:       {len(views)} move and symmetry tables memory mapped, '
+          f'{"checks passed" if not errors else errors}')
+    return len(errors) == 0
+
+
+
+def check_fastest(n=200, seed=8):
+    """Robot time estimation (Cubotino_m_moves.robot_time) on elementary robot moves, and fastest_solution selection on
+        random solutions; Returns True when all the checks pass."""
+
+    import types, io, contextlib                                            # servos stand in, and terminal feedback
+    import Cubotino_m_moves as rm                                           # robot moves, and their estimated time
+    cm = _cubotino_m()                                                      # Cubotino_m functions
+    timers = {'t_flip_to_close_time': 1, 't_close_to_flip_time': 2, 't_flip_open_time': 4, 't_open_close_time': 8,
+              't_rel_time': 16, 'b_spin_time': 32, 'b_rotate_time': 64, 'b_rel_time': 128}  # servos timers (one bit each)
+    cases = (('', 'read', False, 0), ('S1', 'read', False, 36), ('S1', 'open', False, 32), ('F1', 'read', False, 4),
+             ('F2', 'read', False, 16), ('R1', 'read', False, 224), ('F1R1', 'read', False, 222), ('F1S1', 'read', False, 40),
+             ('R1F1', 'read', False, 232), ('F1R1', 'read', True, 221), ('R1F1', 'read', True, 228))  # moves, start, one step, time
+    errors = [c[0] for c in cases if rm.robot_time(c[0], timers, c[1], c[2]) != c[3]]  # failed elementary cases
+
+    rng = np.random.default_rng(seed)                                       # random generator
+    backup = {k: getattr(cm, k) for k in ('rm', 'servo') if hasattr(cm, k)}  # Cubotino_m modules (set on the robot only)
+    cm.rm = rm                                                              # robot moves module
+    failed = 0                                                              # failed selections
+    with contextlib.redirect_stdout(io.StringIO()):                         # terminal feedback isn't printed
+        try:
+            if cm.fastest_solution([]) != 'Error: no solutions found' or cm.fastest_solution(['Error: 8']) != 'Error: 8':
+                errors.append('no solutions')                               # failed check
+            for i in range(n):                                              # iteration over the random candidates
+                sols = []                                                   # candidate solutions
+                for _ in range(rng.integers(2, 10)):                        # iteration over the candidates
+                    k = int(rng.integers(17, 23))                           # solution length
+                    sols.append(' '.join(rng.choice(list('URFDLB')) + rng.choice(list('123')) for _ in range(k)) + f' ({k}f)')
+                lengths = [int(s[s.find('(')+1:s.find('f)')]) for s in sols]  # solutions length
+                if i % 2:                                                   # case the servos timers are available
+                    cm.servo = types.SimpleNamespace(estimate_robot_time=lambda moves: rm.robot_time(moves, timers))
+                    cost = lambda s: rm.robot_time(rm.robot_required_moves(s[:s.find('(')], s)[1], timers)
+                else:                                                       # case the servos aren't initialized
+                    cm.__dict__.pop('servo', None)                          # robot moves count is used instead
+                    cost = lambda s: rm.robot_required_moves(s[:s.find('(')], s)[2]
+                within = [s for s, k in zip(sols, lengths) if k <= 20]      # solutions within max_moves
+                if len(within) == 0:                                        # case of no solutions within max_moves
+                    expected = sols[lengths.index(min(lengths))]            # shortest solution
+                elif len(sols) == 1:                                        # case of single solution
+                    expected = sols[0]                                      # solution
+                else:                                                       # case of solutions within max_moves
+                    costs = [cost(s) for s in within]                       # robot time, or robot moves
+                    expected = within[costs.index(min(costs))]              # fastest solution
+                failed += cm.fastest_solution(sols, 20) != expected         # failed selections counter
+        finally:
+            for k in ('rm', 'servo'):                                       # iteration over the Cubotino_m modules
+                cm.__dict__.pop(k, None)                                    # module is removed
+            cm.__dict__.update(backup)                                      # modules set before the check
+    if failed:                                                              # case of failed selections
+        errors.append(f'{failed}/{n} selections')                           # failed check
+    print(f'fastest:      robot time and fastest solution {"checks passed" if not errors else errors}')
+    return len(errors) == 0
+
+
+
+
+
+if __name__ == "__main__":
+
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))                    # modules and settings are in the script folder
+    settings_before = {f for p in SETTINGS_FILES for f in glob.glob(p)}     # settings files before the checks
+    checks = {'colors': check_colors, 'lattice': check_lattice,
+              'coordinates': check_coordinates, 'assign': check_assign,
+              'cubies': check_cubies, 'decode': check_decode,
+              'pipeline': check_pipeline, 'cache': check_camera_cache,
+              'gate': check_gate, 'daemon': check_daemon,
+              'tables': check_tables, 'fastest': check_fastest}             # available checks
+    names = [a for a in sys.argv[1:] if a in checks] or list(checks)        # checks to be run
+    try:
+        results = [checks[name]() for name in names]                        # checks are run
+    finally:
+        for f in {f for p in SETTINGS_FILES for f in glob.glob(p)} - settings_before:  # settings files created by the checks
+            os.remove(f)                                                    # file is removed
+    print('All the checks passed' if all(results) else 'Some checks FAILED')
+    sys.exit(0 if all(results) else 1)                                      # exit code 1 if any check fails
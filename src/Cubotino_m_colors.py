@@ -0,0 +1,187 @@
+#!/usr/bin/python
+# coding: utf-8
+
+"""
+#############################################################################################################
+# Andrea Favero 17 October 2026
+#
+# This script relates to CUBOTino micro, an extremely small and simple Rubik's cube solver robot 3D printed
+# CUBOTino micro is the smallest version of the CUBOTino versions
+#
+# Vectorized color metrics for the cube colors interpretation (numpy arrays instead of per facelet loops).
+#  - rgb2lab converts many RGB colors at once, with the same operations (and rounding) of Cubotino_m.rgb2lab.
+#  - ciede2000 returns the CIEDE2000 distance matrix between two sets of Lab colors, with the same formula of
+#    Cubotino_m.CIEDE2000.
+#  - numpy transcendental functions (pow, exp, atan2) can differ from the math module ones on the last bit: rgb2lab
+#    flags the colors close to a rounding step, and distances closer than TOL are ties, so that the caller can use
+#    the scalar functions on those few cases and keep exactly the same decisions.
+#
+#############################################################################################################
+"""
+
+import numpy as np                             # data array management
+
+TOL = 1e-9                                     # distances closer than this are considered as ties
+C_25_7 = 6103515625                            # 25**7
+
+
+def _round4(x):
+    """Rounds to 4 decimals; returns the rounded values and a mask of the values close to a rounding step."""
+
+    scaled = x * 1e4                                                        # values scaled to the 4th decimal
+    frac = scaled - np.floor(scaled)                                        # fractional part of the scaled values
+    return np.round(x, 4), np.abs(frac - 0.5) < 1e-6                        # rounded values, and values close to a step
+
+
+
+def rgb2lab(rgb):
+    """Converts RGB (not BGR !!!) colors, array of n rows, in L*a*b color space (observer 2nd, illuminant D65).
+        Returns the Lab array (n rows) and a boolean array with the colors close to a rounding step, to be converted
+        with the scalar function when the exact same values are needed."""
+
+    value = np.asarray(rgb, dtype=np.float64).reshape(-1, 3) / 255          # RGB components, 0 to 1
+    value = np.where(value > 0.04045, ((value + 0.055) / 1.055) ** 2.4, value / 12.92) * 100  # linear RGB, 0 to 100
+
+    R, G, B = value[:, 0], value[:, 1], value[:, 2]                         # linear RGB components
+    X, nx = _round4(R * 0.4124 + G * 0.3576 + B * 0.1805)                   # X component, rounded
+    Y, ny = _round4(R * 0.2126 + G * 0.7152 + B * 0.0722)                   # Y component, rounded
+    Z, nz = _round4(R * 0.0193 + G * 0.1192 + B * 0.9505)                   # Z component, rounded
+
+    XYZ = np.column_stack((X / 95.047, Y / 100.0, Z / 108.883))             # reference white (ref_X, ref_Y, ref_Z)
+    XYZ = np.where(XYZ > 0.008856, XYZ ** (0.3333333333333333), (7.787 * XYZ) + (16 / 116))
+
+    L, nL = _round4((116 * XYZ[:, 1]) - 16)                                 # L component, rounded
+    a, na = _round4(500 * (XYZ[:, 0] - XYZ[:, 1]))                          # a component, rounded
+    b, nb = _round4(200 * (XYZ[:, 1] - XYZ[:, 2]))                          # b component, rounded
+    return np.column_stack((L, a, b)), nx | ny | nz | nL | na | nb          # Lab colors, and colors close to a rounding step
+
+
+
+def ciede2000(lab_1, lab_2):
+    """CIEDE2000 color distance between each of the n Lab colors (lab_1) and each of the m Lab colors (lab_2).
+        Returns the distance matrix (n rows, m columns)."""
+
+    lab_1 = np.asarray(lab_1, dtype=np.float64).reshape(-1, 1, 3)          # first colors, along the rows
+    lab_2 = np.asarray(lab_2, dtype=np.float64).reshape(1, -1, 3)          # second colors, along the columns
+    L1, a1, b1 = lab_1[..., 0], lab_1[..., 1], lab_1[..., 2]                # first colors components
+    L2, a2, b2 = lab_2[..., 0], lab_2[..., 1], lab_2[..., 2]                # second colors components
+
+    C1 = np.sqrt(a1**2 + b1**2)                                             # chroma of the first colors
+    C2 = np.sqrt(a2**2 + b2**2)                                             # chroma of the second colors
+    C_ave = (C1 + C2) / 2                                                   # average chroma
+    G = 0.5 * (1 - np.sqrt(C_ave**7 / (C_ave**7 + C_25_7)))                 # chroma compensation factor
+
+    a1_, a2_ = (1 + G) * a1, (1 + G) * a2                                   # compensated a components
+    b1_, b2_ = np.broadcast_to(b1, G.shape), np.broadcast_to(b2, G.shape)   # b components, broadcasted to the matrix
+    C1_ = np.sqrt(a1_**2 + b1_**2)                                          # compensated chroma of the first colors
+    C2_ = np.sqrt(a2_**2 + b2_**2)                                          # compensated chroma of the second colors
+
+    h1_ = np.where((b1_ == 0) & (a1_ == 0), 0, np.arctan2(b1_, a1_) + np.where(a1_ >= 0, 0, 2 * np.pi))  # hue angle
+    h2_ = np.where((b2_ == 0) & (a2_ == 0), 0, np.arctan2(b2_, a2_) + np.where(a2_ >= 0, 0, 2 * np.pi))  # hue angle
+
+    dL_ = L2 - L1                                                           # lightness difference
+    dC_ = C2_ - C1_                                                         # chroma difference
+    dh_ = h2_ - h1_                                                         # hue angle difference
+    dh_ = np.where(dh_ > np.pi, dh_ - 2 * np.pi, np.where(dh_ < -np.pi, dh_ + 2 * np.pi, dh_))
+    dh_ = np.where(C1_ * C2_ == 0, 0, dh_)                                  # no hue difference on achromatic colors
+    dH_ = 2 * np.sqrt(C1_ * C2_) * np.sin(dh_ / 2)                          # hue difference
+
+    L_ave = (L1 + L2) / 2                                                   # average lightness
+    C_ave = (C1_ + C2_) / 2                                                 # average compensated chroma
+
+    _dh = np.abs(h1_ - h2_)                                                 # absolute hue angle difference
+    _sh = h1_ + h2_                                                         # hue angles sum
+    C1C2 = C1_ * C2_                                                        # chroma product
+    h_ave = np.where(C1C2 == 0, h1_ + h2_,
+                     np.where(_dh <= np.pi, (h1_ + h2_) / 2,
+                              np.where(_sh < 2 * np.pi, (h1_ + h2_) / 2 + np.pi, (h1_ + h2_) / 2 - np.pi)))  # average hue angle
+
+    T = 1-0.17*np.cos(h_ave-np.pi/6)+0.24*np.cos(2*h_ave)+0.32*np.cos(3*h_ave+np.pi/30)-0.2*np.cos(4*h_ave-63*np.pi/180)
+
+    h_ave_deg = h_ave * 180 / np.pi                                         # average hue angle, in degrees
+    h_ave_deg = np.where(h_ave_deg < 0, h_ave_deg + 360, np.where(h_ave_deg > 360, h_ave_deg - 360, h_ave_deg))
+    dTheta = 30 * np.exp(-(((h_ave_deg - 275) / 25)**2))                    # hue rotation term
+
+    R_C = 2 * np.sqrt(C_ave**7 / (C_ave**7 + C_25_7))                       # chroma rotation term
+    S_C = 1 + 0.045 * C_ave                                                 # chroma weighting
+    S_H = 1 + 0.015 * C_ave * T                                             # hue weighting
+
+    Lm50s = (L_ave - 50)**2                                                 # lightness offset from 50, squared
+    S_L = 1 + 0.015 * Lm50s / np.sqrt(20 + Lm50s)                           # lightness weighting
+    R_T = -np.sin(dTheta * np.pi / 90) * R_C                                # rotation term
+
+    f_L = dL_ / 1 / S_L                                                     # weighted lightness difference (k_L = 1)
+    f_C = dC_ / 1 / S_C                                                     # weighted chroma difference (k_C = 1)
+    f_H = dH_ / 1 / S_H                                                     # weighted hue difference (k_H = 1)
+
+    return np.sqrt(f_L**2 + f_C**2 + f_H**2 + R_T * f_C * f_H)              # CIEDE2000 distance matrix
+
+
+
+
+def _moves(distance, labels, free, m):
+    """Residual graph among the m colors: cost (and facelet) of the cheapest move of a free facelet from color a to b."""
+
+    cost = np.full((m, m), np.inf)                                          # moves cost, inf when not possible
+    facelet = np.full((m, m), -1)                                           # facelet of the cheapest move
+    for a in range(m):                                                      # iteration over the colors
+        idx = np.flatnonzero(free & (labels == a))                          # free facelets having color a
+        if len(idx) == 0:                                                   # case no free facelets with color a
+            continue                                                        # next color
+        delta = distance[idx] - distance[idx, a][:, None]                   # cost to move each facelet to each color
+        arg = np.argmin(delta, axis=0)                                      # cheapest facelet per color
+        cost[a] = delta[arg, np.arange(m)]                                  # cheapest moves cost
+        facelet[a] = idx[arg]                                               # cheapest moves facelet
+    np.fill_diagonal(cost, np.inf)                                          # no moves toward the same color
+    return cost, facelet
+
+
+
+def assign_counts(distance, labels, fixed=(), count=9):
+    """Min cost assignment of n facelets to m colors, with exactly count facelets per color (transportation problem),
+        on the distance matrix (n rows, m columns).
+        Labels is the starting assignment, and it must be the min distance one (argmin per row) for the fixed
+        facelets to be the only exception (the fixed facelets keep their label, i.e. the centers).
+        Facelets are moved along the cheapest path (Bellman-Ford on the m colors) from a color with too many facelets
+        to a color with too few, until all the colors have count facelets: starting from the min distance assignment,
+        each move keeps the assignment optimal for the current counts.
+        Returns the labels and the cost margin (the cost increase of the cheapest different assignment having the
+        same counts, 0 when another assignment has the same cost)."""
+
+    distance = np.asarray(distance, dtype=np.float64)                       # distance matrix
+    labels = np.array(labels, dtype=int)                                    # facelets labels (copy)
+    n, m = distance.shape                                                   # facelets and colors
+    free = np.ones(n, dtype=bool)                                           # facelets free to change color
+    free[list(fixed)] = False                                               # fixed facelets
+
+    for _ in range(n):                                                      # max one move per facelet
+        counts = np.bincount(labels, minlength=m)                           # facelets per color
+        if np.all(counts == count):                                         # case all the colors have count facelets
+            break                                                           # moves are done
+        cost, facelet = _moves(distance, labels, free, m)                   # residual graph
+        dist = np.where(counts > count, 0.0, np.inf)                        # path cost, from the colors with too many facelets
+        prev = np.full(m, -1)                                               # previous color on the path
+        for _ in range(m - 1):                                              # Bellman-Ford iterations
+            new = dist[:, None] + cost                                      # path cost via each color
+            a = np.argmin(new, axis=0)                                      # best previous color
+            better = new[a, np.arange(m)] < dist - 1e-12                    # colors with a cheaper path
+            if not np.any(better):                                          # case of no cheaper paths
+                break                                                       # paths are done
+            dist[better] = new[a, np.arange(m)][better]                     # cheaper paths cost
+            prev[better] = a[better]                                        # cheaper paths previous color
+        under = np.flatnonzero(counts < count)                              # colors with too few facelets
+        b = under[np.argmin(dist[under])]                                   # color reached with the cheapest path
+        if not np.isfinite(dist[b]):                                        # case the color cannot be reached
+            break                                                           # moves are interrupted
+        path = []                                                           # moves of the path
+        while prev[b] != -1:                                                # iteration back to the path start
+            path.append((facelet[prev[b], b], b))                           # facelet and new color
+            b = prev[b]                                                     # previous color
+        for f, b in path:                                                   # iteration over the path moves
+            labels[f] = b                                                   # facelet is moved to the new color
+
+    cost, _ = _moves(distance, labels, free, m)                             # residual graph
+    for k in range(m):                                                      # Floyd-Warshall on the m colors
+        cost = np.minimum(cost, cost[:, k:k+1] + cost[k:k+1, :])            # cheapest paths via color k
+    margin = np.min(np.diag(cost))                                          # cheapest cycle: cheapest different assignment
+    return labels, max(0.0, float(margin)) if np.isfinite(margin) else 0.0
@@ -0,0 +1,129 @@
+#!/usr/bin/python
+# coding: utf-8
+
+"""
+#############################################################################################################
+# Andrea Favero 17 October 2026
+#
+# This script relates to CUBOTino micro, an extremely small and simple Rubik's cube solver robot 3D printed
+# CUBOTino micro is the smallest version of the CUBOTino versions
+#
+# Binary store of the facelets coordinates, used by the Fix Coordinates System (FCS).
+#  - Slot 0 has the coordinates averaged on the 6 faces of each cube, slots 1 to 6 the coordinates of each side.
+#  - Each slot is a fixed size ring buffer with the latest records (9 facelets centers, x and y).
+#  - Mean and variance of each coordinate, on the records in the ring buffer, are updated at each new record
+#    (Welford algorithm, adding the new record and removing the overwritten one): lookups don't need any parsing.
+#  - The store is a numpy structured array, saved to a temporary file and then renamed (atomic write).
+#
+#############################################################################################################
+"""
+
+import os
+import numpy as np                             # data array management
+
+MAGIC = b'CFCS0001'                            # file signature and version
+SLOTS = 7                                      # slot 0 for the cube average, slots 1 to 6 for the sides
+COORDS = 18                                    # 9 facelets centers, x and y
+
+
+class CoordinatesStore:
+
+    def __init__(self, fname, size=5):
+        """Loads the store from fname, if it exists and is valid, otherwise it starts empty.
+            Size is the ring buffer length (records kept per slot)."""
+
+        self.fname = fname                                                  # file name of the store
+        self.size = size                                                    # records kept per slot
+        self.dtype = np.dtype([('count', '<u4'),                            # records in the ring buffer
+                               ('head', '<u4'),                             # ring buffer index for the next record
+                               ('mean', '<f8', (COORDS,)),                  # mean of each coordinate
+                               ('m2', '<f8', (COORDS,)),                    # sum of squared differences from the mean
+                               ('ring', '<f8', (size, COORDS))])            # ring buffer with the records
+        self.data = np.zeros(SLOTS, dtype=self.dtype)                       # empty store
+        self.loaded = self.load()                                           # store is loaded from file
+
+
+
+    def load(self):
+        """Loads the store from file; Returns True if loaded, False if the file is missing or not valid."""
+
+        if not os.path.exists(self.fname):                                  # case the file does not exist
+            return False                                                    # False is returned
+        try:
+            with open(self.fname, 'rb') as f:                               # file is opened in binary reading mode
+                if f.read(len(MAGIC)) != MAGIC:                             # case of wrong signature or version
+                    return False                                            # False is returned
+                data = np.fromfile(f, dtype=self.dtype)                     # slots are read
+            if len(data) != SLOTS or np.any(data['count'] > self.size) or np.any(data['head'] >= self.size):
+                return False                                                # case of wrong size (i.e. ring size changed)
+            self.data = data                                                # store is assigned
+            return True                                                     # True is returned
+        except:                                                             # case of exceptions (i.e. corrupted file)
+            return False                                                    # False is returned
+
+
+
+    def save(self):
+        """Saves the store to a temporary file, then renamed to the store file (atomic on the same file system)."""
+
+        tmp = self.fname + '.tmp'                                           # temporary file name
+        with open(tmp, 'wb') as f:                                          # temporary file is opened in binary writing mode
+            f.write(MAGIC)                                                  # file signature and version
+            self.data.tofile(f)                                             # slots are written
+            f.flush()                                                       # python buffer is flushed
+            os.fsync(f.fileno())                                            # data is written to the disk
+        os.replace(tmp, self.fname)                                         # temporary file replaces the store file
+
+
+
+    def add(self, coordinates, slot=0):
+        """Adds a record (18 coordinates) to the slot, updating the mean and the variance of each coordinate."""
+
+        s = self.data[slot]                                                 # slot record (view on the store)
+        x = np.asarray(coordinates, dtype=np.float64).reshape(COORDS)       # new record
+        n, head = int(s['count']), int(s['head'])                           # records in the slot, and ring buffer index
+        mean, m2 = s['mean'], s['m2']                                       # mean and sum of squared differences (views)
+
+        if n == self.size:                                                  # case the ring buffer is full
+            old = s['ring'][head].copy()                                    # record to be overwritten
+            if n == 1:                                                      # case of single record
+                mean[:], m2[:] = 0, 0                                       # statistics are reset
+            else:                                                           # case of more records
+                old_mean = mean.copy()                                      # mean before removing the old record
+                mean[:] = (n * old_mean - old) / (n - 1)                    # mean without the old record
+                m2[:] = np.maximum(m2 - (old - old_mean) * (old - mean), 0) # sum of squared differences without the old record
+            n -= 1                                                          # records counter
+
+        n += 1                                                              # records counter, with the new record
+        delta = x - mean                                                    # difference from the mean
+        mean += delta / n                                                   # mean with the new record
+        m2 += delta * (x - mean)                                            # sum of squared differences with the new record
+        s['ring'][head] = x                                                 # record is stored in the ring buffer
+        s['head'] = (head + 1) % self.size                                  # ring buffer index for the next record
+        s['count'] = n                                                      # records in the slot
+
+
+
+    def count(self, slot=0):
+        """Returns the records in the slot."""
+
+        return int(self.data[slot]['count'])                                # records in the slot
+
+
+
+    def mean(self, slot=0):
+        """Returns the mean of each coordinate (rounded to integers) as list, or an empty list if no records."""
+
+        if self.data[slot]['count'] == 0:                                   # case of no records
+            return []                                                       # empty list is returned
+        return np.round(self.data[slot]['mean']).astype(int).tolist()      # mean coordinates
+
+
+
+    def std(self, slot=0):
+        """Returns the standard deviation of each coordinate (pixels) as numpy array, or None if no records."""
+
+        n = int(self.data[slot]['count'])                                   # records in the slot
+        if n == 0:                                                          # case of no records
+            return None                                                     # None is returned
+        return np.sqrt(self.data[slot]['m2'] / n)                           # standard deviation of each coordinate
@@ -0,0 +1,263 @@
+#!/usr/bin/python
+# coding: utf-8
+
+"""
+#############################################################################################################
+# Andrea Favero 17 October 2026
+#
+# This script relates to CUBOTino micro, an extremely small and simple Rubik's cube solver robot 3D printed
+# CUBOTino micro is the smallest version of the CUBOTino versions
+#
+# Cube status check at cubie level, without calling the solver.
+#  - check verifies a cube status string (URFDLB order, as for the Kociemba solver): 9 facelets per color,
+#    corners and edges made by existing cubies, each cubie present once, corners twist, edges flip and
+#    permutations parity. It takes few micro seconds, while the solver spends real time before returning
+#    an error on an impossible cube.
+#  - hypotheses lists the cube status alternatives to an assignment of the colors, by increasing distance
+#    penalty (sum of the color distances increase), from the facelets distance matrix: the first valid one is
+#    sent to the solver.
+#  - decode interprets the facelets colors at cubie level: the 3 facelets of a corner (2 of an edge) are matched
+#    together to the existing cubies, as an assignment of the cubies to the slots (each cubie once), followed by
+#    the corners twist, edges flip and parity constraints; the result is always a valid cube, also from a misread
+#    one: it should be accepted only when all the cubies have DECODE_CONF confidence, or when it is cheaper than
+#    the hypotheses (cost returns the total distance of a cube status), and kept as last resort otherwise.
+#    DECODE_CONF is the lowest min confidence without wrong decoded cubes accepted, on replayed misread cubes (the
+#    replay prints the decoded cubies min confidence).
+#  - confidence returns the confidence of each cubie (0 to 1), from the distance margin toward the closest
+#    alternative cubie (or orientation) on the same slot.
+#
+#############################################################################################################
+"""
+
+import heapq                                   # priority queue for the hypotheses
+import numpy as np                             # data array management
+from Cubotino_m_colors import assign_counts    # min cost assignment with a given count per class
+
+
+# facelets of the 8 corners and the 12 edges, and their colors, as per the Kociemba solver definitions
+# (U1=0...U9=8, R1=9...R9=17, F1=18...F9=26, D1=27...D9=35, L1=36...L9=44, B1=45...B9=53)
+CORNER_FACELETS = ((8, 9, 20), (6, 18, 38), (0, 36, 47), (2, 45, 11),
+                   (29, 26, 15), (27, 44, 24), (33, 53, 42), (35, 17, 51))
+CORNER_COLORS = ('URF', 'UFL', 'ULB', 'UBR', 'DFR', 'DLF', 'DBL', 'DRB')
+EDGE_FACELETS = ((5, 10), (7, 19), (3, 37), (1, 46), (32, 16), (28, 25),
+                 (30, 43), (34, 52), (23, 12), (21, 41), (50, 39), (48, 14))
+EDGE_COLORS = ('UR', 'UF', 'UL', 'UB', 'DR', 'DF', 'DL', 'DB', 'FR', 'FL', 'BL', 'BR')
+
+# corner from the 3 colors read clockwise from the position's U or D facelet, edge (and flip) from the 2 colors
+CORNERS = {c: i for i, c in enumerate(CORNER_COLORS)}
+EDGES = {**{e: (i, 0) for i, e in enumerate(EDGE_COLORS)}, **{e[::-1]: (i, 1) for i, e in enumerate(EDGE_COLORS)}}
+
+# facelets receiving the k-th color of a cubie placed with orientation o, colors index of the cubies (URFDLB order)
+CORNER_IDX = np.array([[[f[(o + k) % 3] for k in range(3)] for o in range(3)] for f in CORNER_FACELETS])  # 8 x 3 x 3
+EDGE_IDX = np.array([[[f[(o + k) % 2] for k in range(2)] for o in range(2)] for f in EDGE_FACELETS])      # 12 x 2 x 2
+CORNER_COL = np.array([['URFDLB'.index(c) for c in cc] for cc in CORNER_COLORS])                          # 8 x 3
+EDGE_COL = np.array([['URFDLB'.index(c) for c in ec] for ec in EDGE_COLORS])                              # 12 x 2
+CONF_MARGIN = 10                               # distance margin (CIEDE2000) giving full confidence to a cubie
+DECODE_CONF = 0.3                              # min confidence of all the cubies, to accept a decoded cube status as it is
+
+
+
+def _parity(perm):
+    """Returns the parity (0 even, 1 odd) of a permutation."""
+
+    s = 0                                                                   # inversions counter
+    for i in range(len(perm)):                                              # iteration over the elements
+        for j in range(i):                                                  # iteration over the previous elements
+            if perm[j] > perm[i]:                                           # case of inversion
+                s += 1                                                      # inversions counter is incremented
+    return s % 2                                                            # parity
+
+
+
+def check(cube_string):
+    """Checks if the cube status string (URFDLB order) is a valid cube.
+        Returns True and an empty string when valid, otherwise False and the reason."""
+
+    if len(cube_string) != 54:                                              # case of wrong string length
+        return False, 'not 54 facelets'                                     # False and reason are returned
+    if cube_string[4::9] != 'URFDLB':                                       # case of wrong centers
+        return False, 'wrong centers'                                       # False and reason are returned
+    for color in 'URFDLB':                                                  # iteration over the colors
+        if cube_string.count(color) != 9:                                   # case of color without 9 facelets
+            return False, 'not 9 facelets per color'                        # False and reason are returned
+
+    cp, twist = [], 0                                                       # corners permutation and total twist
+    for f in CORNER_FACELETS:                                               # iteration over the corner positions
+        colors = cube_string[f[0]] + cube_string[f[1]] + cube_string[f[2]]  # colors of the corner position
+        for o in range(3):                                                  # iteration over the corner facelets
+            if colors[o] in 'UD':                                           # case of U or D color
+                break                                                       # twist is found
+        corner = CORNERS.get(colors[o:] + colors[:o])                       # corner with these colors (clockwise)
+        if corner is None:                                                  # case of not existing corner
+            return False, 'not existing corner'                             # False and reason are returned
+        cp.append(corner)                                                   # corner permutation
+        twist += o                                                          # total corners twist
+    if len(set(cp)) != 8:                                                   # case of repeated corners
+        return False, 'repeated corner'                                     # False and reason are returned
+    if twist % 3 != 0:                                                      # case of twisted corner
+        return False, 'twisted corner'                                      # False and reason are returned
+
+    ep, flip = [], 0                                                        # edges permutation and total flip
+    for f in EDGE_FACELETS:                                                 # iteration over the edge positions
+        edge = EDGES.get(cube_string[f[0]] + cube_string[f[1]])             # edge with these colors
+        if edge is None:                                                    # case of not existing edge
+            return False, 'not existing edge'                               # False and reason are returned
+        ep.append(edge[0])                                                  # edge permutation
+        flip += edge[1]                                                     # total edges flip
+    if len(set(ep)) != 12:                                                  # case of repeated edges
+        return False, 'repeated edge'                                       # False and reason are returned
+    if flip % 2 != 0:                                                       # case of flipped edge
+        return False, 'flipped edge'                                        # False and reason are returned
+
+    if _parity(cp) != _parity(ep):                                          # case of different permutations parity
+        return False, 'wrong parity'                                        # False and reason are returned
+    return True, ''                                                         # True is returned
+
+
+
+def hypotheses(distance, labels, fixed=(), k=200):
+    """Generator of the cube status hypotheses, by increasing distance penalty, from the distance matrix (n facelets
+        rows, m colors columns) and the assigned colors (labels).
+        The first hypothesis is the assignment itself, followed by the swaps of two facelets with different colors,
+        and by the pairs of swaps, not involving the fixed facelets (centers): the colors count doesn't change.
+        Penalty is the sum of the distances increase, from the assignment (when labels is the min cost assignment,
+        as from assign_counts, all the penalties are positive and the hypotheses are exactly by increasing penalty).
+        Yields k hypotheses at most, as (penalty, labels)."""
+
+    distance = np.asarray(distance, dtype=np.float64)                       # distance matrix
+    labels = np.asarray(labels, dtype=int)                                  # assigned colors
+    n = len(labels)                                                         # facelets
+    free = np.ones(n, dtype=bool)                                           # facelets free to swap the color
+    free[list(fixed)] = False                                               # fixed facelets
+    cost = distance[np.arange(n), labels]                                   # distance of the assigned colors
+    i, j = np.triu_indices(n, 1)                                            # facelets pairs
+    pair = free[i] & free[j] & (labels[i] != labels[j])                     # pairs that can be swapped
+    i, j = i[pair], j[pair]                                                 # facelets of the swaps
+    penalty = distance[i, labels[j]] + distance[j, labels[i]] - cost[i] - cost[j]  # swaps penalty
+    order = np.argsort(penalty, kind='stable')                              # swaps by increasing penalty
+    swaps = list(zip(penalty[order].tolist(), i[order].tolist(), j[order].tolist()))  # swaps (penalty, facelet, facelet)
+
+    yield 0.0, labels.copy()                                                # the assignment itself
+    found = 1                                                               # hypotheses counter
+    heap = [(swaps[0][0], (0,))] if swaps else []                           # swaps combinations, by penalty
+    while heap and found < k:                                               # iteration until k hypotheses
+        p, combo = heapq.heappop(heap)                                      # cheapest combination of swaps
+        last = combo[-1]                                                    # latest swap of the combination
+        if last + 1 < len(swaps):                                           # case of further swaps
+            next_p = p - swaps[last][0] + swaps[last+1][0]                  # penalty with the latest swap replaced by the next one
+            heapq.heappush(heap, (next_p, combo[:-1] + (last + 1,)))        # combination with the next swap
+            if len(combo) == 1:                                             # case of a single swap
+                heapq.heappush(heap, (p + swaps[last+1][0], combo + (last + 1,)))  # combination with a second swap
+
+        facelets = [f for s in combo for f in swaps[s][1:]]                 # facelets of the swaps
+        if len(set(facelets)) != len(facelets):                             # case of swaps sharing a facelet
+            continue                                                        # next combination
+        hyp = labels.copy()                                                 # hypothesis labels
+        for s in combo:                                                     # iteration over the swaps
+            _, a, b = swaps[s]                                              # facelets of the swap
+            hyp[a], hyp[b] = labels[b], labels[a]                           # colors are swapped
+        found += 1                                                          # hypotheses counter is incremented
+        yield p, hyp                                                        # hypothesis
+
+
+
+def _cubies_cost(distance):
+    """Cost (sum of the facelets distances) of each cubie, with each orientation, on each slot.
+        Returns the corners cost (8 slots x 8 cubies x 3 twists) and the edges cost (12 slots x 12 cubies x 2 flips)."""
+
+    d = np.asarray(distance, dtype=np.float64)                              # distance matrix (54 facelets x 6 colors)
+    corners = d[CORNER_IDX[:, None, :, :], CORNER_COL[None, :, None, :]].sum(axis=-1)  # corners cost
+    edges = d[EDGE_IDX[:, None, :, :], EDGE_COL[None, :, None, :]].sum(axis=-1)        # edges cost
+    return corners, edges
+
+
+
+def _orientations(cost, perm, mod):
+    """Min cost orientations of the cubies in perm (cubie per slot), with the orientations sum multiple of mod.
+        Returns the total cost and the orientations (dynamic programming on the orientations sum, modulo mod)."""
+
+    table = cost[np.arange(len(perm)), perm]                                # orientations cost of the placed cubies
+    best = {0: (0.0, [])}                                                   # min cost and orientations, per sum modulo mod
+    for row in table.tolist():                                              # iteration over the slots
+        new = {}                                                            # min cost and orientations, with this slot
+        for r, (c, ori) in best.items():                                    # iteration over the previous sums
+            for o in range(mod):                                            # iteration over the orientations
+                key = (r + o) % mod                                         # orientations sum, modulo mod
+                if key not in new or c + row[o] < new[key][0]:              # case of cheaper orientations
+                    new[key] = (c + row[o], ori + [o])                      # min cost and orientations
+        best = new                                                          # min cost and orientations, up to this slot
+    return best[0]                                                          # total cost and orientations
+
+
+
+def decode(distance):
+    """Decodes the cube status at cubie level, from the distance matrix (54 facelets x 6 colors, URFDLB order).
+        Cubies are assigned to the slots (each cubie once) at min cost, with the orientations respecting the corners
+        twist and edges flip; when the corners and edges permutations have different parity, the cheapest swap of two
+        corners (or two edges) is applied.
+        Returns the colors index per facelet (a valid cube) and the confidence per cubie slot (as from confidence)."""
+
+    corners, edges = _cubies_cost(distance)                                 # cubies cost on each slot
+    perms = []                                                              # corners and edges permutations
+    for cost in (corners, edges):                                           # iteration over corners and edges
+        m = cost.min(axis=-1)                                               # cubies cost with the best orientation
+        perm, _ = assign_counts(m, np.argmin(m, axis=1), count=1)           # min cost assignment of the cubies to the slots
+        perms.append(perm)                                                  # permutation
+    cp, ep = perms                                                          # corners and edges permutations
+
+    c_cost, c_ori = _orientations(corners, cp, 3)                           # corners twist
+    e_cost, e_ori = _orientations(edges, ep, 2)                             # edges flip
+    if _parity(cp.tolist()) != _parity(ep.tolist()):                        # case of different permutations parity
+        best = None                                                         # cheapest swap
+        for cost, perm, mod, other in ((corners, cp, 3, e_cost), (edges, ep, 2, c_cost)):
+            for i in range(len(perm)):                                      # iteration over the slots
+                for j in range(i):                                          # iteration over the previous slots
+                    p = perm.copy()                                         # permutation copy
+                    p[i], p[j] = perm[j], perm[i]                           # cubies are swapped
+                    c, ori = _orientations(cost, p, mod)                    # orientations with the swap
+                    if best is None or c + other < best[0]:                 # case of cheaper swap
+                        best = (c + other, mod, p, ori)                     # cheapest swap
+        _, mod, p, ori = best                                               # cheapest swap
+        if mod == 3:                                                        # case of corners swap
+            cp, c_ori = p, ori                                              # corners permutation and twist
+        else:                                                               # case of edges swap
+            ep, e_ori = p, ori                                              # edges permutation and flip
+
+    labels = np.zeros(54, dtype=int)                                        # colors index per facelet
+    labels[4::9] = range(6)                                                 # centers
+    for s in range(8):                                                      # iteration over the corners slots
+        labels[CORNER_IDX[s, c_ori[s]]] = CORNER_COL[cp[s]]                 # corner colors
+    for s in range(12):                                                     # iteration over the edges slots
+        labels[EDGE_IDX[s, e_ori[s]]] = EDGE_COL[ep[s]]                     # edge colors
+    return labels, confidence(distance, labels, (corners, edges))
+
+
+
+def cost(distance, labels):
+    """Total cost of the cube status labels (colors index per facelet): sum of the facelets distance to their color."""
+
+    distance = np.asarray(distance, dtype=np.float64)                       # distance matrix
+    return float(np.sum(distance[np.arange(len(labels)), labels]))         # sum of the assigned colors distance
+
+
+
+def confidence(distance, labels, cost=None):
+    """Confidence of each cubie (0 to 1) of the cube status labels (colors index per facelet), from the distance margin
+        between the cubie (and orientation) on the slot and the closest alternative cubie or orientation, relative to
+        CONF_MARGIN. Cubies not existing have 0 confidence.
+        Returns a dict with the slot name as key (i.e. 'URF' or 'UR') and the confidence as value."""
+
+    corners, edges = _cubies_cost(distance) if cost is None else cost      # cubies cost on each slot
+    conf = {}                                                               # confidence per slot
+    for names, idx, col, c in ((CORNER_COLORS, CORNER_IDX, CORNER_COL, corners), (EDGE_COLORS, EDGE_IDX, EDGE_COL, edges)):
+        for s, name in enumerate(names):                                    # iteration over the slots
+            match = np.all(labels[idx[s]][None, :, :] == col[:, None, :], axis=-1)  # cubies and orientations matching the labels
+            if not np.any(match):                                           # case of not existing cubie
+                conf[name] = 0.0                                            # no confidence
+                continue                                                    # next slot
+            j, o = np.argwhere(match)[0]                                    # cubie and orientation on the slot
+            other = c[s].copy()                                             # costs of the alternatives
+            other[j, o] = np.inf                                            # cubie on the slot excluded
+            margin = other.min() - c[s, j, o]                               # margin to the closest alternative
+            conf[name] = round(float(np.clip(margin / CONF_MARGIN, 0, 1)), 2)  # confidence
+    return conf
@@ -0,0 +1,121 @@
+#!/usr/bin/python
+# coding: utf-8
+
+"""
+#############################################################################################################
+# Andrea Favero 17 October 2026
+#
+# This script relates to CUBOTino micro, an extremely small and simple Rubik's cube solver robot 3D printed
+# CUBOTino micro is the smallest version of the CUBOTino versions
+#
+# Lattice model face fitter: a 3x3 lattice is fitted to the centers of the square like contours (candidates).
+#  - Hypotheses are made from pairs of candidates at a plausible neighbour distance: the pair defines the
+#    lattice step along one axis, the other axis is perpendicular with the same length (the frame is warped
+#    to a top view, so the face is nearly a square).
+#  - Each hypothesis assigns the candidates to lattice positions; candidates close to a lattice position are
+#    inliers, and the 3x3 window with more inliers is the hypothesis score (RANSAC like, on all the pairs).
+#  - Pairs along a diagonal are rejected: the pair direction must agree with the orientation of the candidates
+#    edges (squares sides are parallel to the lattice axes), otherwise corners and center would fit a lattice
+#    rotated by 45 deg and sqrt(2) larger. The step/side ratio alone can't separate them (the diagonal of a
+#    frameless cube is about 1.5 side, like the step of a cube with thick frame borders).
+#  - The inliers must cover the 3 rows and the 3 columns of the window (a lattice can't be located from two rows).
+#  - The best hypothesis is refined with an affine least squares fit on the inliers (a square lattice fit with 4
+#    inliers, as the 6 affine parameters would follow the centers noise), returning the 9 facelets centers and the
+#    fit residual: a face can be locked from 4 good squares covering the 3 rows and the 3 columns (i.e. a diagonal
+#    plus one square), also when the others are missed.
+#
+#############################################################################################################
+"""
+
+import numpy as np                             # data array management
+
+WINDOWS = np.array([(a0, b0) for b0 in (-2, -1, 0) for a0 in (-2, -1, 0)])  # top left of the 3x3 windows including (0, 0)
+
+
+def orientation(contours):
+    """Returns the orientation (radians, modulo 90 deg) of the square like contours, as circular mean of their edges
+        direction; Each contour is an array of 4 vertices."""
+
+    edges = []                                                              # edges of the contours
+    for c in contours:                                                      # iteration over the contours
+        v = np.reshape(np.asarray(c, dtype=np.float64), (-1, 2))            # contour vertices
+        edges.append(np.roll(v, -1, axis=0) - v)                            # edges vectors (closed contour)
+    edges = np.concatenate(edges)                                           # edges of all the contours
+    theta = 4 * np.arctan2(edges[:, 1], edges[:, 0])                        # edges direction, 90 deg periodic (times 4)
+    w = np.hypot(edges[:, 0], edges[:, 1])                                  # edges length as weight
+    return np.arctan2(np.sum(w*np.sin(theta)), np.sum(w*np.cos(theta))) / 4  # circular mean of the edges direction
+
+
+
+def fit_lattice(centers, side, angle=None, min_inliers=4, tol=0.2):
+    """Fits a 3x3 lattice to the candidates centers; side is the (median) candidates side length, angle (optional)
+        the candidates orientation from orientation(): pairs not along it (i.e. diagonals) aren't used as hypotheses.
+        Inliers are candidates within tol (fraction of the lattice step) from a lattice position.
+        Returns (grid, slots, residual), or None when less than min_inliers candidates fit a lattice:
+        grid has the 9 lattice points (row by row, along the lattice axes), slots the candidate index for each
+        lattice point (-1 when missed), residual the rms distance of the inliers from the lattice (fraction of step)."""
+
+    pts = np.asarray(centers, dtype=np.float64).reshape(-1, 2)              # candidates centers
+    n = len(pts)                                                            # number of candidates
+    if n < min_inliers or side <= 0:                                        # case of not enough candidates
+        return None                                                         # None is returned
+
+    diff = pts[np.newaxis, :, :] - pts[:, np.newaxis, :]                    # vectors between all the candidates
+    dist = np.hypot(diff[..., 0], diff[..., 1])                             # distances between all the candidates
+    pairs = np.argwhere(np.triu((dist > 0.9*side) & (dist < 1.6*side)))     # pairs at a plausible neighbour distance (not diagonal)
+
+    best_score, best = (0, 0), None                                         # best score (slots, -error) and hypothesis
+    for p, q in pairs:                                                      # iteration over the candidates pairs
+        u = diff[p, q]                                                      # lattice step along the first axis
+        if angle is not None and np.cos(4*(np.arctan2(u[1], u[0]) - angle)) < 0:  # case the pair is not along the edges
+            continue                                                        # diagonal pair, next hypothesis
+        v = np.array((-u[1], u[0]))                                         # lattice step along the second axis
+        ab = (pts - pts[p]) @ np.linalg.inv(np.array((u, v)).T).T           # candidates in lattice coordinates
+        r = np.round(ab)                                                    # nearest lattice positions
+        err = np.hypot(*(ab - r).T)                                         # candidates distance from the lattice positions
+        ok = err < tol                                                      # inliers
+        if np.sum(ok) < max(min_inliers, best_score[0]):                    # case the hypothesis can't improve the best one
+            continue                                                        # next hypothesis
+
+        col = r[:, 0, np.newaxis] - WINDOWS[:, 0]                           # candidates column in the 9 windows including p
+        row = r[:, 1, np.newaxis] - WINDOWS[:, 1]                           # candidates row in the 9 windows including p
+        inside = ok[:, np.newaxis] & (col >= 0) & (col <= 2) & (row >= 0) & (row <= 2)  # inliers within the windows
+        counts = np.sum(inside, axis=0)                                     # inliers per window
+        for w in np.flatnonzero(counts >= max(min_inliers, best_score[0])): # windows that could improve the best hypothesis
+            if len(np.unique(row[inside[:, w], w])) < 3 or len(np.unique(col[inside[:, w], w])) < 3:  # case rows or columns missed
+                continue                                                    # the window can't locate the lattice
+            slot = (3*row[:, w] + col[:, w]).astype(int)                    # lattice point index of the candidates
+            slots = np.full(9, -1)                                          # candidate index for each lattice point
+            for i in np.flatnonzero(inside[:, w])[np.argsort(-err[inside[:, w]])]:  # inliers, the closest to the lattice last
+                slots[slot[i]] = i                                          # the closest candidate is kept per lattice point
+            used = slots >= 0                                               # lattice points having a candidate
+            score = (int(np.sum(used)), -float(np.sum(err[slots[used]])))  # matched points and error
+            if score > best_score:                                          # case of a better hypothesis
+                best_score, best = score, slots                             # best score and hypothesis are stored
+
+        if best_score[0] == 9 and -best_score[1] < 0.5*tol:                 # case of full and accurate lattice
+            break                                                           # no need for further hypotheses
+
+    if best is None or best_score[0] < min_inliers:                         # case no hypothesis has enough inliers
+        return None                                                         # None is returned
+
+    idx = np.arange(9)                                                      # lattice points index
+    A = np.column_stack((np.ones(9), idx % 3, idx // 3))                    # affine model: origin + col*u + row*v
+    used = best >= 0                                                        # lattice points having a candidate
+    if np.sum(used) < 5:                                                    # case of 4 inliers (affine fit would follow the noise)
+        c, r = idx % 3, idx // 3                                            # lattice points column and row
+        S = np.concatenate((np.column_stack((np.ones(9), np.zeros(9), c, -r)),  # square lattice model (v perpendicular to u,
+                            np.column_stack((np.zeros(9), np.ones(9), r, c)))) #  same length), x rows followed by y rows
+        sel = np.concatenate((used, used))                                  # model rows of the inliers
+        o_x, o_y, u_x, u_y = np.linalg.lstsq(S[sel], np.concatenate(pts[best[used]].T), rcond=None)[0]  # square lattice fit
+        P = np.array(((o_x, o_y), (u_x, u_y), (-u_y, u_x)))                 # origin, u and v
+    else:                                                                   # case of 5 or more inliers
+        P, _, _, _ = np.linalg.lstsq(A[used], pts[best[used]], rcond=None)  # affine fit on the inliers
+    grid = A @ P                                                            # the 9 lattice points
+    step = 0.5 * (np.hypot(*P[1]) + np.hypot(*P[2]))                        # average lattice step
+    if step <= 0 or not 0.7 < np.hypot(*P[1])/np.hypot(*P[2]) < 1.4:        # case of a very distorted lattice
+        return None                                                         # None is returned
+    residual = np.sqrt(np.mean(np.sum((grid[used] - pts[best[used]])**2, axis=1))) / step  # rms residual, fraction of step
+    if residual > tol:                                                      # case the refined fit is not accurate
+        return None                                                         # None is returned
+    return grid, best, residual                                             # lattice points, candidates per point and residual
@@ -25,6 +25,9 @@
 # 4) The order of S, F has to be strictly followed
 # 5) Example 'F1R1S3' means: 1x cube Flip, 1x (90deg) CW rotation of the 1st (Down) layer, 1x (90deg) CCW cube Spin 
 #
+# robot_time estimates the robot time of the robot movements from the servos timers (servo settings), to select the
+# solver solution requiring less robot time
+#
 #############################################################################################################
 """
 
@@ -377,6 +380,59 @@ def robot_required_moves(solution, solution_Text):
 
 
 
+def robot_time(moves, timers, start_pos='read', flip_to_close_one_step=False):
+    """ Estimates the robot time (secs) for the string of robot movements, without moving the servos.
+        The servos sequence of Cubotino_m_servos.servo_solve_cube is followed, by summing the servos timers of each step;
+        timers is a dict with the servos timers (servo settings names), and t_rel_time zero when the top cover tension
+        isn't released. The estimation is used to select, among the solver solutions, the one requiring less robot time."""
+
+    top_cover = start_pos                         # top cover/lifter position at the string receival
+    t_flip_open, t_rel = timers['t_flip_open_time'], timers['t_rel_time']  # most used timers
+    t = 0                                         # estimated robot time
+
+    for i in range(0, len(moves), 2):             # iteration over the robot movements (pairs of characters)
+        if moves[i]=='F':                         # case there is a flip on the move string
+            flips=int(moves[i+1])                 # number of flips
+            for f in range(flips):                # iterates over the number of requested flips
+                if top_cover == 'close':          # case the top cover is in close position (flip_up)
+                    t += timers['t_close_to_flip_time'] + (0 if flip_to_close_one_step else t_flip_open)
+                elif top_cover == 'open':         # case the top cover is in open position (flip_up)
+                    t += t_flip_open if flip_to_close_one_step else 2 * t_flip_open
+                else:                             # case the top cover is in read position (flip_up)
+                    t += t_flip_open              # time for the servo to reach the flipping position
+                top_cover = 'flip'                # cover/lifter position set to flip
+
+                if f<(flips-1):                   # case there are further flippings to do (flip_to_read)
+                    t += t_flip_open              # time for the top servo to reach the open top cover position
+                    top_cover = 'open'            # cover/lifter position set to open
+
+            if len(moves)-(i+2)>0:                # case there is a following command on the move string
+                if moves[i+2]=='R':               # case the next action is a 1st layer cube rotation (flip_to_close)
+                    t += (1 if flip_to_close_one_step else 2) * timers['t_flip_to_close_time'] + t_rel
+                    top_cover = 'close'           # cover/lifter position set to close
+                elif moves[i+2]=='S':             # case the next action is a cube spin (flip_to_open)
+                    t += t_flip_open              # time for the top servo to reach the open top cover position
+                    top_cover = 'open'            # cover/lifter position set to open
+
+        elif moves[i]=='S':                       # case there is a cube spin on the move string
+            if top_cover == 'read':               # case the top cover is in read position (flip_to_open)
+                t += t_flip_open                  # time for the top servo to reach the open top cover position
+                top_cover = 'open'                # cover/lifter position set to open
+            t += timers['b_spin_time']            # time for the bottom servo to spin the cube
+
+        elif moves[i]=='R':                       # case there is a cube 1st layer rotation
+            if top_cover != 'close':              # case the top cover is not in close position (close_cover)
+                t += timers['t_open_close_time'] + t_rel  # time for the top cover to close, and to release the tension
+            t += timers['b_rotate_time'] + timers['b_rel_time']  # time for the bottom servo to rotate, and to release the tensions
+            t += timers['t_open_close_time']      # time for the top cover to open (open_cover)
+            top_cover = 'open'                    # cover/lifter position set to open
+
+    return t
+
+
+
+
+
 if __name__ == "__main__":
     """ This function convert the cube solution string 'U2 L1 R1 D2 B2 R1 D2 B2 D2 L3 B3 R3 F2 D3 L1 U2 F2 D3 B3 D1' in robot moves
         Robot moves are printed on the REPL
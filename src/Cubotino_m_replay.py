@@ -0,0 +1,525 @@
+#!/usr/bin/python
+# coding: utf-8
+
+"""
+#############################################################################################################
+# Andrea Favero 17 October 2026
+#
+# This script relates to CUBOTino micro, an extremely small and simple Rubik's cube solver robot 3D printed
+# CUBOTino micro is the smallest version of the CUBOTino versions
+#
+# Offline frames recording and replay, to tune the cube status detection without the robot.
+#
+# Recording (on the robot):
+#  - Cubotino_m.py launched with the --record argument stores the raw PiCamera frames, as they are returned by
+#    the camera (before cropping, warping and resizing), during the cube status detection.
+#  - Frames are appended to a raw file (frames.bin, only the recorded frames), with a json file (frames_meta.json) having
+#    per-frame info (cube side, led level, camera gains, exposure, time) and the crop/warp settings in use.
+#  - Each solving cycle has its own folder, under CubesFramesCaptures.
+#
+# Replay (on the robot, or on a Linux workstation with OpenCV and numpy):
+#  - python Cubotino_m_replay.py CubesFramesCaptures/<capture_folder>
+#  - Frames are passed through the same Cubotino_m.py functions used by the robot, from the image cropping
+#    up to cube_colors_interpr, without PiCamera, servos or display: the per frame analysis is the one of cubeAF
+#    (frame_facelets and face_lock), with the fcs_delay and the detection timeout as per the recorded frames time.
+#  - Per stage latency (mean and percentiles) and the frames needed to lock each of the 6 faces are printed.
+#  - With the --luma argument the frames are converted to YUV (I420), as from the luma capture mode, and replayed
+#    twice: with the BGR path (YUV converted to BGR) and with the luma path (Y plane, BGR only at face lock).
+#    Per frame times of both paths, and the equality of the facelets BGR_mean and H_mean, are printed.
+#  - With the --coarse SCALE argument the facelets are detected on frames scaled by SCALE (i.e. 0.4), and the
+#    colors are read on the usual 0.8 scaled frame; the replay is compared to the single scale one (lock frames,
+#    time to lock each side, and agreement of the facelets color decisions).
+#  - With the --colors argument, the facelets color sampling (read_color) is microbenchmarked against the former
+#    pixel by pixel implementation (average_color_loop), checking the BGR_mean and H_mean are the same on the
+#    facelets with full color confidence.
+#
+#############################################################################################################
+"""
+
+import os.path, pathlib, json, time
+import numpy as np                             # data array management
+import cv2                                     # computer vision package
+from Cubotino_m_accumulator import FaceletsAccumulator  # facelets candidates accumulated over the frames of a side
+
+
+class FramesRecorder:
+
+    def __init__(self, width, height, max_frames=300):
+        """Prepares the folder and the file for the raw frames.
+            Frames are appended to the file as they are recorded (up to max_frames), so that it only holds the recorded ones."""
+
+        folder = pathlib.Path().resolve()                                   # active folder (should be home/pi/cubotino/src)
+        folder = os.path.join(folder, 'CubesFramesCaptures')                # folder to store the frames captures
+        timestamp = time.strftime('%Y%m%d_%H%M%S')                          # date_time variable is assigned, for folder name
+        self.folder = os.path.join(folder, timestamp)                       # folder for this specific capture
+        if not os.path.exists(self.folder):                                 # case the folder does not exist
+            os.makedirs(self.folder)                                        # folder is made if it doesn't exist
+
+        self.width = width                                                  # frame width
+        self.height = height                                                # frame height
+        self.max_frames = max_frames                                        # max amount of frames to be recorded
+        self.count = 0                                                      # recorded frames counter
+        self.meta = []                                                      # list of dicts with per-frame info
+        self.t_start = time.time()                                          # time reference for the frames
+        self.file = open(os.path.join(self.folder, 'frames.bin'), 'wb')     # raw frames file, frames appended one after the other
+
+
+
+
+
+    def add(self, frame, side, camera, led):
+        """Adds a raw frame, and related info, to the capture. Returns False once the capture is full."""
+
+        if self.count >= self.max_frames or self.file.closed:               # case the capture is full, or already saved
+            return False                                                    # False is returned
+
+        if frame.shape[0] != self.height or frame.shape[1] != self.width:   # case the frame size differs from the expected one
+            return False                                                    # False is returned
+
+        np.ascontiguousarray(frame, dtype=np.uint8).tofile(self.file)       # frame is appended to the raw frames file
+        try:                                                                # tentative
+            awb_gains = camera.awb_gains                                    # awb blue and red gains are inquired to the PiCamera
+            info = {'a_gain': round(float(camera.analog_gain),3),           # analog gain
+                    'd_gain': round(float(camera.digital_gain),3),          # digital gain
+                    'awb_blue': round(float(awb_gains[0]),3),               # awb blue gain
+                    'awb_red': round(float(awb_gains[1]),3),                # awb red gain
+                    'exposure': int(camera.exposure_speed)}                 # exposure time (micro secs)
+        except:                                                             # case the camera parameters cannot be retrieved
+            info = {}                                                       # empty dict is assigned
+        info['frame'] = self.count                                          # frame index
+        info['side'] = int(side)                                            # cube side in front of the camera
+        info['led'] = float(led)                                            # led brightness at top_cover
+        info['time'] = round(time.time() - self.t_start, 4)                 # time from the capture start
+        self.meta.append(info)                                              # frame info are appended to the metadata list
+        self.count += 1                                                     # recorded frames counter is increased
+        return True                                                         # True is returned
+
+
+
+
+
+    def save(self, settings):
+        """Closes the raw frames file and saves the metadata (frames info and the settings in use) to a json file."""
+
+        self.file.close()                                                   # frames are flushed to disk, and the file closed
+        data = {'width': self.width, 'height': self.height,                 # frames dimensions
+                'frames': self.count, 'settings': settings,                 # recorded frames and settings in use
+                'records': self.meta}                                       # per-frame info
+        fname = os.path.join(self.folder, 'frames_meta.json')               # metadata file name
+        with open(fname, 'w') as f:                                         # metadata file is opened in writing mode
+            f.write(json.dumps(data, indent=0))                             # metadata are saved
+        print(f'\nRecorded {self.count} frames at {self.folder}')           # feedback is printed to the terminal
+
+
+
+
+
+
+
+def load_capture(folder):
+    """Loads a capture; Returns the frames (memory mapped, read only) and the metadata dict."""
+
+    with open(os.path.join(folder, 'frames_meta.json'), 'r') as f:          # metadata file is opened in reading mode
+        meta = json.load(f)                                                 # metadata are parsed
+    fname = os.path.join(folder, 'frames.bin')                              # raw frames file
+    if not os.path.exists(fname):                                           # case of capture with the former preallocated .npy file
+        frames = np.load(os.path.join(folder, 'frames.npy'), mmap_mode='r') # frames are memory mapped, read only
+        return frames[:meta['frames']], meta                                # only the recorded frames are returned
+    if meta['frames'] == 0:                                                 # case of no recorded frames (empty file can't be mapped)
+        return np.zeros((0, meta['height'], meta['width'], 3), dtype=np.uint8), meta  # empty frames stack is returned
+    frames = np.memmap(fname, dtype=np.uint8, mode='r',
+                       shape=(meta['frames'], meta['height'], meta['width'], 3))  # frames are memory mapped, read only
+    return frames, meta                                                     # frames and metadata are returned
+
+
+
+
+
+
+
+class StageTimer:
+
+    def __init__(self):
+        """Collects the execution time of the wrapped functions."""
+        self.times = {}                                                     # dict with a list of times per stage
+        self.order = []                                                     # stages in order of first call
+
+
+
+
+
+    def wrap(self, module, name):
+        """Replaces the function name, at module, with a timed version of it.
+            Functions calling it from within the module get the timed version too."""
+
+        func = getattr(module, name)                                        # original function
+        times = self.times.setdefault(name, [])                             # list storing the times of this stage
+        if name not in self.order:                                          # case the stage isn't listed yet
+            self.order.append(name)                                         # stage is listed
+
+        def timed(*args, **kwargs):
+            t = time.perf_counter()                                         # time reference
+            ret = func(*args, **kwargs)                                     # original function is called
+            times.append(time.perf_counter() - t)                           # elapsed time is appended
+            return ret                                                      # original return is returned
+
+        setattr(module, name, timed)                                        # timed function replaces the original one
+
+
+
+
+
+    def add(self, name, t):
+        """Adds a time measured outside the wrapped functions."""
+        if name not in self.order:                                          # case the stage isn't listed yet
+            self.order.append(name)                                         # stage is listed
+        self.times.setdefault(name, []).append(t)                           # time is appended
+
+
+
+
+
+    def report(self):
+        """Prints the per stage latency: calls, mean and percentiles in ms."""
+
+        print(f"\n{'stage':<24}{'calls':>8}{'mean':>9}{'p50':>9}{'p90':>9}{'p99':>9}{'max':>9}   (ms)")
+        for name in self.order:                                             # iteration over the stages
+            t = np.array(self.times[name]) * 1000                           # times in ms
+            if len(t) == 0:                                                 # case the stage has never been called
+                continue                                                    # next stage
+            p50, p90, p99 = np.percentile(t, (50, 90, 99))                  # percentiles
+            print(f'{name:<24}{len(t):>8}{t.mean():>9.2f}{p50:>9.2f}{p90:>9.2f}{p99:>9.2f}{t.max():>9.2f}')
+
+
+
+
+
+
+
+def replay_side(cm, frames, side, BGR_mean, H_mean, timer, mode='bgr', scale=0.8, fcs=False, BGR_conf=None, times=None):
+    """Replays the frames of one cube side through the per frame analysis of cubeAF() (Cubotino_m.frame_facelets and
+        Cubotino_m.face_lock). Mode 'bgr' uses the recorded frames, 'yuv_bgr' the frames converted to YUV and back to BGR
+        (as the BGR reference for the luma mode), 'luma' the Y plane of the frames converted to YUV.
+        Scale is the frame scale for the facelets detection (coarse detection when smaller than 0.8).
+        Fcs enables the Fix Coordinates System at the first frame (cm.f_coordinates validated on the frame), and after
+        fcs_delay secs from the first frame of the side, as per the recorded frames time (times).
+        BGR_conf, when provided, is filled with the facelets color confidence.
+        Returns the frames used to lock the face (0 if not locked, -1 at the detection timeout) and the locked facelets."""
+
+    cm.side = side                                                          # side is assigned to the Cubotino_m global variable
+    t_side = 0                                                              # time spent on this side
+    if cm.face_accumulator != None:                                         # case the facelets candidates are accumulated
+        cm.face_accumulator.reset()                                         # candidates of the previous side are removed
+    cm.gate_reset()                                                         # admission gate references are reset, as at each side
+    for n, raw in enumerate(frames):                                        # iteration over the frames of this side
+        if times != None and times[n] > cm.detect_timeout:                  # case of detection timeout, as per the recorded time
+            print(f'Timeout for cube status detection at side {cm.sides[side]}')  # feedback is printed to the terminal
+            return -1, []                                                   # face not locked, at the detection timeout
+        frame = np.array(raw)                                               # frame is copied from the memory mapped file
+        if mode != 'bgr':                                                   # case of frames converted to YUV
+            yuv = cv2.cvtColor(frame, cv2.COLOR_BGR2YUV_I420)               # frame as it would be from the luma capture mode
+            if mode == 'yuv_bgr':                                           # case of BGR reference for the luma mode
+                frame = cv2.cvtColor(yuv, cv2.COLOR_YUV2BGR_I420)           # YUV frame is converted back to BGR
+            else:                                                           # case of luma mode
+                frame = yuv[:cm.height]                                     # Y plane of the YUV frame
+        raw_frame = None                                                    # raw frame (luma mode or coarse detection only)
+        if mode == 'luma' or scale != 0.8:                                  # case of luma mode or coarse detection
+            raw_frame = yuv if mode == 'luma' else frame                    # raw frame kept for the colors reading at lock
+        t = time.perf_counter()                                             # time reference
+        frame, w, h = cm.frame_geometry(frame, scale)                       # frame is cropped, warped and resized
+        timer.add('crop_warp_resize', time.perf_counter() - t)              # geometry stage time is stored
+        cm.w, cm.h = w, h                                                   # frame dimensions are assigned to the Cubotino_m globals
+
+        t_side += time.perf_counter() - t                                   # geometry time is added to the side time
+        t_frame = time.perf_counter()                                       # time reference for the whole frame
+        fcs_now = fcs and cm.fcs_first_frame(frame)                         # Fix Coordinates System attempted at the first frame
+        if fcs_now:                                                         # case the fix coordinates are validated on the frame
+            contours, hierarchy = (), None                                  # the edges analysis isn't needed
+        else:                                                               # case of edges analysis
+            contours, hierarchy = cm.read_facelets(frame, w, h)             # contours are retrieved
+        fcs_due = fcs_now or (fcs and times != None and times[n] - times[0] > cm.fcs_delay)  # case of FCS, at first frame or after fcs_delay
+        facelets, frame, fcs_frame, clean = cm.frame_facelets(frame, w, h, contours, hierarchy, fcs_due)  # per frame analysis
+        if len(facelets) == 9:                                              # case the face is locked
+            facelets, frame, w, h = cm.face_lock(facelets, frame, raw_frame, clean, w, h, fcs_frame, [],
+                                                 BGR_mean, H_mean, BGR_conf) # colors reading
+            timer.add('frame_to_lock', time.perf_counter() - t_frame)       # time of the frame with the face lock
+            timer.add('side_to_lock', t_side + time.perf_counter() - t_frame)  # time to lock the side
+            return n + 1, facelets                                          # frames used and facelets are returned
+
+        timer.add('frame_no_lock', time.perf_counter() - t_frame)           # time of the frame without face lock
+        t_side += time.perf_counter() - t_frame                             # frame time is added to the side time
+
+    return 0, []                                                            # face not locked
+
+
+
+
+
+
+
+def replay_sides(cm, frames, sides, timer, mode='bgr', scale=0.8, fitter='contours', accumulate=None, fcs=False, times=None):
+    """Replays the frames of the 6 cube sides, with the face fitter ('contours' or 'lattice'), and with the
+        facelets candidates accumulated over accumulate frames (None uses the accumulate_frames setting).
+        Fcs enables the Fix Coordinates System at the first frame of each side (cm.f_coordinates), and after fcs_delay.
+        Times are the recorded frames time, for the fcs_delay and the detection timeout (None skips both).
+        Returns the facelets BGR_mean and H_mean, the locks info, the facelets coordinates of the sides locked
+        via the edges analysis, and the facelets color confidence."""
+
+    cm.roi = None                                                           # ROI is reset, as at each solving cycle
+    cm.prune_reset()                                                        # contours prefilter counters are reset
+    cm.auto_branch = None                                                   # both edge branches until the first lock (frameless_cube 'auto')
+    cm.detect_scale = scale                                                 # frame scale for the facelets detection
+    cm.face_fitter = fitter                                                 # face fitter (9 square contours or 3x3 lattice)
+    cm.fcs_tried, cm.fcs_prev = 0, []                                       # FCS at the first frame is reset, as at each solving cycle
+    if accumulate != None:                                                  # case the accumulation frames are given
+        cm.accumulate_frames = accumulate                                   # frames a candidate is kept without being detected
+    cm.face_accumulator = FaceletsAccumulator(cm.accumulate_frames) if cm.accumulate_frames > 0 else None  # candidates over the side frames
+    BGR_mean = []                                                           # list with the 54 facelets BGR colors
+    H_mean = []                                                             # list with the 54 facelets Hue
+    BGR_conf = []                                                           # list with the 54 facelets color confidence
+    locks = {}                                                              # frames to lock per side
+    coordinates = []                                                        # facelets coordinates of the sides locked via the edges
+
+    for side in range(1, 7):                                                # iteration over the 6 cube sides
+        idx = [i for i, s in enumerate(sides) if s == side]                 # frames index for this side
+        if len(idx) == 0:                                                   # case no frames for this side
+            print(f'No frames recorded for side {cm.sides[side]}')          # feedback is printed to the terminal
+            locks[side] = (0, 0)                                            # side not locked
+            continue                                                        # next side
+        prev = cm.fcs_prev                                                  # coordinates of the last side locked via the edges
+        side_times = times[idx[0]:idx[-1]+1] if times != None else None     # recorded time of the side frames
+        n, facelets = replay_side(cm, frames[idx[0]:idx[-1]+1], side, BGR_mean, H_mean, timer, mode, scale, fcs, BGR_conf, side_times)
+        locks[side] = (max(n, 0), len(idx))                                 # frames to lock and recorded frames for this side
+        if n < 0:                                                           # case of detection timeout
+            break                                                           # for loop is interrupted
+        if cm.fcs_prev is not prev:                                         # case the side is locked via the edges
+            coordinates.append(cm.fcs_prev)                                 # facelets coordinates are appended
+        if n == 0 and side == 1:                                            # case the first side isn't locked
+            print('First side not locked: the facelets color cannot be read')  # feedback is printed to the terminal
+            break                                                           # for loop is interrupted
+
+    return BGR_mean, H_mean, locks, coordinates, BGR_conf
+
+
+
+
+
+
+
+def frame_time(timer):
+    """Returns the mean time (ms) per frame, from the geometry stage up to the lock (or no lock) of the frame.
+        The colors frame at face lock (luma or coarse path) is excluded, as it doesn't relate to each frame."""
+
+    geometry = timer.times.get('crop_warp_resize', [])                      # geometry stage times
+    analysis = timer.times.get('frame_to_lock', []) + timer.times.get('frame_no_lock', [])  # analysis times
+    conversion = timer.times.get('fine_frame', [])                          # colors frame times at face lock
+    return 1000 * (sum(geometry) + sum(analysis) - sum(conversion)) / max(1, len(geometry))
+
+
+
+
+
+
+
+def cube_status(cm, BGR_mean, BGR_conf=None):
+    """Returns the cube status string interpreted from the 54 facelets colors (and their confidence), as it would be sent
+        to the solver (first valid cube status hypothesis), or an empty string."""
+
+    if len(BGR_mean) != 54:                                                 # case not all the facelets have been read
+        return ''                                                           # empty string is returned
+    URFDLB_facelets_BGR_mean = cm.URFDLB_facelets_order(BGR_mean)           # facelets are ordered as per URFDLB order
+    URFDLB_facelets_conf = cm.URFDLB_facelets_order(BGR_conf) if BGR_conf != None else None  # color confidence as per URFDLB order
+    status, HSV_detected, color_seq, _ = cm.cube_colors_interpr(URFDLB_facelets_BGR_mean, URFDLB_facelets_conf)  # cube status via BGR color distance
+    status, _, _ = cm.cube_status_select(status, color_seq, URFDLB_facelets_BGR_mean, HSV_detected)  # first valid cube status
+    return cm.cube_string(status)                                           # cube status string
+
+
+
+
+
+
+
+def average_color_loop(frame, x, y, edge):
+    """Former pixel by pixel implementation of Cubotino_m.average_color (a single facelet), as microbenchmark reference."""
+
+    blue, green, red = float(0), float(0), float(0)                         # sums of the squares for the BGR components
+    for i in range(2*edge):                                                 # iteration over the columns of the square
+        j = i - edge                                                        # row offset from the square center
+        for i in range(2*edge):                                             # iteration over the rows of the square
+            b, g, r = frame[y+j, x-edge+i]                                  # bgr components of a single pixel
+            b, g, r = int(b), int(g), int(r)                                # from uint8 to integer
+            blue += b*b                                                     # progressive sum of the squares for the blue
+            green += g*g                                                    # progressive sum of the squares for the green
+            red += r*r                                                      # progressive sum of the squares for the red
+    num = 4*edge*edge                                                       # amount of pixels in the square
+    return (int(np.sqrt(blue/num)), int(np.sqrt(green/num)), int(np.sqrt(red/num)))
+
+
+
+
+
+
+
+def colors_benchmark(cm, frame, edge, repeat=200):
+    """Microbenchmark of the facelets color sampling on a frame: the former per facelet sampling (pixel by pixel
+        average and a cvtColor per facelet) against the vectorized read_color, on 9 and on 54 facelets.
+        Edge is the half side of the sampled squares. Prints the mean times, the results equality on the facelets
+        with full confidence, and the facelets with a robust color (squares rejected for large color deviation)."""
+
+    fh, fw = frame.shape[:2]                                                # frame height and width
+    step = min(fw, fh) // 5                                                 # distance between the facelets centers
+    xs = fw//2 + step * np.array((-1, 0, 1))                                # facelets centers x coordinate
+    ys = fh//2 + step * np.array((-1, 0, 1))                                # facelets centers y coordinate
+    face = [{'cx': int(x), 'cy': int(y), 'contour': None} for y in ys for x in xs]  # 9 facelets, from top left
+
+    print(f"\n{'Facelets color sampling (edge ' + str(edge) + ' px)':<46}{'loop':>10}{'vectorized':>14}{'same':>8}{'robust':>8}   (ms)")
+    for facelets in (face, 6*face):                                         # 9 facelets (a face) and 54 facelets (a cube)
+        t = time.perf_counter()                                             # time reference
+        for _ in range(repeat):                                             # repeated measurements
+            ref_BGR_mean, ref_H_mean = [], []                               # reference BGR_mean and H_mean
+            for f in facelets:                                              # iteration over the facelets
+                bgr = average_color_loop(frame, f['cx'], f['cy'], edge)     # color is averaged pixel by pixel
+                ref_BGR_mean.append(bgr)                                    # BGR is appended
+                hsv = cv2.cvtColor(np.array([[bgr]], dtype=np.uint8), cv2.COLOR_BGR2HSV)  # HSV of a single facelet
+                ref_H_mean.append(hsv[0][0][0])                             # Hue is appended
+        t_loop = 1000 * (time.perf_counter() - t) / repeat                  # mean time of the former sampling
+
+        t = time.perf_counter()                                             # time reference
+        for _ in range(repeat):                                             # repeated measurements
+            BGR_mean, H_mean, BGR_conf = [], [], []                         # BGR_mean, H_mean and color confidence
+            cm.read_color(frame, facelets, [], BGR_mean, H_mean, BGR_conf=BGR_conf)  # vectorized sampling
+        t_vect = 1000 * (time.perf_counter() - t) / repeat                  # mean time of the vectorized sampling
+
+        full = [i for i, c in enumerate(BGR_conf) if c == 1]               # facelets with full confidence
+        same = all(BGR_mean[i] == ref_BGR_mean[i] and H_mean[i] == ref_H_mean[i] for i in full)  # case of same BGR_mean and H_mean
+        print(f"{str(len(facelets)) + ' facelets':<46}{t_loop:>10.3f}{t_vect:>14.3f}{str(same):>8}{len(facelets) - len(full):>8}")
+
+
+
+
+
+
+
+def separated_geometry(cm):
+    """Returns a frame_geometry replacement running the former separated steps (frame_cropping, warp_image and
+        frame_resize with INTER_AREA), used as reference to measure the effect of the single remap on the colors."""
+
+    def frame_geometry(frame, scale=0):
+        if scale == 0:                                                      # case of default scale
+            scale = 0.75 if cm.cv_wow else 0.8                              # scaling factor according to cv_wow
+        frame, w, h = cm.frame_cropping(frame, cm.width, cm.height, cm.x_l, cm.x_r, cm.y_u, cm.y_b)  # frame is cropped
+        frame, w, h = cm.warp_image(frame, w, h, cm.w_f, cm.w_s)            # frame is warped
+        return cm.frame_resize(frame, w, h, scale)                          # frame is resized
+
+    return frame_geometry
+
+
+
+
+
+
+
+def replay(folder, debug=False, luma=False, coarse=0.8, lattice=False, accumulate=None, fcs=False, colors=False, geometry=False):
+    """Replays a capture through the Cubotino_m.py detection functions, and prints the benchmark."""
+
+    import Cubotino_m as cm                                                 # Cubotino_m functions (detection and color)
+    cm.replay_setup(debug)                                                  # Cubotino_m globals are set for the replay
+
+    frames, meta = load_capture(folder)                                     # capture is loaded
+    print(f"\nReplaying {meta['frames']} frames ({meta['width']}x{meta['height']}) from {folder}")
+
+    cm.width, cm.height = meta['width'], meta['height']                     # frames dimensions
+    s = meta['settings']                                                    # settings used while recording
+    cm.x_l, cm.x_r, cm.y_u, cm.y_b = s['x_l'], s['x_r'], s['y_u'], s['y_b'] # crop settings used while recording
+    cm.w_f, cm.w_s = s['warp_fraction'], s['warp_slicing']                  # warp settings used while recording
+    if 'frameless_cube' in s:                                               # case the frameless_cube setting is recorded
+        cm.frameless_cube = s['frameless_cube']                             # frameless_cube setting used while recording
+
+    sides = [rec['side'] for rec in meta['records']]                        # cube side per frame
+    times = [rec['time'] for rec in meta['records']]                        # recorded time per frame (from the capture start)
+    cm.frame_geometry(np.array(frames[0]))                                  # remap maps are built before the timed replay
+    cm.frame_geometry(np.array(frames[0]), coarse)                          # remap maps are built before the timed replay
+    compare = luma or coarse != 0.8 or lattice or accumulate != None or fcs or geometry  # case of a benchmark against a reference path
+    if compare:                                                             # case the replay is compared to the reference path
+        ref_timer = StageTimer()                                            # stage timer for the reference path
+        fused_geometry = cm.frame_geometry                                  # single remap geometry
+        if geometry:                                                        # case of geometry benchmark
+            cm.frame_geometry = separated_geometry(cm)                      # reference with the former separated steps
+        ref_accumulate = 0 if accumulate != None else None                  # reference without accumulation, when benchmarked
+        ref_BGR_mean, _, ref_locks, ref_coordinates, ref_conf = replay_sides(cm, frames, sides, ref_timer, 'yuv_bgr' if luma else 'bgr',
+                                                  accumulate=ref_accumulate, times=times)  # reference replay
+        ref_status = cube_status(cm, ref_BGR_mean, ref_conf)                # reference cube status
+        cm.frame_geometry = fused_geometry                                  # single remap geometry is restored
+        if fcs and len(ref_coordinates) > 0:                                # case of FCS benchmark
+            cm.f_coordinates = np.round(np.mean(ref_coordinates, axis=0)).astype(int).tolist()  # fix coordinates from the reference
+
+    timer = StageTimer()                                                    # stage timer object
+    for name in ('read_facelets', 'edge_analysis', 'prefilter_contours', 'get_approx_contours', 'get_facelets', 'lattice_facelets',
+                 'fine_frame', 'read_color', 'cube_colors_interpr'):        # stages to be timed
+        timer.wrap(cm, name)                                                # function is replaced by the timed version
+
+    fitter = 'lattice' if lattice else 'contours'                           # face fitter
+    BGR_mean, H_mean, locks, _, BGR_conf = replay_sides(cm, frames, sides, timer, 'luma' if luma else 'bgr', coarse, fitter, accumulate, fcs, times)  # replay
+
+    print(f"\n{'side':<8}{'lock at frame':>15}{'recorded':>10}")
+    for side, (n, rec) in locks.items():                                    # iteration over the sides
+        print(f"{cm.sides[side]:<8}{n if n else '-':>15}{rec:>10}")
+
+    status = cube_status(cm, BGR_mean, BGR_conf)                            # cube status
+    if status != '':                                                        # case all the facelets have been read
+        print(f'\nCube status (via BGR color distance): {status}')
+        print(f'Colors assignment cost margin: {round(cm.color_margin,1)}')  # feedback is printed to the terminal
+        dec_labels, dec_conf = cm.cubies.decode(cm.color_costs)             # cube status decoded at cubie level
+        decoded = ''.join('URFDLB'[c] for c in dec_labels)                  # decoded cube status string
+        print(f'Decoded cubies min confidence: {round(min(dec_conf.values()),2)}, decoded status {"equal to" if decoded == status else "different from"} the selected one')
+
+    timer.report()                                                          # benchmark is printed to the terminal
+    cm.prune_report()                                                       # contours pruned at each stage, per frame
+    if colors:                                                              # case of facelets color sampling microbenchmark
+        frame, _, _ = cm.frame_geometry(np.array(frames[0]))                # first frame, cropped, warped and resized
+        colors_benchmark(cm, frame, cm.edge if hasattr(cm, 'edge') else 8)  # vectorized against the former color sampling
+
+    if compare:                                                             # case the replay is compared to the reference path
+        path = (('luma' if luma else '') + (' coarse' if coarse != 0.8 else '') + (' lattice' if lattice else '') + (' accumulate' if accumulate != None else '') + (' fcs' if fcs else '') + (' remap' if geometry else '')).strip()  # name of the compared path
+        print(f"\n{'':<46}{'reference':>10}{path:>14}")
+        print(f"{'Per frame time (geometry + analysis), ms':<46}{frame_time(ref_timer):>10.2f}{frame_time(timer):>14.2f}")
+        ref_t, t = ref_timer.times.get('side_to_lock', []), timer.times.get('side_to_lock', [])  # times to lock the sides
+        ref_t = f'{1000*np.mean(ref_t):.2f}' if len(ref_t) else '-'        # mean time to lock a side, reference path
+        t = f'{1000*np.mean(t):.2f}' if len(t) else '-'                    # mean time to lock a side, compared path
+        print(f"{'Mean time to lock a side, ms':<46}{ref_t:>10}{t:>14}")
+        print(f"{'Frames to lock the 6 sides':<46}{sum(n for n, _ in ref_locks.values()):>10}{sum(n for n, _ in locks.values()):>14}")
+        if len(ref_BGR_mean) == len(BGR_mean) and len(BGR_mean) > 0:        # case both paths have read the facelets
+            delta = np.abs(np.array(ref_BGR_mean, dtype=int) - np.array(BGR_mean, dtype=int))  # BGR differences
+            print(f"{'Max facelets BGR_mean difference':<46}{np.max(delta):>24}")
+            print(f"{'Mean facelets BGR_mean difference':<46}{np.mean(delta):>24.2f}")
+        if ref_status != '' and status != '':                               # case both paths have the cube status
+            agree = sum(a == b for a, b in zip(ref_status, status))         # facelets with the same color decision
+            print(f"{'Facelets color decisions agreement':<46}{str(agree) + '/54':>24}")
+    print()
+
+
+
+
+
+if __name__ == "__main__":
+    """Replays a frames capture, made with Cubotino_m.py --record."""
+
+    import argparse, sys
+    parser = argparse.ArgumentParser(description='Replay of frames recorded with Cubotino_m.py --record')
+    parser.add_argument("folder", help='Capture folder (i.e. CubesFramesCaptures/20261017_101010)')
+    parser.add_argument("-d", "--debug", action='store_true', help="Activates the Cubotino_m.py debug printout")
+    parser.add_argument("-l", "--luma", action='store_true', help="Benchmarks the luma capture mode against the BGR one")
+    parser.add_argument("-c", "--coarse", type=float, default=0.8,
+                        help="Frame scale for the coarse detection (i.e. 0.4), benchmarked against the single scale (0.8)")
+    parser.add_argument("-f", "--lattice", action='store_true', help="Benchmarks the lattice face fitter against the contours one")
+    parser.add_argument("-a", "--accumulate", type=int, default=None,
+                        help="Frames a facelet candidate is kept (i.e. 3), benchmarked against no accumulation")
+    parser.add_argument("-i", "--immediate", action='store_true',
+                        help="Benchmarks the Fix Coordinates System at the first frame of each side (coordinates from the reference)")
+    parser.add_argument("-b", "--colors", action='store_true', help="Microbenchmarks the facelets color sampling (read_color)")
+    parser.add_argument("-g", "--geometry", action='store_true',
+                        help="Benchmarks the single remap geometry against the separated crop, warp and resize steps (colors effect)")
+    args = parser.parse_args()
+
+    sys.argv = sys.argv[:1]        # arguments are removed, as Cubotino_m.py parses its own ones at import
+    replay(args.folder, args.debug, args.luma, args.coarse, args.lattice, args.accumulate, args.immediate, args.colors, args.geometry)
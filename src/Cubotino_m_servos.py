@@ -46,6 +46,7 @@ s_disp.set_backlight(1)                             # activates the display back
 
 ##################    imports and servo_settings for Servos and LED   ####################
 import time                                       # import time library
+import Cubotino_m_moves as rm                     # custom library, robot moves (and their estimated time)
 import RPi.GPIO as GPIO                           # import RPi GPIO library
 GPIO.setmode(GPIO.BCM)                            # setting GPIO pins as "Broadcom SOC channel" number, these are the numbers after "GPIO"
 GPIO.setwarnings(False)                           # setting GPIO to don't return allarms
@@ -906,6 +907,21 @@ def check_moves(moves, print_out=s_debug):
 
 
 
+def estimate_robot_time(moves, start_pos='read'):
+    """ Function that estimates the robot time (secs) for the received string of moves, without moving the servos,
+        from the servos timers (servo settings); The estimation is done by Cubotino_m_moves.robot_time."""
+
+    timers = {'t_flip_to_close_time': t_flip_to_close_time, 't_close_to_flip_time': t_close_to_flip_time,
+              't_flip_open_time': t_flip_open_time, 't_open_close_time': t_open_close_time,
+              't_rel_time': t_rel_time if t_servo_rel < t_servo_close else 0,  # time to release the top cover tension, when set
+              'b_spin_time': b_spin_time, 'b_rotate_time': b_rotate_time, 'b_rel_time': b_rel_time}  # servos timers
+    return rm.robot_time(moves, timers, start_pos, flip_to_close_one_step)  # estimated robot time
+
+
+
+
+
+
 def fun(print_out=s_debug):
     """ Cube holder spins, to make some vittory noise once the cube is solved."""
 
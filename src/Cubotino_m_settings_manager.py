@@ -225,6 +225,13 @@ class Settings:
             s['built_by_x'] = int(s['built_by_x'])                # x coordinate for maker's name on display
             s['built_by_fs'] = int(s['built_by_fs'])              # font size for the maker's name on display
             s['fcs_delay'] = float(s['fcs_delay'])                # delay in secs to switch to Fix Coordinates System for facelets position
+            s['roi_frames'] = int(s['roi_frames'])                # frames without face lock before widening the ROI to the full frame
+            s['detect_scale'] = float(s['detect_scale'])          # frame scale for the facelets detection (0.8 = colors frame scale)
+            s['auto_frames'] = int(s['auto_frames'])              # frames without face lock, on frameless_cube 'auto', before using both edge branches
+            s['accumulate_frames'] = int(s['accumulate_frames'])  # frames a facelet candidate is kept, on the side under reading, without being detected
+            s['gate_motion'] = float(s['gate_motion'])            # max mean difference (gray levels) between consecutive frames thumbnails
+            s['gate_blur'] = float(s['gate_blur'])                # min sharpness, as fraction of the sharpest frame on the side under reading
+            s['fcs_first'] = float(s['fcs_first'])                # min score (0 to 1) to accept the fix coordinates at the first frame of each side
             
             if s['cover_self_close'].lower().strip() == 'false':  # case cover_self_close parameter is a string == false
                 s['cover_self_close'] = False                     # cover_self_close parameter is set boolean False
@@ -234,6 +241,27 @@ class Settings:
                 print('\n\nAttention: Wrong cover_self_close parameter: It should be "true" or "false."\n')  # feedback is printed to the terminal
                 s['cover_self_close'] = False                     # cover_self_close parameter is set boolean False
             
+            if s['cam_video_port'].lower().strip() == 'false':    # case cam_video_port parameter is a string == false
+                s['cam_video_port'] = False                       # cam_video_port parameter is set boolean False
+            elif s['cam_video_port'].lower().strip() == 'true':   # case cam_video_port parameter is a string == true
+                s['cam_video_port'] = True                        # cam_video_port parameter is set boolean True
+            else:                                                 # case the cam_video_port parameter is not 'false' or 'true'
+                print('\n\nAttention: Wrong cam_video_port parameter: It should be "true" or "false."\n')  # feedback is printed to the terminal
+                s['cam_video_port'] = False                       # cam_video_port parameter is set boolean False
+            
+            if s['cam_luma'].lower().strip() == 'false':          # case cam_luma parameter is a string == false
+                s['cam_luma'] = False                             # cam_luma parameter is set boolean False
+            elif s['cam_luma'].lower().strip() == 'true':         # case cam_luma parameter is a string == true
+                s['cam_luma'] = True                              # cam_luma parameter is set boolean True
+            else:                                                 # case the cam_luma parameter is not 'false' or 'true'
+                print('\n\nAttention: Wrong cam_luma parameter: It should be "true" or "false."\n')  # feedback is printed to the terminal
+                s['cam_luma'] = False                             # cam_luma parameter is set boolean False
+            
+            s['face_fitter'] = s['face_fitter'].lower().strip()   # face fitter parameter, as lower case string
+            if s['face_fitter'] not in ('contours', 'lattice'):   # case the face_fitter parameter is not 'contours' or 'lattice'
+                print('\n\nAttention: Wrong face_fitter parameter: It should be "contours" or "lattice".\n')  # feedback is printed to the terminal
+                s['face_fitter'] = 'contours'                     # face_fitter parameter is set to 'contours'
+            
             return s                                              # parsed settings dict is returned
 
         except:   # exception will be raised if json keys differs, or parameters cannot be converted (to float, int, string, etc)
@@ -442,6 +470,46 @@ class Settings:
         if 'fcs_delay' not in s_keys:
             s['fcs_delay']='3'
             any_change = True
+        
+        if 'cam_video_port' not in s_keys:
+            s['cam_video_port']='true'
+            any_change = True
+        
+        if 'roi_frames' not in s_keys:
+            s['roi_frames']='10'
+            any_change = True
+        
+        if 'cam_luma' not in s_keys:
+            s['cam_luma']='false'
+            any_change = True
+        
+        if 'detect_scale' not in s_keys:
+            s['detect_scale']='0.8'
+            any_change = True
+        
+        if 'auto_frames' not in s_keys:
+            s['auto_frames']='10'
+            any_change = True
+        
+        if 'face_fitter' not in s_keys:
+            s['face_fitter']='contours'
+            any_change = True
+        
+        if 'accumulate_frames' not in s_keys:
+            s['accumulate_frames']='3'
+            any_change = True
+        
+        if 'gate_motion' not in s_keys:
+            s['gate_motion']='6.0'
+            any_change = True
+        
+        if 'gate_blur' not in s_keys:
+            s['gate_blur']='0.5'
+            any_change = True
+        
+        if 'fcs_first' not in s_keys:
+            s['fcs_first']='0.9'
+            any_change = True
          
         if any_change:
             print('\nOne time action: Adding new parameters to the Cubotino_m_settings.txt')
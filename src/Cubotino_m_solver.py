@@ -0,0 +1,287 @@
+#!/usr/bin/python
+# coding: utf-8
+
+"""
+#############################################################################################################
+# Andrea Favero 17 October 2026
+#
+# This script relates to CUBOTino micro, an extremely small and simple Rubik's cube solver robot 3D printed
+# CUBOTino micro is the smallest version of the CUBOTino versions
+#
+# Kociemba solver (twophase) as a long-lived local service, so that its tables are loaded once per boot.
+#  - python Cubotino_m_solver.py starts the solver daemon: the twophase tables are loaded, and the solve (and
+#    random cube) requests are answered via a Unix domain socket (one json line per request and response).
+#  - python Cubotino_m_solver.py --ping exits with code 0 when the daemon is running, 1 otherwise.
+#  - python Cubotino_m_solver.py --wait SECS waits (max SECS) for the daemon to be ready (tables loaded); with
+#    --pid PID (the daemon process) the wait ends as soon as the daemon process has exited (i.e. on errors).
+#  - solutions function returns distinct solutions (one per solver search direction), to select the fastest for the robot.
+#    The search directions don't stop each other as in twophase: after the first solution within max_moves, the
+#    other directions are searched for SEARCH_EXTRA secs more at most (and within the timeout), then stopped.
+#  - solve, solutions and random_cube functions use the daemon when it is running, otherwise the twophase solver is
+#    imported in process (this import takes quite some time), as before: Cubotino_m.py uses this module as sv.
+#    When the solver can't be imported, or the daemon fails on a request, an 'Error: ...' string is returned (as
+#    for twophase errors).
+#  - The socket is in a folder only accessible by the daemon user and the pi group (root at autostart, pi when
+#    started manually), not directly in the world writable /tmp.
+#
+#############################################################################################################
+"""
+
+import os, sys, json, time, socket, socketserver, signal, stat
+
+SOCKET_DIR = '/tmp/cubotino_solver'            # folder of the solver daemon socket (owner and pi group only)
+SOCKET = os.path.join(SOCKET_DIR, 'solver.sock')  # Unix domain socket of the solver daemon
+GROUP = 'pi'                                   # group allowed to use the solver daemon, besides the daemon user
+SEARCH_EXTRA = 0.5                             # max secs searching the other directions, after the first solution
+_sv, _cubie = None, None                       # twophase solver and cubie modules, when imported in process
+
+
+
+def _request(data, timeout):
+    """Sends a request (dict) to the solver daemon; Returns the result, or None if the daemon doesn't answer."""
+
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:        # Unix domain socket
+            s.settimeout(timeout)                                           # max time for the daemon answer
+            s.connect(SOCKET)                                               # connection to the daemon
+            s.sendall((json.dumps(data) + '\n').encode())                   # request, as json line
+            with s.makefile('r') as f:                                      # socket as text file
+                return json.loads(f.readline())['result']                   # result of the request
+    except:                                                                 # case the daemon is not running (or not answering)
+        return None                                                         # None is returned
+
+
+
+def daemon_running(timeout=0.5):
+    """Returns True if the solver daemon is running and answering."""
+
+    return _request({'cmd': 'ping'}, timeout) == 'pong'                     # True when the daemon answers the ping
+
+
+
+def load():
+    """Imports the twophase solver in process, with the tables memory mapped read-only; Returns True if imported."""
+
+    global _sv, _cubie
+
+    try:
+        import Cubotino_m_tables as tables                                  # memory mapped twophase tables
+        _sv, _cubie = tables.import_solver()                                # Kociemba solver, with tables memory mapped
+        return True                                                         # True is returned
+    except:                                                                 # case the solver cannot be imported
+        return False                                                        # False is returned
+
+
+
+def solve(cube_string, max_moves=20, timeout=2):
+    """Solves the cube string (as twophase.solver.solve): via the daemon when running, otherwise in process."""
+
+    data = {'cmd': 'solve', 'cube': cube_string, 'max_moves': max_moves, 'timeout': timeout}
+    s = _request(data, timeout + 10) if _sv is None else None               # solution via the daemon
+    if s is None:                                                           # case the daemon didn't answer
+        if _sv is None and not load():                                      # case the solver cannot be imported in process
+            return 'Error: Kociemba solver not found'                       # error is returned
+        s = _sv.solve(cube_string, max_moves, timeout)                      # solution in process
+    return s
+
+
+
+def _solutions(cube_string, max_moves, timeout):
+    """Solves the cube string in process, via independent twophase search threads (one per cube orientation and
+        inversion, as twophase.solver.solve); Each thread stops at its first solution within max_moves (or at timeout),
+        and all the solutions found along the search are returned. All the threads are stopped SEARCH_EXTRA secs after
+        the first solution within max_moves, or at timeout once any solution is found (the solving time is longer than
+        twophase.solver.solve by SEARCH_EXTRA at most, unless no solution within max_moves exists).
+        Returns the list of the distinct solutions, in twophase.solver.solve format, or the error string in a list."""
+
+    fc = _sv.face.FaceCube()                                                # cube in facelets reppresentation
+    s = fc.from_string(cube_string)                                         # cube string is parsed
+    if s != _sv.cubie.CUBE_OK:                                              # case of invalid cube string
+        return [s]                                                          # error is returned
+    cc = fc.to_cubie_cube()                                                 # cube in cubie reppresentation
+    s = cc.verify()                                                         # cube is verified
+    if s != _sv.cubie.CUBE_OK:                                              # case of invalid cube
+        return [s]                                                          # error is returned
+
+    syms = cc.symmetries()                                                  # cube symmetries
+    tr = [0, 3] if {16, 20, 24, 28} & set(syms) else range(6)               # search directions, as twophase.solver.solve
+    if set(range(48, 96)) & set(syms):                                      # case of cube antisymmetry
+        tr = [i for i in tr if i < 3]                                       # inverse cubes are not searched
+    s_time = time.monotonic()                                               # time reference, for the solver timeout
+    threads = []                                                            # search threads
+    for i in tr:                                                            # iteration over the search directions
+        th = _sv.SolverThread(cc, i % 3, i // 3, max_moves, timeout, s_time, [], _sv.thr.Event(), [999])  # own solutions
+        threads.append(th)                                                  # thread is appended to the list
+        th.start()                                                          # search is started
+    deadline = s_time + timeout                                             # time to stop the search threads
+    while any(th.is_alive() for th in threads):                             # case of search threads still running
+        if any(not th.is_alive() and len(th.solutions) > 0 for th in threads):  # case of solution within max_moves
+            deadline = min(deadline, time.monotonic() + SEARCH_EXTRA)       # the other threads search SEARCH_EXTRA at most
+        if time.monotonic() > deadline and any(len(th.solutions) > 0 for th in threads):  # case of time over, with solutions
+            for th in threads:                                              # iteration over the search threads
+                th.terminated.set()                                         # search thread is stopped
+        time.sleep(0.01)                                                    # short sleep before checking again
+    found = []                                                              # distinct solutions
+    for th in threads:                                                      # iteration over the search threads
+        for man in th.solutions:                                            # iteration over the solutions of the thread
+            s = ''.join(m.name + ' ' for m in man)                          # solution, as twophase.solver.solve
+            s += '(' + str(len(man)) + 'f)'                                 # solution length, as twophase.solver.solve
+            if s not in found:                                              # case of new solution
+                found.append(s)                                             # solution is appended to the list
+    return found
+
+
+
+def solutions(cube_string, max_moves=20, timeout=2):
+    """Returns distinct solutions of the cube string (twophase.solver.solve format), one per solver search direction:
+        via the daemon when running, otherwise in process."""
+
+    data = {'cmd': 'solutions', 'cube': cube_string, 'max_moves': max_moves, 'timeout': timeout}
+    s = _request(data, timeout + 10) if _sv is None else None               # solutions via the daemon
+    if s is None:                                                           # case the daemon didn't answer
+        if _sv is None and not load():                                      # case the solver cannot be imported in process
+            return ['Error: Kociemba solver not found']                     # error is returned
+        s = _solutions(cube_string, max_moves, timeout)                     # solutions in process
+    elif s == 'Error: unknown request':                                     # case the daemon doesn't know the request
+        s = [solve(cube_string, max_moves, timeout)]                        # single solution
+    elif not isinstance(s, list):                                           # case of daemon error
+        s = [s]                                                             # error is returned in a list
+    return s
+
+
+
+def random_cube():
+    """Returns the string of a random cube (as twophase.cubie.CubieCube.randomize): via the daemon when running,
+        otherwise in process."""
+
+    s = _request({'cmd': 'random'}, 5) if _sv is None else None             # random cube via the daemon
+    if s is None:                                                           # case the daemon didn't answer
+        if _cubie is None and not load():                                   # case the solver cannot be imported in process
+            return 'Error: Kociemba solver not found'                       # error is returned
+        cc = _cubie.CubieCube()                                             # cube in cubie reppresentation
+        cc.randomize()                                                      # randomized cube in cubie reppresentation
+        s = str(cc.to_facelet_cube())                                       # randomized cube in facelets string reppresentation
+    return s
+
+
+
+
+
+
+class _Handler(socketserver.StreamRequestHandler):
+
+    def handle(self):
+        """Answers a request (json line) with the result (json line)."""
+
+        try:
+            data = json.loads(self.rfile.readline())                        # request
+            if data['cmd'] == 'solve':                                      # case of solve request
+                result = _sv.solve(data['cube'], data['max_moves'], data['timeout'])  # cube solution
+            elif data['cmd'] == 'solutions':                                # case of solutions request
+                result = _solutions(data['cube'], data['max_moves'], data['timeout'])  # cube distinct solutions
+            elif data['cmd'] == 'random':                                   # case of random cube request
+                cc = _cubie.CubieCube()                                     # cube in cubie reppresentation
+                cc.randomize()                                              # randomized cube in cubie reppresentation
+                result = str(cc.to_facelet_cube())                          # randomized cube in facelets string reppresentation
+            elif data['cmd'] == 'ping':                                     # case of ping request
+                result = 'pong'                                             # daemon is running
+            else:                                                           # case of unknown request
+                result = 'Error: unknown request'                           # error is returned
+        except Exception as e:                                              # case of exceptions
+            print(f'Solver daemon request error: {e}')                      # feedback is printed to the terminal
+            result = f'Error: solver daemon, {e}'                           # error is returned, instead of closing silently
+        try:
+            self.wfile.write((json.dumps({'result': result}) + '\n').encode())  # result, as json line
+        except Exception as e:                                              # case of exceptions (i.e. client gone)
+            print(f'Solver daemon reply error: {e}')                        # feedback is printed to the terminal
+
+
+
+def _socket_dir():
+    """Creates the socket folder, accessible only by the daemon user and the pi group; Returns the group id, or None
+        when the pi group doesn't exist. Raises PermissionError if the folder exists and belongs to another user."""
+
+    try:
+        import grp                                                          # groups database
+        gid = grp.getgrnam(GROUP).gr_gid                                    # pi group id
+    except (ImportError, KeyError):                                         # case the pi group doesn't exist
+        gid = None                                                          # socket for the daemon user only
+
+    if not os.path.isdir(SOCKET_DIR):                                       # case the folder doesn't exist
+        os.mkdir(SOCKET_DIR, 0o700)                                         # folder is created (owner only)
+    st = os.lstat(SOCKET_DIR)                                               # folder status (symlinks not followed)
+    if not stat.S_ISDIR(st.st_mode) or st.st_uid != os.getuid():           # case of folder not owned by the daemon user
+        raise PermissionError(f'{SOCKET_DIR} is not owned by the daemon user')
+    if gid is not None:                                                     # case the pi group exists
+        os.chown(SOCKET_DIR, -1, gid)                                       # folder group is set to pi
+    os.chmod(SOCKET_DIR, 0o750 if gid is not None else 0o700)               # folder accessible by owner (and pi group)
+    return gid
+
+
+
+def serve():
+    """Loads the twophase tables, and answers the requests until terminated (SIGTERM or Ctrl+C)."""
+
+    if daemon_running():                                                    # case the daemon is already running
+        print('Solver daemon already running')                              # feedback is printed to the terminal
+        return                                                              # function is terminated
+
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))                    # twophase tables are in the script folder
+    t_start = time.time()                                                   # time reference
+    if not load():                                                          # case the solver cannot be imported
+        print('Not found Kociemba solver')                                  # feedback is printed to the terminal
+        sys.exit(1)                                                         # script is quitted with error code
+    print(f'Kociemba solver tables loaded in {round(time.time() - t_start, 1)} secs')  # feedback is printed to the terminal
+
+    try:
+        gid = _socket_dir()                                                 # socket folder (owner and pi group only)
+    except OSError as e:                                                    # case the folder cannot be used
+        print(f'Solver daemon socket folder error: {e}')                    # feedback is printed to the terminal
+        sys.exit(1)                                                         # script is quitted with error code
+    if os.path.exists(SOCKET):                                              # case of socket file left by a previous daemon
+        os.remove(SOCKET)                                                   # socket file is removed
+    server = socketserver.UnixStreamServer(SOCKET, _Handler)                # requests are answered one at the time
+    if gid is not None:                                                     # case the pi group exists
+        os.chown(SOCKET, -1, gid)                                           # socket group is set to pi
+    os.chmod(SOCKET, 0o660)                                                 # socket usable by the daemon user and the pi group
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))        # SIGTERM quits the daemon (as Ctrl+C)
+    print(f'Solver daemon listening at {SOCKET}')                           # feedback is printed to the terminal
+    try:
+        server.serve_forever()                                              # requests are answered until terminated
+    except (KeyboardInterrupt, SystemExit):                                 # case of Ctrl+C or SIGTERM
+        pass                                                                # do nothing
+    finally:
+        server.server_close()                                               # socket is closed
+        if os.path.exists(SOCKET):                                          # case the socket file exists
+            os.remove(SOCKET)                                               # socket file is removed
+        print('Solver daemon stopped')                                      # feedback is printed to the terminal
+
+
+
+
+
+
+if __name__ == "__main__":
+
+    if '--ping' in sys.argv:                                                # case of ping argument
+        sys.exit(0 if daemon_running() else 1)                              # exit code 0 when the daemon is running
+
+    elif '--wait' in sys.argv:                                              # case of wait argument
+        idx = sys.argv.index('--wait')                                      # argument index
+        secs = float(sys.argv[idx + 1]) if len(sys.argv) > idx + 1 else 120 # max waiting time
+        pid = int(sys.argv[sys.argv.index('--pid') + 1]) if '--pid' in sys.argv else None  # daemon process id
+        t_start = time.time()                                               # time reference
+        while time.time() - t_start < secs:                                 # while loop until the max waiting time
+            if daemon_running():                                            # case the daemon is running
+                sys.exit(0)                                                 # exit code 0
+            if pid != None:                                                 # case the daemon process id is given
+                try:                                                        # tentative
+                    os.kill(pid, 0)                                         # checks the daemon process exists (no signal sent)
+                except ProcessLookupError:                                  # case the daemon process has exited
+                    print('Solver daemon exited before being ready')        # feedback is printed to the terminal
+                    sys.exit(1)                                             # exit code 1, daemon not ready
+            time.sleep(0.5)                                                 # short sleep before the next check
+        sys.exit(1)                                                         # exit code 1, daemon not ready
+
+    else:                                                                   # case of no arguments
+        serve()                                                             # solver daemon is started
@@ -0,0 +1,247 @@
+#!/usr/bin/python
+# coding: utf-8
+
+"""
+#############################################################################################################
+# Andrea Favero 17 October 2026
+#
+# This script relates to CUBOTino micro, an extremely small and simple Rubik's cube solver robot 3D printed
+# CUBOTino micro is the smallest version of the CUBOTino versions
+#
+# Memory mapped Kociemba solver (twophase) tables.
+#  - The twophase package reads its move, symmetry and pruning tables (src/twophase folder) in the process
+#    memory when imported (array.fromfile), about 10 MB plus the phase1 pruning table.
+#  - import_solver imports the twophase solver with the tables mapped read-only (mmap) instead: pages are read
+#    from the files when used, and they are shared (one page cache copy) by all the processes using the
+#    solver (i.e. the solver daemon, and the main script in case the daemon isn't running).
+#  - import_mapped imports any twophase modules the same way (i.e. the move and symmetry tables only, as done by
+#    Cubotino_m_checks.py without generating the missing pruning tables).
+#  - The tables are accessed via memoryview, as fast as the array ones; missing tables are generated by twophase
+#    as usual (in memory).
+#  - Only the twophase modules see the placeholder array type (their 'import array as ar' gets a placeholder
+#    module): array.array isn't replaced process wide, so other threads creating arrays aren't affected.
+#  - python Cubotino_m_tables.py prints the import time, the resident memory and the solving time of twophase,
+#    with the tables loaded in memory and with the tables memory mapped (each case on a new process).
+#
+#############################################################################################################
+"""
+
+import os, sys, json, time, array, mmap, subprocess, types, builtins, importlib, importlib.abc, importlib.machinery
+
+_array = array.array                           # array type, used by twophase to load the tables
+_maps = {}                                     # memory mapped table files, by file name
+
+
+
+class _MappedArray:
+
+    def __init__(self, typecode):
+        """Placeholder of an empty array, returned to twophase at import: fromfile maps the file instead of reading it."""
+
+        self.typecode = typecode                                            # array type code
+        self.itemsize = _array(typecode).itemsize                           # bytes per item
+        self.view = None                                                    # memoryview on the mapped file
+
+
+
+    def fromfile(self, f, n):
+        """Maps n items, from the file position, as read-only memoryview; The file position is moved as per reading."""
+
+        fname = os.path.abspath(f.name)                                     # table file name
+        if fname not in _maps:                                              # case the file isn't mapped yet
+            _maps[fname] = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)  # file mapped read-only
+        offset, nbytes = f.tell(), n * self.itemsize                        # table position and size in the file
+        if offset + nbytes > len(_maps[fname]):                             # case the file is too short
+            raise EOFError('read() didn\'t return enough bytes')            # same exception of array.fromfile
+        self.view = memoryview(_maps[fname])[offset:offset + nbytes].cast(self.typecode)  # table on the mapped file
+        f.seek(offset + nbytes)                                             # file position after the table
+
+
+
+    def __getitem__(self, i):
+        """Item access while importing twophase (after the import the placeholder is replaced by the memoryview)."""
+
+        return self.view[i]                                                 # item of the table
+
+
+
+    def __len__(self):
+        """Items of the table."""
+
+        return 0 if self.view is None else len(self.view)                   # items of the table
+
+
+
+
+
+
+def _array_or_mapped(typecode, *args):
+    """Returns an array when an initializer is given (tables to be generated), otherwise a _MappedArray placeholder."""
+
+    return _array(typecode, *args) if args else _MappedArray(typecode)
+
+
+
+_ar = types.ModuleType('array')                # array module seen by the twophase modules, while imported
+_ar.array = _array_or_mapped                   # array type returning the placeholders
+
+
+
+def _import(name, globals=None, locals=None, fromlist=(), level=0):
+    """__import__ of the twophase modules: the array module is replaced by the placeholders one."""
+
+    if name == 'array' and level == 0:                                      # case of array module
+        return _ar                                                          # placeholders array module
+    return builtins.__import__(name, globals, locals, fromlist, level)      # other modules are imported as usual
+
+
+
+class _Loader(importlib.abc.Loader):
+
+    def __init__(self, loader):
+        """Loader of a twophase module, wrapping the standard one."""
+
+        self.loader = loader                                                # standard loader of the module
+
+
+
+    def create_module(self, spec):
+        """Module is created by the standard loader."""
+
+        return self.loader.create_module(spec)                              # module (None for the default creation)
+
+
+
+    def exec_module(self, module):
+        """Module code is executed with the _import function, instead of the builtin one."""
+
+        module.__builtins__ = dict(vars(builtins), __import__=_import)      # builtins of the module, with _import
+        self.loader.exec_module(module)                                     # module code is executed
+
+
+
+
+class _Finder(importlib.abc.MetaPathFinder):
+
+    def find_spec(self, fullname, path, target=None):
+        """Spec of the twophase modules, with the _Loader; Other modules are left to the standard finders."""
+
+        if not fullname.startswith('twophase.'):                            # case of not twophase module
+            return None                                                     # standard finders are used
+        spec = importlib.machinery.PathFinder.find_spec(fullname, path, target)  # standard spec of the module
+        if spec is not None and spec.loader is not None:                    # case the module is found
+            spec.loader = _Loader(spec.loader)                              # module is loaded via _Loader
+        return spec
+
+
+
+
+
+
+def import_mapped(*names):
+    """Imports the twophase modules (i.e. 'twophase.moves'), with the tables memory mapped read-only.
+        Returns the imported modules."""
+
+    finder = _Finder()                                                      # finder of the twophase modules
+    sys.meta_path.insert(0, finder)                                         # tables are mapped, while twophase is imported
+    try:
+        modules = [importlib.import_module(name) for name in names]         # twophase modules are imported
+    finally:
+        sys.meta_path.remove(finder)                                        # twophase finder is removed
+
+    for name, module in list(sys.modules.items()):                          # iteration over the imported modules
+        if name.startswith('twophase'):                                     # case of twophase module
+            for key, value in list(vars(module).items()):                   # iteration over the module variables
+                if isinstance(value, _MappedArray):                         # case of table placeholder
+                    setattr(module, key, value.view if value.view is not None else _array(value.typecode))
+                elif value is _ar:                                          # case of placeholders array module
+                    setattr(module, key, array)                             # array module is restored
+    return modules
+
+
+
+def import_solver():
+    """Imports the twophase solver, with the tables memory mapped read-only.
+        Returns the twophase.solver and twophase.cubie modules."""
+
+    sv, cubie = import_mapped('twophase.solver', 'twophase.cubie')          # Kociemba solver, and cubie library part
+    return sv, cubie
+
+
+
+
+
+
+def _memory():
+    """Returns the resident memory of the process, total, anonymous (private) and file backed (shared), in MB."""
+
+    rss = {}                                                                # resident memory values
+    with open('/proc/self/status') as f:                                    # process status
+        for line in f:                                                      # iteration over the status lines
+            if line.startswith(('VmRSS', 'RssAnon', 'RssFile')):            # case of resident memory line
+                key, value = line.split(':')                                # name and value (kB)
+                rss[key] = round(int(value.split()[0]) / 1024, 1)          # value in MB
+    return rss
+
+
+
+def _child(mode, cubes):
+    """Imports twophase (tables in memory or memory mapped), solves the cubes, and prints the results as json."""
+
+    t_start = time.time()                                                   # time reference
+    if mode == 'mmap':                                                      # case of memory mapped tables
+        sv, cubie = import_solver()                                         # solver with memory mapped tables
+    else:                                                                   # case of tables in memory
+        import twophase.solver as sv                                        # solver with tables in memory
+    t_import = time.time() - t_start                                        # import time
+    rss_import = _memory()                                                  # resident memory after the import
+
+    t_solve = []                                                            # solving times
+    for cube in cubes:                                                      # iteration over the cubes
+        t_start = time.time()                                               # time reference
+        sv.solve(cube, 20, 2)                                               # solution
+        t_solve.append(time.time() - t_start)                               # solving time
+    print(json.dumps({'import': t_import, 'rss_import': rss_import, 'rss_solve': _memory(),
+                      'solve': sum(t_solve) / max(1, len(t_solve))}))
+
+
+
+def benchmark(n=5):
+    """Prints import time, resident memory and mean solving time (n random cubes), with the tables in memory and
+        memory mapped; Each case runs on a new process."""
+
+    import twophase.cubie as cubie                                          # cubie Kociemba solver library part (no tables)
+    cubes = []                                                              # random cubes
+    for i in range(n):                                                      # iteration over the cubes
+        cc = cubie.CubieCube()                                              # cube in cubie reppresentation
+        cc.randomize()                                                      # randomized cube in cubie reppresentation
+        cubes.append(str(cc.to_facelet_cube()))                             # randomized cube in facelets string reppresentation
+
+    results = {}                                                            # results per mode
+    for mode in ('array', 'mmap'):                                          # iteration over the modes
+        out = subprocess.run([sys.executable, os.path.abspath(__file__), '--child', mode] + cubes,
+                             capture_output=True, text=True).stdout         # child process output
+        results[mode] = json.loads(out.strip().splitlines()[-1])            # results of the child process
+
+    print(f"\n{'twophase tables':<34}{'in memory':>12}{'mmap':>12}")
+    for key, label in (('import', 'Import time, s'), ('solve', 'Mean solving time, s')):
+        print(f"{label:<34}{results['array'][key]:>12.2f}{results['mmap'][key]:>12.2f}")
+    for stage in ('rss_import', 'rss_solve'):                               # iteration over the memory stages
+        for key in ('VmRSS', 'RssAnon', 'RssFile'):                         # iteration over the memory values
+            label = f"{key} after {'import' if stage == 'rss_import' else 'solving'}, MB"
+            print(f"{label:<34}{results['array'][stage].get(key, 0):>12}{results['mmap'][stage].get(key, 0):>12}")
+    print('(RssFile pages are shared by the processes mapping the same tables)\n')
+
+
+
+
+
+
+if __name__ == "__main__":
+
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))                    # twophase tables are in the script folder
+    if '--child' in sys.argv:                                               # case of child process
+        idx = sys.argv.index('--child')                                     # argument index
+        _child(sys.argv[idx + 1], sys.argv[idx + 2:])                       # import and solving of the cubes
+    else:                                                                   # case of no arguments
+        benchmark()                                                         # benchmark with and without mmap
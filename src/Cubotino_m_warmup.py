@@ -0,0 +1,94 @@
+#!/usr/bin/python
+# coding: utf-8
+
+"""
+#############################################################################################################
+# Andrea Favero 17 October 2026
+#
+# This script relates to CUBOTino micro, an extremely small and simple Rubik's cube solver robot 3D printed
+# CUBOTino micro is the smallest version of the CUBOTino versions
+#
+# Convergence check for the PiCamera warm-up (analog/digital gains, AWB gains and exposure time).
+#  - Each parameter settles, after a light/scene change, with an exponential like behaviour.
+#  - The latest datapoints are kept on fixed size ring buffers (numpy arrays).
+#  - The last datapoints are split in three consecutive blocks: from the blocks means, the Aitken extrapolation
+#    predicts the settled value (x0, x1, x2 -> x2 + d2*q/(1-q), with d1=x1-x0, d2=x2-x1, q=d2/d1).
+#  - The warm-up can end as soon as the last datapoint is, for all the parameters, within the tolerance from
+#    the predicted settled value, instead of waiting for the parameters to be flat for several datapoints.
+#
+#############################################################################################################
+"""
+
+import numpy as np                             # data array management
+
+
+class Convergence:
+
+    def __init__(self, names, kl=0.95, size=16, min_pts=6):
+        """Ring buffers for the named parameters; kl is the lower coefficient of the acceptance bandwidth (i.e.
+            0.95 means 5% tolerance), size the ring buffers length and min_pts the minimum datapoints to check."""
+
+        self.names = names                                                  # parameters names
+        self.tol = 1 - kl                                                   # relative tolerance
+        self.size = size                                                    # ring buffers length
+        self.min_pts = max(3, min_pts)                                      # minimum datapoints (3 blocks of at least 1 point)
+        self.data = np.zeros((size, len(names)), dtype=np.float64)          # ring buffers, one column per parameter
+        self.t = np.zeros(size, dtype=np.float64)                           # ring buffer for the datapoints time
+        self.count = 0                                                      # datapoints added so far
+
+
+
+    def add(self, t, values):
+        """Adds a datapoint (time and parameters values) to the ring buffers."""
+
+        i = self.count % self.size                                          # ring buffer index
+        self.t[i] = t                                                       # datapoint time
+        self.data[i] = values                                               # parameters values
+        self.count += 1                                                     # datapoints counter is incremented
+
+
+
+    def last(self, n=0):
+        """Returns the last n datapoints (all the stored ones when n=0), in chronological order: (times, values)."""
+
+        stored = min(self.count, self.size)                                 # datapoints stored in the ring buffers
+        n = stored if n <= 0 else min(n, stored)                            # datapoints to return
+        idx = (self.count - n + np.arange(n)) % self.size                   # ring buffer indexes, oldest first
+        return self.t[idx], self.data[idx]                                  # times and values
+
+
+
+    def predict(self):
+        """Returns the predicted settled values (Aitken extrapolation on three blocks means); NaN where the
+            datapoints aren't (yet) following a settling behaviour, None if not enough datapoints."""
+
+        stored = min(self.count, self.size)                                 # datapoints stored in the ring buffers
+        if stored < self.min_pts:                                           # case of not enough datapoints
+            return None                                                     # None is returned
+        m = stored // 3                                                     # datapoints per block
+        _, values = self.last(3 * m)                                        # last datapoints
+        x0, x1, x2 = values.reshape(3, m, -1).mean(axis=1)                  # blocks means
+        d1 = x1 - x0                                                        # first difference
+        d2 = x2 - x1                                                        # second difference
+        scale = np.maximum(np.abs(x2), 1e-9)                                # scale for the relative comparisons
+
+        pred = np.full(x2.shape, np.nan)                                    # predicted values, initially not available
+        flat = (np.abs(d1) <= 0.5 * self.tol * scale) & (np.abs(d2) <= 0.5 * self.tol * scale)  # case of flat datapoints
+        pred[flat] = x2[flat]                                               # settled value is the last block mean
+        with np.errstate(divide='ignore', invalid='ignore'):                # divisions by zero are handled by the masks
+            q = d2 / d1                                                     # ratio of the differences
+            settling = ~flat & (d1 != 0) & (q >= 0) & (q < 0.9)             # case of monotonic and decaying differences
+            pred[settling] = (x2 + d2 * q / (1 - q))[settling]              # Aitken extrapolation of the settled value
+        return pred                                                         # predicted values
+
+
+
+    def converged(self):
+        """Returns True when the last datapoint is, for all the parameters, within tolerance from the predicted value."""
+
+        pred = self.predict()                                               # predicted settled values
+        if pred is None or np.isnan(pred).any():                            # case of not enough datapoints, or not settling
+            return False                                                    # False is returned
+        _, values = self.last(1)                                            # last datapoint
+        residual = np.abs(values[0] - pred) / np.maximum(np.abs(pred), 1e-9)  # relative residual from the predicted values
+        return bool(np.all(residual <= self.tol))                           # True when all the residuals are within tolerance